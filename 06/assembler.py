@@ -1,86 +1,357 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from itertools import repeat
 from pathlib import Path
-from typing import List
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, TextIO
 
 import click
 
+from assembly_cache import CACHE_DIRECTORY_NAME, AssemblyCache, CacheEntry
 from code_ import Code
-from parser import Parser, CommandType
+from hack_binary import BINARY_SUFFIX, HackBinary
+from parser import Command, CommandType, Parser, iter_commands, parse_command
 from symbol_table import SymbolTable
 
+# A-instructions hold a 15-bit value
+MAX_ADDRESS = 32767
+
+# Bump whenever a change to the assembler changes its output, so cached results aren't reused
+ASSEMBLER_VERSION = "1"
+
 
 def assemble(input_lines: List[str]):
-    code = Code()
-    symbol_table = SymbolTable()
+    return assemble_packed(input_lines=input_lines).lines()
+
+
+def assemble_single_pass(input_lines: List[str]):
+    return assemble_packed(input_lines=input_lines, single_pass=True).lines()
+
+
+def assemble_packed(
+    input_lines: List[str], single_pass: bool = False, jobs: int = 1, symbol_table: Optional[SymbolTable] = None
+):
+    """
+    Assemble the program into packed 16-bit words
+
+    With jobs > 1, encoding is split across that many worker processes. If a symbol_table is given, every label and
+    variable of the program is added to it.
+    """
+    if symbol_table is None:
+        symbol_table = SymbolTable()
+
+    if jobs > 1:
+        words = _assemble_parallel(input_lines=input_lines, jobs=jobs, symbol_table=symbol_table)
+    elif single_pass:
+        words = _assemble_single_pass(input_lines=input_lines, symbol_table=symbol_table)
+    else:
+        words = _assemble_two_pass(input_lines=input_lines, symbol_table=symbol_table)
+    return HackBinary(words)
 
-    # First pass
-    instruction_count = 0
-    parser = Parser(input_lines=input_lines)
-    while True:
-        match parser.command_type():
+
+def _assemble_two_pass(input_lines: List[str], symbol_table: SymbolTable):
+    commands = Parser(input_lines=input_lines).parse_all()
+    return array("H", _encode_two_pass(open_commands=lambda: commands, symbol_table=symbol_table))
+
+
+def _resolve_labels(commands: Iterable[Command], symbol_table: SymbolTable, instruction_count: int = 0):
+    """
+    First pass: add every label in the program to the symbol table
+
+    instruction_count is the address of the first instruction in commands.
+    """
+    for command in commands:
+        match command.type:
             case CommandType.A_COMMAND:
                 instruction_count += 1
             case CommandType.C_COMMAND:
                 instruction_count += 1
             case CommandType.L_COMMAND:
-                label = parser.symbol()
-                symbol_table.add_entry(label, instruction_count)
-            case _:
-                raise Exception(f"unknown command type: {parser.command_type()}")
-        if parser.has_more_commands():
-            parser.advance()
-        else:
-            break
+                symbol_table.add_label(command.symbol, instruction_count)
+            case command_type:
+                raise Exception(f"unknown command type: {command_type}")
+
+
+def _encode_two_pass(
+    open_commands: Callable[[], Iterable[Command]], symbol_table: SymbolTable, instruction_count: int = 0
+):
+    """
+    Yield the instruction words of the program, one at a time
+
+    open_commands is called once for each pass, and must return an iterable of parsed commands. As the second pass
+    is a generator, memory use is bounded by the symbol table rather than by the size of the program.
+    """
+    code = Code()
+    _resolve_labels(commands=open_commands(), symbol_table=symbol_table, instruction_count=instruction_count)
 
     # Second pass
-    result = []
-    next_variable_address = 16
-    parser = Parser(input_lines=input_lines)
-    while True:
-        match parser.command_type():
+    for command in open_commands():
+        match command.type:
             case CommandType.A_COMMAND:
-                symbol_ = parser.symbol()
+                symbol_ = command.symbol
 
                 if symbol_.isdigit():
                     address = int(symbol_)
                 elif symbol_table.contains(symbol_):
                     address = symbol_table.get_address(symbol_)
                 else:
-                    address = next_variable_address
-                    next_variable_address += 1
-                    symbol_table.add_entry(symbol_, address)
-                result.append(f"{address:0>16b}")
+                    address = symbol_table.add_variable(symbol_)
+                if address > MAX_ADDRESS:
+                    raise Exception(f"address out of range: {symbol_}={address}")
+                yield address
 
             case CommandType.C_COMMAND:
-                comp = code.comp(parser.comp())
-                dest = code.dest(parser.dest())
-                jump = code.jump(parser.jump())
-                result.append(f"111{comp}{dest}{jump}")
+                yield code.instruction(command.text)
             case CommandType.L_COMMAND:
                 pass
-            case _:
-                raise Exception(f"unknown command type: {parser.command_type()}")
+            case command_type:
+                raise Exception(f"unknown command type: {command_type}")
+
+
+def assemble_cached(
+    input_lines: List[str], cache: AssemblyCache, source: str, single_pass: bool = False, jobs: int = 1
+):
+    """
+    Assemble the program, reusing cached results where possible
+
+    A program that has been assembled before is served straight from the cache. If it is the last program cached for
+    the same source with code appended, only the new code is assembled, carrying on from the cached symbol table.
+    """
+    key = cache.key(input_lines)
+    if (entry := cache.get(key)) is not None:
+        return HackBinary(entry.words)
+
+    words = None
+    previous_key, previous = cache.get_latest(source)
+    if (
+        previous is not None
+        and previous.line_count <= len(input_lines)
+        and cache.key(input_lines[: previous.line_count]) == previous_key
+    ):
+        symbol_table = SymbolTable()
+        symbol_table.symbols = dict(previous.symbols)
+        symbol_table.next_variable_address = previous.next_variable_address
+        words = _assemble_appended(
+            input_lines=input_lines[previous.line_count :], prefix_words=previous.words, symbol_table=symbol_table
+        )
+
+    if words is None:
+        symbol_table = SymbolTable()
+        hack_binary = assemble_packed(
+            input_lines=input_lines, single_pass=single_pass, jobs=jobs, symbol_table=symbol_table
+        )
+        words = hack_binary.words
+
+    cache.put(
+        key=key,
+        source=source,
+        entry=CacheEntry(
+            line_count=len(input_lines),
+            symbols=symbol_table.symbols,
+            next_variable_address=symbol_table.next_variable_address,
+            words=words,
+        ),
+    )
+    return HackBinary(words)
+
+
+def _assemble_appended(input_lines: List[str], prefix_words: array, symbol_table: SymbolTable):
+    """
+    Assemble code appended to an already assembled program, or return None if that isn't possible
+
+    symbol_table holds the symbols of the earlier code. If the new code defines a label that is already a symbol,
+    the earlier code would assemble differently, so it has to be assembled from scratch.
+    """
+    commands = Parser(input_lines=input_lines).parse_all()
+    for command in commands:
+        if command.type == CommandType.L_COMMAND and symbol_table.contains(command.symbol):
+            return None
+
+    words = array("H", prefix_words)
+    words.extend(
+        _encode_two_pass(open_commands=lambda: commands, symbol_table=symbol_table, instruction_count=len(prefix_words))
+    )
+    return words
+
+
+def _assemble_parallel(input_lines: List[str], jobs: int, symbol_table: SymbolTable):
+    """
+    Resolve every symbol up front, then encode chunks of the program in separate processes
+
+    Variables are allocated in order of first appearance before any encoding happens, so the output is identical to
+    the two-pass assembler.
+    """
+    commands = Parser(input_lines=input_lines).parse_all()
+    _resolve_labels(commands=commands, symbol_table=symbol_table)
+
+    instructions = []
+    for command in commands:
+        match command.type:
+            case CommandType.A_COMMAND:
+                symbol_ = command.symbol
+                if not symbol_.isdigit() and not symbol_table.contains(symbol_):
+                    symbol_table.add_variable(symbol_)
+                instructions.append(command.text)
+            case CommandType.C_COMMAND:
+                instructions.append(command.text)
 
-        if parser.has_more_commands():
-            parser.advance()
+    chunk_size = max(1, -(-len(instructions) // jobs))
+    chunks = [instructions[i : i + chunk_size] for i in range(0, len(instructions), chunk_size)]
+
+    result = array("H")
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # map() returns results in submission order, whichever worker finishes first
+        for words in executor.map(_encode_chunk, chunks, repeat(symbol_table.symbols)):
+            result.extend(words)
+    return result
+
+
+def _encode_chunk(instructions: List[str], symbols: Dict[str, int]):
+    """
+    Encode A- and C-instructions whose symbols have all been resolved
+
+    The instructions are sent as plain text, which is cheaper to pickle than parsed commands.
+    """
+    code = Code()
+    words = array("H")
+    for command in map(parse_command, instructions):
+        if command.type == CommandType.A_COMMAND:
+            symbol_ = command.symbol
+            address = int(symbol_) if symbol_.isdigit() else symbols[symbol_]
+            if address > MAX_ADDRESS:
+                raise Exception(f"address out of range: {symbol_}={address}")
+            words.append(address)
         else:
-            break
+            words.append(code.instruction(command.text))
+    return words
+
+
+def assemble_stream(asm_file_path: Path, output: TextIO, binary_output: Optional[BinaryIO] = None):
+    """
+    Assemble a .asm file, writing each line of machine code to output as soon as it is encoded
+
+    The source is read twice, line by line, and never held in memory in full. If binary_output is given, the
+    instruction words are also written to it in the .hackb format.
+    """
+
+    def open_commands():
+        with asm_file_path.open() as asm_file:
+            yield from map(parse_command, iter_commands(asm_file))
+
+    separator = ""
+    for word in _encode_two_pass(open_commands=open_commands, symbol_table=SymbolTable()):
+        output.write(f"{separator}{word:0>16b}")
+        separator = "\n"
+        if binary_output is not None:
+            binary_output.write(word.to_bytes(2, "little"))
+
+
+def _assemble_single_pass(input_lines: List[str], symbol_table: SymbolTable):
+    """
+    Assemble the program in a single pass
+
+    A-instructions that reference a symbol which hasn't been seen yet are recorded in a fixup list and patched once
+    the whole program has been read. Any symbol still unknown at that point is a variable, and variables are
+    allocated in order of first appearance, so the output is identical to the two-pass assembler.
+    """
+    code = Code()
+    result = array("H")
+    fixups = []
+    for command in Parser(input_lines=input_lines).parse_all():
+        match command.type:
+            case CommandType.A_COMMAND:
+                symbol_ = command.symbol
+
+                if symbol_.isdigit():
+                    address = int(symbol_)
+                elif symbol_table.contains(symbol_):
+                    address = symbol_table.get_address(symbol_)
+                else:
+                    # Forward reference to a label, or a variable
+                    fixups.append((len(result), symbol_))
+                    address = 0
+                if address > MAX_ADDRESS:
+                    raise Exception(f"address out of range: {symbol_}={address}")
+                result.append(address)
+
+            case CommandType.C_COMMAND:
+                result.append(code.instruction(command.text))
+            case CommandType.L_COMMAND:
+                symbol_table.add_label(command.symbol, len(result))
+            case command_type:
+                raise Exception(f"unknown command type: {command_type}")
+
+    # Backpatch, now that every label is known
+    for index, symbol_ in fixups:
+        if not symbol_table.contains(symbol_):
+            symbol_table.add_variable(symbol_)
+        address = symbol_table.get_address(symbol_)
+        if address > MAX_ADDRESS:
+            raise Exception(f"address out of range: {symbol_}={address}")
+        result[index] = address
 
     return result
 
 
 @click.command()
 @click.argument("asm_file", type=click.Path(exists=True))
-def hello(asm_file):
+@click.option("--single-pass", is_flag=True, help="Assemble in one pass, backpatching forward label references")
+@click.option("--binary", is_flag=True, help=f"Also write the packed instruction words to a {BINARY_SUFFIX} file")
+@click.option(
+    "--stream", is_flag=True, help="Write the output as it is assembled, without holding the program in memory"
+)
+@click.option("--jobs", default=1, show_default=True, help="Number of processes to encode the program with")
+@click.option("--no-cache", is_flag=True, help="Don't read or write cached results")
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help=f"Directory to cache results in  [default: {CACHE_DIRECTORY_NAME} next to ASM_FILE]",
+)
+def hello(asm_file, single_pass, binary, stream, jobs, no_cache, cache_dir):
     """Hack assembler"""
     asm_file_path = Path(asm_file)
+    output_file = asm_file_path.with_suffix(".hack")
+
+    if no_cache and cache_dir is not None:
+        raise click.UsageError("--no-cache can't be used with --cache-dir")
+
+    if jobs > 1 and (single_pass or stream):
+        raise click.UsageError("--jobs can't be used with --single-pass or --stream")
+
+    if stream:
+        if single_pass:
+            raise click.UsageError("--single-pass needs the whole program in memory, so can't be used with --stream")
+        if cache_dir is not None:
+            raise click.UsageError("--stream doesn't cache results, so can't be used with --cache-dir")
+
+        with output_file.open("w") as output, ExitStack() as stack:
+            binary_output = None
+            if binary:
+                binary_output = stack.enter_context(asm_file_path.with_suffix(BINARY_SUFFIX).open("wb"))
+            assemble_stream(asm_file_path=asm_file_path, output=output, binary_output=binary_output)
+        return
+
     asm_lines = asm_file_path.read_text().splitlines()
 
-    binary_lines = assemble(input_lines=asm_lines)
-    binary_text = "\n".join(binary_lines)
-    click.echo(binary_text)
+    if no_cache:
+        hack_binary = assemble_packed(input_lines=asm_lines, single_pass=single_pass, jobs=jobs)
+    else:
+        if cache_dir is None:
+            cache_dir = asm_file_path.parent / CACHE_DIRECTORY_NAME
+        assembly_cache = AssemblyCache(directory=cache_dir, version=ASSEMBLER_VERSION)
+        hack_binary = assemble_cached(
+            input_lines=asm_lines,
+            cache=assembly_cache,
+            source=str(asm_file_path.resolve()),
+            single_pass=single_pass,
+            jobs=jobs,
+        )
+    click.echo(hack_binary.text)
 
-    output_file = asm_file_path.with_suffix(".hack")
-    output_file.write_text(binary_text)
+    output_file.write_text(hack_binary.text)
+
+    if binary:
+        hack_binary.write(asm_file_path.with_suffix(BINARY_SUFFIX))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+from array import array
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from hack_binary import BINARY_SUFFIX, HackBinary
+
+CACHE_DIRECTORY_NAME = ".n2tcache"
+DEFAULT_MAX_ENTRIES = 64
+
+
+class CacheEntry(NamedTuple):
+    """
+    The result of assembling a program, with enough state to carry on assembling code appended to it
+    """
+
+    line_count: int
+    symbols: Dict[str, int]
+    next_variable_address: int
+    words: array
+
+
+class AssemblyCache:
+    """
+    On-disk cache of assembled programs, keyed by a hash of the source lines and the assembler version
+
+    Each entry is a .json file of metadata next to a .hackb file of the instruction words. Once there are more than
+    max_entries entries, the least recently used are removed.
+    """
+
+    def __init__(self, directory: Path, version: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.directory = directory
+        self.version = version
+        self.max_entries = max_entries
+
+    def key(self, input_lines: List[str]):
+        digest = hashlib.sha256(f"{self.version}\n".encode())
+        for line in input_lines:
+            digest.update(line.encode())
+            digest.update(b"\n")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        metadata_file = self.directory / f"{key}.json"
+        binary_file = metadata_file.with_suffix(BINARY_SUFFIX)
+        try:
+            metadata = json.loads(metadata_file.read_text())
+            words = HackBinary.read(binary_file).words
+        except FileNotFoundError:
+            return None
+
+        # Mark as recently used
+        os.utime(metadata_file)
+        return CacheEntry(
+            line_count=metadata["line_count"],
+            symbols=metadata["symbols"],
+            next_variable_address=metadata["next_variable_address"],
+            words=words,
+        )
+
+    def get_latest(self, source: str):
+        """
+        The key and entry most recently stored for source, if it is still in the cache
+        """
+        try:
+            key = json.loads(self._index_file.read_text())[source]
+        except (FileNotFoundError, KeyError):
+            return None, None
+        return key, self.get(key)
+
+    def put(self, key: str, source: str, entry: CacheEntry):
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        HackBinary(entry.words).write((self.directory / key).with_suffix(BINARY_SUFFIX))
+        metadata = {
+            "line_count": entry.line_count,
+            "symbols": entry.symbols,
+            "next_variable_address": entry.next_variable_address,
+        }
+        (self.directory / f"{key}.json").write_text(json.dumps(metadata))
+
+        try:
+            index = json.loads(self._index_file.read_text())
+        except FileNotFoundError:
+            index = {}
+        index[source] = key
+        self._index_file.write_text(json.dumps(index))
+
+        self._evict()
+
+    @property
+    def _index_file(self):
+        return self.directory / "index.json"
+
+    def _evict(self):
+        metadata_files = [f for f in self.directory.glob("*.json") if f != self._index_file]
+        metadata_files.sort(key=lambda f: f.stat().st_mtime, reverse=True)
+        for metadata_file in metadata_files[self.max_entries :]:
+            metadata_file.unlink(missing_ok=True)
+            metadata_file.with_suffix(BINARY_SUFFIX).unlink(missing_ok=True)
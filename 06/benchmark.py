@@ -0,0 +1,499 @@
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import click
+
+from assembler import assemble, assemble_packed, assemble_single_pass, assemble_stream
+from code_ import COMP_INT_TABLE, DEST_INT_TABLE, JUMP_INT_TABLE, C_INSTRUCTION_PREFIX, Code
+from hack_cpu import KBD, HackCPU
+from parser import Parser
+from symbol_table import SymbolTable
+
+
+def generate_program(blocks: int):
+    """
+    Generate a large synthetic program, with forward and backward label references, variables and comments
+
+    Each block is 12 instructions, so up to 2730 blocks fit in the 32K ROM.
+    """
+    lines = []
+    for i in range(blocks):
+        lines.extend(
+            [
+                f"// block {i}",
+                f"@END{i}",
+                "D;JEQ",
+                f"(LOOP{i})",
+                f"@counter{i % 50}",
+                "M=M+1",
+                "D=M",
+                f"@LOOP{i}",
+                "D;JGT",
+                f"(END{i})",
+                "@SP",
+                "AM=M-1",
+                "D=M  // inline comment",
+                f"@{i % 16384}",
+                "0;JMP",
+            ]
+        )
+    return lines
+
+
+def best_of(repeat, func, *args, **kwargs):
+    """
+    Run func repeat times and return the fastest wall time in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@click.group()
+def cli():
+    """Hack assembler benchmarks"""
+
+
+@cli.command()
+@click.option("--blocks", default=2700, show_default=True, help="Number of synthetic code blocks to generate")
+@click.option("--repeat", default=10, show_default=True)
+def single_pass(blocks, repeat):
+    """Compare the two-pass and single-pass assemblers"""
+    input_lines = generate_program(blocks)
+    click.echo(f"{len(input_lines)} lines of assembly")
+
+    assert assemble_single_pass(input_lines) == assemble(input_lines)
+
+    two_pass_time = best_of(repeat, assemble, input_lines)
+    single_pass_time = best_of(repeat, assemble_single_pass, input_lines)
+    click.echo(f"two-pass:    {two_pass_time:.3f}s")
+    click.echo(f"single-pass: {single_pass_time:.3f}s ({two_pass_time / single_pass_time:.2f}x)")
+
+
+@cli.command()
+@click.option("--blocks", default=2700, show_default=True, help="Number of synthetic code blocks to generate")
+@click.option("--repeat", default=10, show_default=True)
+def packed(blocks, repeat):
+    """Compare the packed backend with building the text output"""
+    input_lines = generate_program(blocks)
+    click.echo(f"{len(input_lines)} lines of assembly")
+
+    hack_binary = assemble_packed(input_lines)
+    click.echo(f".hack size:  {len(hack_binary.text)} bytes")
+    click.echo(f".hackb size: {len(hack_binary.to_bytes())} bytes")
+
+    text_time = best_of(repeat, assemble, input_lines)
+    packed_time = best_of(repeat, assemble_packed, input_lines)
+    click.echo(f"text:   {text_time:.3f}s")
+    click.echo(f"packed: {packed_time:.3f}s ({text_time / packed_time:.2f}x)")
+
+
+def _encode_bit_strings(commands):
+    code = Code()
+    parser = Parser(commands)
+    words = []
+    for _ in commands:
+        words.append(int(f"111{code.comp(parser.comp())}{code.dest(parser.dest())}{code.jump(parser.jump())}", 2))
+        parser.advance()
+    return words
+
+
+def _encode_int_fields(commands):
+    parser = Parser(commands)
+    words = []
+    for _ in commands:
+        words.append(
+            C_INSTRUCTION_PREFIX
+            | COMP_INT_TABLE[parser.comp()]
+            | DEST_INT_TABLE[parser.dest()]
+            | JUMP_INT_TABLE[parser.jump()]
+        )
+        parser.advance()
+    return words
+
+
+def _encode_lookup(commands):
+    code = Code()
+    return [code.instruction(command) for command in commands]
+
+
+@cli.command()
+@click.option("--blocks", default=2700, show_default=True, help="Number of synthetic code blocks to generate")
+@click.option("--repeat", default=10, show_default=True)
+def encoding(blocks, repeat):
+    """Compare ways of encoding C-instructions"""
+    commands = [c for c in Parser(generate_program(blocks)).commands if c[0] not in "@("]
+    click.echo(f"{len(commands)} C-instructions")
+
+    assert _encode_bit_strings(commands) == _encode_int_fields(commands) == _encode_lookup(commands)
+
+    bit_strings_time = best_of(repeat, _encode_bit_strings, commands)
+    int_fields_time = best_of(repeat, _encode_int_fields, commands)
+    lookup_time = best_of(repeat, _encode_lookup, commands)
+    click.echo(f"bit strings:   {bit_strings_time:.4f}s")
+    click.echo(f"integer OR:    {int_fields_time:.4f}s ({bit_strings_time / int_fields_time:.2f}x)")
+    click.echo(f"single lookup: {lookup_time:.4f}s ({bit_strings_time / lookup_time:.2f}x)")
+
+
+def peak_memory(func, *args, **kwargs):
+    """
+    Run func and return the peak memory allocated while it ran, in bytes
+    """
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def _assemble_in_memory(asm_file_path: Path):
+    asm_lines = asm_file_path.read_text().splitlines()
+    hack_binary = assemble_packed(input_lines=asm_lines)
+    asm_file_path.with_suffix(".hack").write_text(hack_binary.text)
+
+
+def _assemble_streaming(asm_file_path: Path):
+    with asm_file_path.with_suffix(".hack").open("w") as output:
+        assemble_stream(asm_file_path=asm_file_path, output=output)
+
+
+@cli.command()
+@click.option("--blocks", default=2700, show_default=True, help="Number of synthetic code blocks to generate")
+def memory(blocks):
+    """Compare peak memory of in-memory and streaming assembly"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        asm_file_path = Path(tmp_dir) / "Prog.asm"
+        asm_file_path.write_text("\n".join(generate_program(blocks)))
+        click.echo(f"{asm_file_path.stat().st_size} bytes of assembly")
+
+        in_memory_peak = peak_memory(_assemble_in_memory, asm_file_path)
+        in_memory_output = asm_file_path.with_suffix(".hack").read_text()
+        streaming_peak = peak_memory(_assemble_streaming, asm_file_path)
+        assert asm_file_path.with_suffix(".hack").read_text() == in_memory_output
+
+    click.echo(f"in memory: {in_memory_peak / 1024:.0f} KiB peak")
+    click.echo(f"streaming: {streaming_peak / 1024:.0f} KiB peak")
+
+
+@cli.command()
+@click.option("--blocks", default=2700, show_default=True, help="Number of synthetic code blocks to generate")
+@click.option("--repeat", default=3, show_default=True)
+def jobs(blocks, repeat):
+    """Measure how parallel assembly scales with the number of worker processes"""
+    input_lines = generate_program(blocks)
+    click.echo(f"{len(input_lines)} lines of assembly")
+
+    expected = assemble_packed(input_lines).words
+    baseline_time = best_of(repeat, assemble_packed, input_lines)
+    click.echo(f"serial:    {baseline_time:.3f}s")
+    for job_count in [1, 2, 4, 8]:
+        assert assemble_packed(input_lines, jobs=job_count).words == expected
+        job_time = best_of(repeat, assemble_packed, input_lines, jobs=job_count)
+        click.echo(f"{job_count} worker(s): {job_time:.3f}s ({baseline_time / job_time:.2f}x)")
+
+
+PROGRAMS_PATH = Path(__file__).parent.parent / "04"
+
+
+def _load_cpu(asm_file: Path):
+    cpu = HackCPU()
+    cpu.load_words(assemble_packed(asm_file.read_text().splitlines()).words)
+    return cpu
+
+
+@cli.command()
+@click.option("--cycles", default=2_000_000, show_default=True, help="Cycles to run Fill for")
+@click.option("--repeat", default=3, show_default=True)
+def cpu(cycles, repeat):
+    """Measure CPU emulator speed on the chapter 4 programs"""
+
+    def run_mult():
+        mult = _load_cpu(PROGRAMS_PATH / "mult" / "Mult.asm")
+        mult.ram[0] = 3
+        mult.ram[1] = 20000
+        mult.run(10_000_000)
+        assert mult.halted and mult.ram[2] == 60000 - 65536
+        return mult.cycles
+
+    def run_fill():
+        fill = _load_cpu(PROGRAMS_PATH / "fill" / "Fill.asm")
+        # Hold a key down for the first half
+        fill.run(cycles // 2)
+        fill.ram[KBD] = 65
+        fill.run(cycles - cycles // 2)
+        return fill.cycles
+
+    for name, run in [("Mult", run_mult), ("Fill", run_fill)]:
+        executed = run()
+        run_time = best_of(repeat, run)
+        click.echo(f"{name}: {executed} instructions in {run_time:.3f}s, {executed / run_time:,.0f} instructions/s")
+
+
+REPOSITORY_PATH = Path(__file__).parent.parent
+OS_PATH = REPOSITORY_PATH / "12"
+OS_TESTS = ["ArrayTest", "MathTest", "MemoryTest", "OutputTest", "ScreenTest", "StringTest", "SysTest"]
+
+
+def _translate_vm(directory: Path, *options: str):
+    """
+    Translate a directory of .vm files with the chapter 8 VM translator, returning the assembly
+    """
+    subprocess.run(
+        [sys.executable, "vm_translator.py", str(directory), *options],
+        cwd=REPOSITORY_PATH / "08",
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return (directory / f"{directory.name}.asm").read_text().splitlines()
+
+
+# Sys.init in 12/Sys.jack is still empty, so programs using the OS are run with this instead. Returning from Sys.init
+# halts the program.
+BENCHMARK_SYS_JACK = """
+class Sys {
+    function void init() {
+        do Memory.init();
+        do Math.init();
+        do Main.main();
+        return;
+    }
+
+    function void halt() {
+        return;
+    }
+
+    function void wait(int duration) {
+        return;
+    }
+
+    function void error(int errorCode) {
+        return;
+    }
+}
+"""
+
+
+def _build_with_os(directory: Path, jack_files):
+    """
+    Compile the given .jack files, along with the OS, to .vm files in directory
+    """
+    directory.mkdir()
+    for jack_file in [*OS_PATH.glob("*.jack"), *jack_files]:
+        shutil.copy(jack_file, directory)
+    (directory / "Sys.jack").write_text(BENCHMARK_SYS_JACK)
+    subprocess.run(
+        [sys.executable, "jack_compiler.py", str(directory)],
+        cwd=REPOSITORY_PATH / "11",
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def _build_program_directories(tmp_dir: Path, fibonacci_n: int, hangman: bool = False):
+    """
+    Directories of .vm files for the chapter 8 programs with a Sys.init and the chapter 12 OS test programs
+
+    FibonacciElement is changed to compute element fibonacci_n of the series. If hangman is set, the chapter 9 Hangman
+    game is included too.
+    """
+    directories = {}
+    for name in ["FibonacciElement", "NestedCall", "StaticsTest"]:
+        directories[name] = tmp_dir / name
+        shutil.copytree(REPOSITORY_PATH / "08" / "fixtures" / "FunctionCalls" / name, directories[name])
+    sys_vm = directories["FibonacciElement"] / "Sys.vm"
+    sys_vm.write_text(sys_vm.read_text().replace("push constant 4\n", f"push constant {fibonacci_n}\n"))
+
+    if hangman:
+        directories["Hangman"] = tmp_dir / "Hangman"
+        _build_with_os(directories["Hangman"], (REPOSITORY_PATH / "09" / "Hangman").glob("*.jack"))
+    for name in OS_TESTS:
+        directories[name] = tmp_dir / name
+        _build_with_os(directories[name], [OS_PATH / name / "Main.jack"])
+    return directories
+
+
+def _build_programs(tmp_dir: Path, fibonacci_n: int, *options: str):
+    """
+    The programs of _build_program_directories, translated to assembly with the given VM translator options
+    """
+    directories = _build_program_directories(tmp_dir, fibonacci_n)
+    return {name: _translate_vm(directory, *options) for name, directory in directories.items()}
+
+
+def _run_program(words, run_method: str, max_cycles: int, labels=()):
+    """
+    Load the program into a new CPU and run it with the given run method until it halts or has run max_cycles
+    """
+    cpu_ = HackCPU()
+    cpu_.load_words(words, labels=labels)
+    run = getattr(cpu_, run_method)
+    while cpu_.cycles < max_cycles and not cpu_.halted:
+        if run(min(100_000, max_cycles - cpu_.cycles)) == 0:
+            break
+    return cpu_
+
+
+def _compare_runs(programs, run_methods, max_cycles: int, repeat: int):
+    """
+    Time each of run_methods, relative to the first, on every program that fits in ROM
+    """
+    for name, asm_lines in programs.items():
+        symbol_table = SymbolTable()
+        try:
+            words = assemble_packed(asm_lines, symbol_table=symbol_table).words
+            HackCPU().load_words(words)
+        except Exception as e:
+            click.echo(f"{name}: skipped, {e}")
+            continue
+        labels = symbol_table.label_addresses
+
+        baseline = _run_program(words, run_methods[0], max_cycles, labels)
+        click.echo(f"{name}: {baseline.cycles} instructions, {len(words)} words of ROM")
+        baseline_time = None
+        for run_method in run_methods:
+            cpu_ = _run_program(words, run_method, max_cycles, labels)
+            assert cpu_.ram == baseline.ram and cpu_.cycles == baseline.cycles
+
+            run_time = best_of(repeat, _run_program, words, run_method, max_cycles, labels)
+            if baseline_time is None:
+                baseline_time = run_time
+            click.echo(
+                f"  {run_method + ':':<14}{baseline.cycles / run_time:>12,.0f} instructions/s "
+                f"({baseline_time / run_time:.2f}x)"
+            )
+
+
+@cli.command()
+@click.option("--fibonacci-n", default=15, show_default=True, help="Element of the Fibonacci series to compute")
+@click.option("--max-cycles", default=5_000_000, show_default=True, help="Cycles to run each program for at most")
+@click.option("--repeat", default=3, show_default=True)
+def predecode(fibonacci_n, max_cycles, repeat):
+    """Compare the predecoded CPU emulator with decoding every instruction as it runs"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Without --compact, the OS test programs don't fit in ROM
+        programs = _build_programs(Path(tmp_dir), fibonacci_n, "--compact")
+    _compare_runs(programs, ["run_decoding", "run"], max_cycles=max_cycles, repeat=repeat)
+
+
+@cli.command()
+@click.option("--fibonacci-n", default=15, show_default=True, help="Element of the Fibonacci series to compute")
+@click.option("--max-cycles", default=5_000_000, show_default=True, help="Cycles to run each program for at most")
+@click.option("--repeat", default=3, show_default=True)
+def blocks(fibonacci_n, max_cycles, repeat):
+    """Compare running compiled basic blocks with running an instruction at a time"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Without --compact, the OS test programs don't fit in ROM
+        programs = _build_programs(Path(tmp_dir), fibonacci_n, "--compact")
+    _compare_runs(programs, ["run_decoding", "run", "run_blocks"], max_cycles=max_cycles, repeat=repeat)
+
+
+def _instruction_count(asm_lines):
+    return sum(1 for command in Parser(asm_lines).commands if not command.startswith("("))
+
+
+def _assemble(asm_lines):
+    """
+    Assemble a program, and the addresses of its labels, or return None if it doesn't fit in ROM
+    """
+    symbol_table = SymbolTable()
+    try:
+        words = assemble_packed(asm_lines, symbol_table=symbol_table).words
+        HackCPU().load_words(words)
+    except Exception:
+        return None
+    return words, symbol_table.label_addresses
+
+
+def _program_state(cpu_: HackCPU):
+    """
+    The VM pointers, static variables, heap and memory maps
+
+    The stack and the R13-R15 temporaries are left out, as they hold return addresses, which change whenever the
+    code does.
+    """
+    return cpu_.ram[:13] + cpu_.ram[16:256] + cpu_.ram[2048:]
+
+
+@cli.command()
+@click.option("--fibonacci-n", default=15, show_default=True, help="Element of the Fibonacci series to compute")
+@click.option("--max-cycles", default=5_000_000, show_default=True, help="Cycles to run each program for at most")
+def optimize(fibonacci_n, max_cycles):
+    """Measure how much the VM translator's --optimize pass shrinks programs and speeds them up"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        directories = _build_program_directories(Path(tmp_dir), fibonacci_n)
+        programs = {
+            name: (_translate_vm(directory), _translate_vm(directory, "--optimize"))
+            for name, directory in directories.items()
+        }
+
+    for name, (plain_lines, optimized_lines) in programs.items():
+        plain_size = _instruction_count(plain_lines)
+        optimized_size = _instruction_count(optimized_lines)
+        click.echo(f"{name}:")
+        click.echo(f"  ROM:    {plain_size} -> {optimized_size} words ({1 - optimized_size / plain_size:.1%} smaller)")
+
+        plain = _assemble(plain_lines)
+        optimized = _assemble(optimized_lines)
+        if plain is None or optimized is None:
+            click.echo(f"  cycles: can't run, {max(plain_size, optimized_size)} words doesn't fit in ROM")
+            continue
+
+        plain_cpu = _run_program(plain[0], "run_blocks", max_cycles, plain[1])
+        optimized_cpu = _run_program(optimized[0], "run_blocks", max_cycles, optimized[1])
+        if plain_cpu.halted and optimized_cpu.halted:
+            assert _program_state(plain_cpu) == _program_state(optimized_cpu)
+        click.echo(
+            f"  cycles: {plain_cpu.cycles} -> {optimized_cpu.cycles} "
+            f"({1 - optimized_cpu.cycles / plain_cpu.cycles:.1%} fewer)"
+            + ("" if plain_cpu.halted else f", stopped after {max_cycles} cycles")
+        )
+
+
+@cli.command()
+@click.option("--fibonacci-n", default=15, show_default=True, help="Element of the Fibonacci series to compute")
+@click.option("--max-cycles", default=5_000_000, show_default=True, help="Cycles to run each program for at most")
+def compact(fibonacci_n, max_cycles):
+    """Compare the size and speed of programs translated by the VM translator with and without --compact"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        directories = _build_program_directories(Path(tmp_dir), fibonacci_n, hangman=True)
+        programs = {
+            name: {
+                "inline": _translate_vm(directory),
+                "compact": _translate_vm(directory, "--compact"),
+                "compact, optimized": _translate_vm(directory, "--compact", "--optimize"),
+            }
+            for name, directory in directories.items()
+        }
+
+    for name, modes in programs.items():
+        click.echo(f"{name}:")
+        final_states = []
+        for mode, asm_lines in modes.items():
+            size = _instruction_count(asm_lines)
+            assembled = _assemble(asm_lines)
+            if assembled is None:
+                click.echo(f"  {mode + ':':<20}{size:>6} words of ROM, too big to run")
+                continue
+
+            cpu_ = _run_program(assembled[0], "run_blocks", max_cycles, assembled[1])
+            if cpu_.halted:
+                final_states.append(_program_state(cpu_))
+            click.echo(
+                f"  {mode + ':':<20}{size:>6} words of ROM, {cpu_.cycles:>9} cycles"
+                + ("" if cpu_.halted else " (still running)")
+            )
+        assert all(state == final_states[0] for state in final_states)
+
+
+if __name__ == "__main__":
+    cli()
@@ -51,6 +51,30 @@ JUMP_TABLE = {
     "JMP": "111",
 }
 
+# The same encodings as integers, already shifted into position within the 16-bit C-instruction
+C_INSTRUCTION_PREFIX = 0b111 << 13
+COMP_INT_TABLE = {mnemonic: int(bits, 2) << 6 for mnemonic, bits in COMP_TABLE.items()}
+DEST_INT_TABLE = {mnemonic: int(bits, 2) << 3 for mnemonic, bits in DEST_TABLE.items()}
+JUMP_INT_TABLE = {mnemonic: int(bits, 2) for mnemonic, bits in JUMP_TABLE.items()}
+
+
+def _c_instruction_text(dest, comp, jump):
+    text = comp
+    if dest:
+        text = f"{dest}={text}"
+    if jump:
+        text = f"{text};{jump}"
+    return text
+
+
+# Every dest=comp;jump combination, as written with whitespace removed, to its 16-bit instruction word
+C_INSTRUCTION_TABLE = {
+    _c_instruction_text(dest, comp, jump): C_INSTRUCTION_PREFIX | comp_bits | dest_bits | jump_bits
+    for comp, comp_bits in COMP_INT_TABLE.items()
+    for dest, dest_bits in DEST_INT_TABLE.items()
+    for jump, jump_bits in JUMP_INT_TABLE.items()
+}
+
 
 class Code:
     def __init__(self):
@@ -64,3 +88,6 @@ class Code:
 
     def jump(self, mnemonic):
         return JUMP_TABLE[mnemonic]
+
+    def instruction(self, command):
+        return C_INSTRUCTION_TABLE[command]
@@ -0,0 +1,61 @@
+import sys
+from array import array
+from functools import cached_property
+from pathlib import Path
+
+# .hackb files are the raw instruction words, 2 bytes each, little-endian
+BINARY_SUFFIX = ".hackb"
+
+
+class HackBinary:
+    """
+    An assembled program, held as packed 16-bit words
+
+    The text form, one "0101..." string per instruction, is only built when asked for.
+    """
+
+    def __init__(self, words: array):
+        self.words = words
+
+    def __len__(self):
+        return len(self.words)
+
+    def lines(self):
+        return [f"{word:0>16b}" for word in self.words]
+
+    @cached_property
+    def text(self):
+        return "\n".join(self.lines())
+
+    def to_bytes(self):
+        if sys.byteorder == "little":
+            return self.words.tobytes()
+        swapped = array("H", self.words)
+        swapped.byteswap()
+        return swapped.tobytes()
+
+    def write(self, path: Path):
+        path.write_bytes(self.to_bytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        words = array("H")
+        words.frombytes(data)
+        if sys.byteorder != "little":
+            words.byteswap()
+        return cls(words)
+
+    @classmethod
+    def read(cls, path: Path):
+        return cls.from_bytes(path.read_bytes())
+
+
+def view_words(data):
+    """
+    View the contents of a .hackb file as 16-bit words
+
+    On little-endian hosts this doesn't copy, so data can be e.g. an mmap of the file.
+    """
+    if sys.byteorder == "little":
+        return memoryview(data).cast("H")
+    return HackBinary.from_bytes(bytes(data)).words
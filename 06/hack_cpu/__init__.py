@@ -0,0 +1 @@
+from hack_cpu.cpu import KBD, RAM_SIZE, ROM_SIZE, SCREEN, HackCPU
@@ -0,0 +1,97 @@
+from typing import Callable, Collection, NamedTuple
+
+from hack_cpu.predecode import COMP_MNEMONICS, alu_function, comp_expression
+
+# Blocks are cut off at this many instructions, so runs of empty ROM don't become one huge function
+MAX_BLOCK_LENGTH = 256
+
+JUMP_CONDITIONS = {
+    1: "out > 0",
+    2: "out == 0",
+    3: "out >= 0",
+    4: "out < 0",
+    5: "out != 0",
+    6: "out <= 0",
+}
+
+
+class Block(NamedTuple):
+    """
+    A run of instructions with a single entry point, compiled into one Python function
+
+    function takes the values of A and D, and returns the new values of A, D and PC, and whether the program halted.
+    Every instruction in the block is executed each time, so it always takes length cycles.
+    """
+
+    function: Callable[[int, int], tuple]
+    length: int
+    source: str
+
+
+def compile_block(rom, ram, start: int, leaders: Collection[int], end: int) -> Block:
+    """
+    Compile the instructions from start up to the first jump, the next leader, or end, whichever comes first
+
+    leaders are the addresses other blocks start at, e.g. the labels of the program. A block can start at any address,
+    so leaders only keep blocks from overlapping. The registers are kept in local variables, and while A holds a
+    constant from an A-instruction, M is read and written at that address directly.
+    """
+    lines = ["def block(a, d):"]
+    namespace = {"ram": ram}
+    # The value of A, if it is known at this point in the block
+    known_a = None
+
+    pc = start
+    while True:
+        instruction = rom[pc]
+        pc += 1
+
+        if instruction < 0x8000:
+            lines.append(f"    a = {instruction}")
+            known_a = instruction
+        else:
+            known_address = known_a
+            address = "a & 0x7FFF" if known_address is None else str(known_address)
+            comp_bits = (instruction >> 6) & 0x7F
+            if comp_bits in COMP_MNEMONICS:
+                expression = comp_expression(COMP_MNEMONICS[comp_bits], f"ram[{address}]")
+            else:
+                namespace[f"alu_{comp_bits}"] = alu_function(comp_bits, ram)
+                expression = f"alu_{comp_bits}(d, a)"
+            jump_bits = instruction & 0x7
+
+            if jump_bits:
+                # Jumps go to the value of A before this instruction wrote to it
+                lines.append(f"    target = {address}")
+            lines.append(f"    out = {expression}")
+            if instruction & 0x8:
+                lines.append(f"    ram[{address}] = out")
+            if instruction & 0x20:
+                lines.append("    a = out")
+                known_a = None
+            if instruction & 0x10:
+                lines.append("    d = out")
+
+            if jump_bits == 7:
+                # An unconditional jump back to the @ of this loop halts the program
+                loop_start = pc - 2
+                if loop_start < 0 or rom[loop_start] != loop_start or known_address not in (None, loop_start):
+                    lines.append("    return a, d, target, False")
+                elif known_address is None:
+                    lines.append(f"    return a, d, target, target == {loop_start}")
+                else:
+                    lines.append("    return a, d, target, True")
+                break
+            if jump_bits:
+                lines.append(f"    if {JUMP_CONDITIONS[jump_bits]}:")
+                lines.append("        return a, d, target, False")
+                lines.append(f"    return a, d, {pc}, False")
+                break
+
+        if pc >= end or pc in leaders or pc - start >= MAX_BLOCK_LENGTH:
+            lines.append(f"    return a, d, {pc}, False")
+            break
+
+    source = "\n".join(lines)
+    exec(compile(source, f"<block {start}>", "exec"), namespace)
+    return Block(function=namespace["block"], length=pc - start, source=source)
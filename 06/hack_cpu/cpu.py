@@ -0,0 +1,240 @@
+from array import array
+from pathlib import Path
+from typing import Iterable
+
+from hack_binary import BINARY_SUFFIX, HackBinary
+from hack_cpu.blocks import compile_block
+from hack_cpu.predecode import predecode
+
+ROM_SIZE = 32768
+RAM_SIZE = 32768
+
+SCREEN = 16384
+KBD = 24576
+
+
+class HackCPU:
+    """
+    Emulates the Hack computer: a 32K ROM of instructions, a 32K RAM, and the A, D and PC registers
+
+    RAM holds signed 16-bit words, with the screen and keyboard memory maps at SCREEN and KBD. The ROM is decoded
+    once, the first time the program is run after being loaded, so don't write to rom directly.
+    """
+
+    def __init__(self):
+        self.rom = array("H", bytes(2 * ROM_SIZE))
+        self.ram = array("h", bytes(2 * RAM_SIZE))
+        self.a = 0
+        self.d = 0
+        self.pc = 0
+        self.cycles = 0
+        self.halted = False
+        self._program = None
+        self._length = ROM_SIZE
+        self._labels = frozenset()
+        self._blocks = {}
+
+    def load_words(self, words, labels: Iterable[int] = ()):
+        """
+        Load instruction words, e.g. HackBinary.words or a view of a .hackb file, into ROM
+
+        labels are the addresses of the program's labels, e.g. SymbolTable.label_addresses, which run_blocks() splits
+        the program into blocks at.
+        """
+        if len(words) > ROM_SIZE:
+            raise Exception(f"Program of {len(words)} instructions doesn't fit in ROM")
+        self.rom[: len(words)] = array("H", words)
+        self.rom[len(words) :] = array("H", bytes(2 * (ROM_SIZE - len(words))))
+        self._program = None
+        self._length = len(words)
+        self._labels = frozenset(labels)
+        self._blocks = {}
+        self.reset()
+
+    def load_text(self, text: str):
+        """
+        Load the contents of a .hack file into ROM
+        """
+        self.load_words([int(line, 2) for line in text.split()])
+
+    def load_file(self, path: Path):
+        """
+        Load a .hack or .hackb file into ROM
+        """
+        if path.suffix == BINARY_SUFFIX:
+            self.load_words(HackBinary.read(path).words)
+        else:
+            self.load_text(path.read_text())
+
+    def reset(self):
+        self.a = 0
+        self.d = 0
+        self.pc = 0
+        self.cycles = 0
+        self.halted = False
+
+    def run(self, max_cycles: int):
+        """
+        Execute up to max_cycles instructions, and return how many were executed
+
+        Stops early if the program halts, i.e. reaches the "(END) @END 0;JMP" idiom, or runs past the end of ROM.
+        """
+        if self._program is None:
+            # The rest of ROM is zeros, which are all the A-instruction @0. None marks the end of ROM.
+            self._program = predecode(self.rom[: self._length], ram=self.ram) + [0] * (ROM_SIZE - self._length) + [None]
+        program = self._program
+        rom = self.rom
+        ram = self.ram
+        a = self.a
+        d = self.d
+        pc = self.pc
+
+        int_ = int
+        cycles = 0
+        while cycles < max_cycles:
+            operation = program[pc]
+            cycles += 1
+
+            # A-instruction
+            if operation.__class__ is int_:
+                a = operation
+                pc += 1
+                continue
+            if operation is None:
+                # Ran past the end of ROM
+                cycles -= 1
+                self.halted = True
+                break
+
+            compute, writes_m, writes_a, writes_d, jumps, unconditional = operation
+            address = a & 0x7FFF
+            out = compute(d, a)
+
+            if writes_m:
+                ram[address] = out
+            if writes_a:
+                a = out
+            if writes_d:
+                d = out
+
+            # Jumps go to the value of A before this instruction wrote to it
+            if jumps is not None and jumps[(out > 0) - (out < 0)]:
+                if unconditional and address == pc - 1 and rom[address] == address:
+                    # Unconditional jump back to the @ of this loop, so nothing more will happen
+                    pc = address
+                    self.halted = True
+                    break
+                pc = address
+            else:
+                pc += 1
+
+        self.a = a
+        self.d = d
+        self.pc = pc
+        self.cycles += cycles
+        return cycles
+
+    def run_blocks(self, max_cycles: int):
+        """
+        The same as run(), but executing a basic block of instructions at a time
+
+        Each block is compiled to a Python function the first time execution reaches its first instruction, and kept
+        for as long as the program is loaded. Once the next block would take more than max_cycles, the rest are run
+        one instruction at a time.
+        """
+        blocks = self._blocks
+        a = self.a
+        d = self.d
+        pc = self.pc
+        halted = False
+
+        cycles = 0
+        while pc < ROM_SIZE:
+            block = blocks.get(pc)
+            if block is None:
+                block = blocks[pc] = compile_block(
+                    rom=self.rom, ram=self.ram, start=pc, leaders=self._labels, end=ROM_SIZE
+                )
+            function, length, _ = block
+            if cycles + length > max_cycles:
+                break
+            a, d, pc, halted = function(a, d)
+            cycles += length
+            if halted:
+                break
+
+        self.a = a
+        self.d = d
+        self.pc = pc
+        self.cycles += cycles
+        self.halted = halted
+        if not halted and cycles < max_cycles:
+            cycles += self.run(max_cycles - cycles)
+        return cycles
+
+    def run_decoding(self, max_cycles: int):
+        """
+        The same as run(), but decoding every instruction as it is executed
+
+        Kept as a baseline for the predecoded run().
+        """
+        rom = self.rom
+        ram = self.ram
+        a = self.a
+        d = self.d
+        pc = self.pc
+
+        cycles = 0
+        while cycles < max_cycles:
+            if pc >= ROM_SIZE:
+                self.halted = True
+                break
+            instruction = rom[pc]
+            cycles += 1
+
+            # A-instruction
+            if instruction < 0x8000:
+                a = instruction
+                pc += 1
+                continue
+
+            # C-instruction: compute x op y with the ALU control bits
+            address = a & 0x7FFF
+            x = d
+            y = ram[address] if instruction & 0x1000 else a
+            if instruction & 0x800:
+                x = 0
+            if instruction & 0x400:
+                x = ~x
+            if instruction & 0x200:
+                y = 0
+            if instruction & 0x100:
+                y = ~y
+            out = x + y if instruction & 0x80 else x & y
+            if instruction & 0x40:
+                out = ~out
+            out = ((out + 0x8000) & 0xFFFF) - 0x8000
+
+            if instruction & 0x8:
+                ram[address] = out
+            if instruction & 0x20:
+                a = out
+            if instruction & 0x10:
+                d = out
+
+            # Jumps go to the value of A before this instruction wrote to it
+            if (instruction & 4 and out < 0) or (instruction & 2 and out == 0) or (instruction & 1 and out > 0):
+                if address == pc - 1 and rom[address] == address and instruction & 7 == 7:
+                    # Unconditional jump back to the @ of this loop, so nothing more will happen
+                    pc = address
+                    self.halted = True
+                    break
+                pc = address
+            else:
+                pc += 1
+
+        self.a = a
+        self.d = d
+        self.pc = pc
+        self.cycles += cycles
+        return cycles
@@ -0,0 +1,109 @@
+from typing import Callable, List, NamedTuple, Optional, Tuple, Union
+
+from code_ import COMP_INT_TABLE
+
+
+class Operation(NamedTuple):
+    """
+    A C-instruction, decoded once up front so that running it needs no bit manipulation
+    """
+
+    # Takes the values of D and A, reading M from RAM if needed, and returns the ALU output as a signed 16-bit value
+    compute: Callable[[int, int], int]
+    writes_m: bool
+    writes_a: bool
+    writes_d: bool
+    # Whether the jump is taken, indexed by the sign of the ALU output (0, 1 or -1), or None if it never jumps
+    jumps: Optional[Tuple[bool, bool, bool]]
+    unconditional: bool
+
+
+# A-instructions are predecoded to their value
+Instruction = Union[int, Operation]
+
+
+# Keyed by the comp bits, including the a-bit that chooses between A and M
+COMP_MNEMONICS = {bits >> 6: mnemonic for mnemonic, bits in COMP_INT_TABLE.items()}
+
+
+def comp_expression(mnemonic: str, m: str):
+    """
+    A Python expression for a comp mnemonic, in terms of d, a and the expression m for the value of M
+
+    The result is wrapped to signed 16 bits. Only addition can overflow, as ~, & and | of signed 16-bit values stay
+    in range.
+    """
+    expression = mnemonic.replace("D", "d").replace("A", "a").replace("M", m).replace("!", "~")
+    if "+" in mnemonic or "-" in mnemonic:
+        expression = f"(({expression}) + 0x8000 & 0xFFFF) - 0x8000"
+    return expression
+
+
+def _comp_functions(ram):
+    """
+    A function for each of the standard comp mnemonics, keyed by their comp bits
+
+    e.g. "D+M" becomes lambda d, a: d + ram[a & 0x7FFF], with the result wrapped to 16 bits.
+    """
+    return {
+        comp_bits: eval(f"lambda d, a: {comp_expression(mnemonic, 'ram[a & 0x7FFF]')}", {"ram": ram})
+        for comp_bits, mnemonic in COMP_MNEMONICS.items()
+    }
+
+
+def alu_function(comp_bits: int, ram):
+    """
+    A function for any combination of ALU control bits, including those without a comp mnemonic
+    """
+    reads_m = bool(comp_bits & 0x40)
+    zx, nx, zy, ny, f, no = (bool(comp_bits & (1 << bit)) for bit in range(5, -1, -1))
+
+    def compute(d, a):
+        x = 0 if zx else d
+        y = ram[a & 0x7FFF] if reads_m else a
+        if nx:
+            x = ~x
+        if zy:
+            y = 0
+        if ny:
+            y = ~y
+        out = x + y if f else x & y
+        if no:
+            out = ~out
+        return ((out + 0x8000) & 0xFFFF) - 0x8000
+
+    return compute
+
+
+def _decode(instruction: int, comp_functions, ram) -> Instruction:
+    if instruction < 0x8000:
+        return instruction
+
+    comp_bits = (instruction >> 6) & 0x7F
+    jump_bits = instruction & 0x7
+    return Operation(
+        compute=comp_functions.get(comp_bits) or alu_function(comp_bits, ram),
+        writes_m=bool(instruction & 0x8),
+        writes_a=bool(instruction & 0x20),
+        writes_d=bool(instruction & 0x10),
+        jumps=(bool(jump_bits & 2), bool(jump_bits & 1), bool(jump_bits & 4)) if jump_bits else None,
+        unconditional=jump_bits == 7,
+    )
+
+
+def predecode(rom, ram) -> List[Instruction]:
+    """
+    Decode every instruction in ROM, for a CPU with the given RAM
+
+    Programs repeat the same few hundred instructions many times over, so each distinct instruction word is only
+    decoded once, and every occurrence shares the result.
+    """
+    comp_functions = _comp_functions(ram)
+    decoded = {}
+    program = []
+    for instruction in rom:
+        operation = decoded.get(instruction)
+        if operation is None:
+            operation = decoded[instruction] = _decode(instruction, comp_functions, ram)
+        program.append(operation)
+    return program
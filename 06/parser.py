@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List
+from typing import Iterable, List, NamedTuple, Optional
 
 
 class CommandType(Enum):
@@ -8,21 +8,62 @@ class CommandType(Enum):
     L_COMMAND = 3
 
 
+def iter_commands(input_lines: Iterable[str]):
+    """
+    Lazily yield the commands in input_lines, with whitespace and comments removed and blank lines skipped
+
+    input_lines can be an open file, as any trailing line ending is ignored.
+    """
+    for line in input_lines:
+        line_without_comments = line.rstrip("\r\n").split("//")[0]
+        line_without_whitespace = line_without_comments.replace(" ", "")
+        if line_without_whitespace:
+            yield line_without_whitespace
+
+
+class Command(NamedTuple):
+    """
+    A single parsed command. Fields that don't apply to the command type are None
+    """
+
+    type: CommandType
+    symbol: Optional[str]
+    dest: Optional[str]
+    comp: Optional[str]
+    jump: Optional[str]
+    # The command with whitespace and comments removed
+    text: str
+
+
+def parse_command(command: str):
+    match command[0]:
+        case "@":
+            return Command(CommandType.A_COMMAND, command[1:], None, None, None, command)
+        case "(":
+            return Command(
+                CommandType.L_COMMAND, command.removeprefix("(").removesuffix(")"), None, None, None, command
+            )
+        case _:
+            dest = command.split("=")[0] if "=" in command else None
+            comp = command.split("=")[-1].split(";")[0]
+            jump = command.split(";")[-1] if ";" in command else None
+            return Command(CommandType.C_COMMAND, None, dest, comp, jump, command)
+
+
 class Parser:
     def __init__(self, input_lines):
         self.commands = self.remove_whitespace_and_comments(input_lines)
+        self.records = [parse_command(command) for command in self.commands]
         self.position = 0
 
     def remove_whitespace_and_comments(self, input_lines: List[str]):
-        def sanitise_line(line):
-            line_without_comments = line.split("//")[0]
-            line_without_whitespace = line_without_comments.replace(" ", "")
-            return line_without_whitespace
-
-        def is_line_non_blank(line):
-            return bool(line)
+        return list(iter_commands(input_lines))
 
-        return list(filter(is_line_non_blank, map(sanitise_line, input_lines)))
+    def parse_all(self) -> List[Command]:
+        """
+        Every command in the program, each parsed once
+        """
+        return self.records
 
     def has_more_commands(self):
         return self.position + 1 < len(self.commands)
@@ -35,33 +76,16 @@ class Parser:
         return self.commands[self.position]
 
     def command_type(self):
-        match self.current_command[0]:
-            case "@":
-                return CommandType.A_COMMAND
-            case "(":
-                return CommandType.L_COMMAND
-            case _:
-                return CommandType.C_COMMAND
+        return self.records[self.position].type
 
     def symbol(self):
-        if self.current_command.startswith("@"):
-            return self.current_command[1:]
-        else:
-            return self.current_command.removeprefix("(").removesuffix(")")
+        return self.records[self.position].symbol
 
     def dest(self):
-        if "=" in self.current_command:
-            return self.current_command.split("=")[0]
-        else:
-            return None
+        return self.records[self.position].dest
 
     def comp(self):
-        command_without_dest = self.current_command.split("=")[-1]
-        command_without_dest_or_jump = command_without_dest.split(";")[0]
-        return command_without_dest_or_jump
+        return self.records[self.position].comp
 
     def jump(self):
-        if ";" in self.current_command:
-            return self.current_command.split(";")[-1]
-        else:
-            return None
+        return self.records[self.position].jump
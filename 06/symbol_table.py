@@ -1,10 +1,23 @@
 class SymbolTable:
     def __init__(self):
         self.symbols = DEFAULT_SYMBOLS.copy()
+        self.next_variable_address = FIRST_VARIABLE_ADDRESS
+        # ROM addresses of the labels in the program
+        self.label_addresses = set()
 
     def add_entry(self, symbol: str, address: int):
         self.symbols[symbol] = address
 
+    def add_label(self, symbol: str, address: int):
+        self.label_addresses.add(address)
+        self.add_entry(symbol, address)
+
+    def add_variable(self, symbol: str):
+        address = self.next_variable_address
+        self.next_variable_address += 1
+        self.add_entry(symbol, address)
+        return address
+
     def contains(self, symbol: str):
         return symbol in self.symbols
 
@@ -12,6 +25,8 @@ class SymbolTable:
         return self.symbols[symbol]
 
 
+FIRST_VARIABLE_ADDRESS = 16
+
 DEFAULT_SYMBOLS = {
     "SP": 0,
     "LCL": 1,
@@ -0,0 +1,103 @@
+from pathlib import Path
+
+import pytest
+
+import assembler
+
+from assembler import assemble, assemble_cached, assemble_packed, assemble_single_pass, assemble_stream
+from assembly_cache import AssemblyCache
+from hack_binary import HackBinary
+
+FIXTURES_PATH = Path(__file__).parent / "fixtures"
+
+
+def test_assemble():
+    input_lines = ["@2", "D=A", "@3", "D=D+A", "@0", "M=D"]
+
+    assert assemble(input_lines) == [
+        "0000000000000010",
+        "1110110000010000",
+        "0000000000000011",
+        "1110000010010000",
+        "0000000000000000",
+        "1110001100001000",
+    ]
+
+
+def test_assemble_labels_and_variables():
+    input_lines = ["@END", "0;JMP", "@foo", "M=1", "(END)", "@bar", "@foo", "@END"]
+
+    assert assemble(input_lines) == [
+        "0000000000000100",
+        "1110101010000111",
+        "0000000000010000",
+        "1110111111001000",
+        "0000000000010001",
+        "0000000000010000",
+        "0000000000000100",
+    ]
+
+
+@pytest.mark.parametrize("asm_file", sorted(FIXTURES_PATH.glob("*.asm")), ids=lambda p: p.name)
+def test_single_pass_matches_two_pass(asm_file):
+    input_lines = asm_file.read_text().splitlines()
+
+    assert assemble_single_pass(input_lines) == assemble(input_lines)
+
+
+def test_address_out_of_range():
+    with pytest.raises(Exception, match="address out of range"):
+        assemble(["@32768"])
+
+
+def test_assemble_stream(tmp_path):
+    asm_file = FIXTURES_PATH / "Max.asm"
+    hack_file = tmp_path / "Max.hack"
+    hackb_file = tmp_path / "Max.hackb"
+
+    with hack_file.open("w") as output, hackb_file.open("wb") as binary_output:
+        assemble_stream(asm_file_path=asm_file, output=output, binary_output=binary_output)
+
+    expected = assemble(asm_file.read_text().splitlines())
+    assert hack_file.read_text() == "\n".join(expected)
+    assert HackBinary.read(hackb_file).lines() == expected
+
+
+def test_parallel_matches_two_pass():
+    input_lines = (FIXTURES_PATH / "Pong.asm").read_text().splitlines()
+
+    assert assemble_packed(input_lines, jobs=3).words == assemble_packed(input_lines).words
+
+
+def test_assemble_cached(tmp_path, monkeypatch):
+    cache = AssemblyCache(tmp_path, version="test")
+    input_lines = (FIXTURES_PATH / "Max.asm").read_text().splitlines()
+    expected = assemble(input_lines)
+
+    assert assemble_cached(input_lines, cache=cache, source="Max.asm").lines() == expected
+
+    monkeypatch.setattr(assembler, "Parser", None)
+    assert assemble_cached(input_lines, cache=cache, source="Max.asm").lines() == expected
+
+
+def test_assemble_cached_appended_code(tmp_path, monkeypatch):
+    cache = AssemblyCache(tmp_path, version="test")
+    input_lines = ["(START)", "@i", "M=1", "@START", "0;JMP"]
+    assemble_cached(input_lines, cache=cache, source="Prog.asm")
+
+    input_lines += ["(LOOP)", "@j", "M=0", "@i", "D=M", "@LOOP", "D;JGT", "(END)", "@END", "0;JMP"]
+    expected = assemble(input_lines)
+
+    # Only the appended code should be assembled
+    monkeypatch.setattr(assembler, "assemble_packed", None)
+    assert assemble_cached(input_lines, cache=cache, source="Prog.asm").lines() == expected
+
+
+def test_assemble_cached_appended_label_used_earlier(tmp_path):
+    cache = AssemblyCache(tmp_path, version="test")
+    input_lines = ["@i", "M=1", "@LATER", "0;JMP"]
+    assemble_cached(input_lines, cache=cache, source="Prog.asm")
+
+    # LATER was a variable, and is now a label
+    input_lines += ["(LATER)", "@i", "M=0"]
+    assert assemble_cached(input_lines, cache=cache, source="Prog.asm").lines() == assemble(input_lines)
@@ -0,0 +1,40 @@
+import os
+from array import array
+
+from assembly_cache import AssemblyCache, CacheEntry
+
+
+def _entry(line_count):
+    return CacheEntry(line_count=line_count, symbols={"foo": 16}, next_variable_address=17, words=array("H", [16]))
+
+
+def test_key_depends_on_version(tmp_path):
+    assert AssemblyCache(tmp_path, version="1").key(["@1"]) != AssemblyCache(tmp_path, version="2").key(["@1"])
+
+
+def test_get_missing(tmp_path):
+    assert AssemblyCache(tmp_path, version="1").get("abc") is None
+
+
+def test_put_and_get(tmp_path):
+    cache = AssemblyCache(tmp_path, version="1")
+    key = cache.key(["@foo"])
+    cache.put(key, source="Prog.asm", entry=_entry(1))
+
+    assert cache.get(key) == _entry(1)
+    assert cache.get_latest("Prog.asm") == (key, _entry(1))
+    assert cache.get_latest("Other.asm") == (None, None)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = AssemblyCache(tmp_path, version="1", max_entries=2)
+    cache.put("a", source="A.asm", entry=_entry(1))
+    cache.put("b", source="B.asm", entry=_entry(2))
+    os.utime(tmp_path / "a.json", (1, 1))
+    os.utime(tmp_path / "b.json", (2, 2))
+    cache.get("a")
+    cache.put("c", source="C.asm", entry=_entry(3))
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
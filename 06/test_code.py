@@ -1,4 +1,4 @@
-from code_ import Code
+from code_ import COMP_TABLE, DEST_TABLE, JUMP_TABLE, Code
 
 
 def test_comp():
@@ -11,3 +11,27 @@ def test_dest():
 
 def test_jump():
     assert Code().jump("JLT") == "100"
+
+
+def test_instruction():
+    assert Code().instruction("D=D+1;JMP") == 0b1110011111010111
+
+
+def test_instruction_without_dest_or_jump():
+    assert Code().instruction("0;JMP") == 0b1110101010000111
+    assert Code().instruction("M=D") == 0b1110001100001000
+    assert Code().instruction("D") == 0b1110001100000000
+
+
+def test_instruction_table_matches_bit_strings():
+    code = Code()
+    for comp in COMP_TABLE:
+        for dest in DEST_TABLE:
+            for jump in JUMP_TABLE:
+                command = comp
+                if dest:
+                    command = f"{dest}={command}"
+                if jump:
+                    command = f"{command};{jump}"
+                expected = int(f"111{code.comp(comp)}{code.dest(dest)}{code.jump(jump)}", 2)
+                assert code.instruction(command) == expected
@@ -0,0 +1,25 @@
+from array import array
+
+from hack_binary import HackBinary, view_words
+
+
+def test_lines():
+    hack_binary = HackBinary(array("H", [2, 0b1110110000010000]))
+
+    assert hack_binary.lines() == ["0000000000000010", "1110110000010000"]
+    assert hack_binary.text == "0000000000000010\n1110110000010000"
+
+
+def test_to_bytes_is_little_endian():
+    assert HackBinary(array("H", [0x1234, 0xFFFF])).to_bytes() == b"\x34\x12\xff\xff"
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "Prog.hackb"
+    HackBinary(array("H", [1, 0x8000, 0xEC10])).write(path)
+
+    assert HackBinary.read(path).words == array("H", [1, 0x8000, 0xEC10])
+
+
+def test_view_words():
+    assert list(view_words(b"\x34\x12\xff\xff")) == [0x1234, 0xFFFF]
@@ -0,0 +1,151 @@
+from pathlib import Path
+
+from assembler import assemble_packed
+from hack_cpu import HackCPU
+from symbol_table import SymbolTable
+
+PROGRAMS_PATH = Path(__file__).parent.parent / "04"
+
+
+def _load(asm_file):
+    cpu = HackCPU()
+    cpu.load_words(assemble_packed(asm_file.read_text().splitlines()).words)
+    return cpu
+
+
+def test_add():
+    cpu = _load(Path(__file__).parent / "fixtures" / "Add.asm")
+    cpu.run(100)
+
+    assert cpu.ram[0] == 5
+
+
+def test_mult():
+    cpu = _load(PROGRAMS_PATH / "mult" / "Mult.asm")
+    cpu.ram[0] = 7
+    cpu.ram[1] = -3
+    cpu.ram[2] = 1234
+    cpu.run(10000)
+
+    assert cpu.halted is True
+    assert cpu.ram[2] == 0
+
+    cpu.reset()
+    cpu.ram[0] = 123
+    cpu.ram[1] = 45
+    cpu.run(10000)
+    assert cpu.halted is True
+    assert cpu.ram[2] == 5535
+
+
+def test_max():
+    cpu = _load(Path(__file__).parent / "fixtures" / "Max.asm")
+    cpu.ram[0] = -5
+    cpu.ram[1] = -9
+    cpu.run(1000)
+
+    assert cpu.halted is True
+    assert cpu.ram[2] == -5
+
+
+def test_fill():
+    cpu = _load(PROGRAMS_PATH / "fill" / "Fill.asm")
+    cpu.ram[0x6000] = 65
+    cpu.run(200000)
+
+    assert set(cpu.ram[0x4000:0x6000]) == {-1}
+
+
+def test_arithmetic_wraps_to_16_bits():
+    cpu = HackCPU()
+    cpu.load_text("\n".join(assemble_packed(["@32767", "D=A", "D=D+1", "@0", "M=D"]).lines()))
+    cpu.run(5)
+
+    assert cpu.ram[0] == -32768
+
+
+def test_run_stops_after_max_cycles():
+    cpu = _load(PROGRAMS_PATH / "fill" / "Fill.asm")
+
+    assert cpu.run(1000) == 1000
+    assert cpu.cycles == 1000
+    assert cpu.halted is False
+
+
+def test_load_file(tmp_path):
+    hackb_file = tmp_path / "Add.hackb"
+    assemble_packed((Path(__file__).parent / "fixtures" / "Add.asm").read_text().splitlines()).write(hackb_file)
+
+    cpu = HackCPU()
+    cpu.load_file(hackb_file)
+    cpu.run(100)
+    assert cpu.ram[0] == 5
+
+
+def test_run_decoding_matches_run():
+    predecoded = _load(PROGRAMS_PATH / "mult" / "Mult.asm")
+    decoding = _load(PROGRAMS_PATH / "mult" / "Mult.asm")
+    for cpu in [predecoded, decoding]:
+        cpu.ram[0] = 123
+        cpu.ram[1] = 45
+    predecoded.run(10000)
+    decoding.run_decoding(10000)
+
+    assert decoding.halted is True
+    assert decoding.cycles == predecoded.cycles
+    assert decoding.ram == predecoded.ram
+
+
+def test_alu_combination_without_mnemonic():
+    cpu = HackCPU()
+    # D=5, then D=!(D&A) with A=12, which has no comp mnemonic
+    comp_bits = 0b0000001
+    cpu.load_words([5, 0b1110110000010000, 12, 0b1110000000010000 | comp_bits << 6])
+    cpu.run(4)
+
+    assert cpu.d == ~(5 & 12)
+
+
+def _load_with_labels(asm_file):
+    symbol_table = SymbolTable()
+    words = assemble_packed(asm_file.read_text().splitlines(), symbol_table=symbol_table).words
+    cpu = HackCPU()
+    cpu.load_words(words, labels=symbol_table.label_addresses)
+    return cpu
+
+
+def test_run_blocks_matches_run():
+    for asm_file in [PROGRAMS_PATH / "mult" / "Mult.asm", Path(__file__).parent / "fixtures" / "Max.asm"]:
+        blocks = _load_with_labels(asm_file)
+        instructions = _load(asm_file)
+        for cpu in [blocks, instructions]:
+            cpu.ram[0] = 123
+            cpu.ram[1] = 45
+        blocks.run_blocks(10000)
+        instructions.run(10000)
+
+        assert blocks.halted is True
+        assert blocks.cycles == instructions.cycles
+        assert blocks.pc == instructions.pc
+        assert blocks.ram == instructions.ram
+
+
+def test_run_blocks_stops_after_max_cycles():
+    blocks = _load_with_labels(PROGRAMS_PATH / "fill" / "Fill.asm")
+    instructions = _load(PROGRAMS_PATH / "fill" / "Fill.asm")
+    blocks.ram[0x6000] = instructions.ram[0x6000] = 65
+
+    assert blocks.run_blocks(12345) == instructions.run(12345) == 12345
+    assert (blocks.a, blocks.d, blocks.pc) == (instructions.a, instructions.d, instructions.pc)
+    assert blocks.ram == instructions.ram
+    assert blocks.halted is False
+
+
+def test_run_blocks_without_labels():
+    cpu = _load(PROGRAMS_PATH / "mult" / "Mult.asm")
+    cpu.ram[0] = 7
+    cpu.ram[1] = 6
+    cpu.run_blocks(10000)
+
+    assert cpu.halted is True
+    assert cpu.ram[2] == 42
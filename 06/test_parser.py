@@ -1,6 +1,6 @@
 from pathlib import Path
 
-from parser import CommandType, Parser
+from parser import Command, CommandType, Parser, iter_commands
 
 FIXTURES_PATH = Path(__file__).parent / "fixtures"
 
@@ -16,6 +16,10 @@ def test_parser_removes_whitespace_and_comments():
     assert parser.commands == expected_commands
 
 
+def test_iter_commands_ignores_line_endings():
+    assert list(iter_commands(["// comment\n", "@2 // two\r\n", "\n", "D = A\n"])) == ["@2", "D=A"]
+
+
 def test_has_more_commands():
     assert Parser(["@1234", "D=A"]).has_more_commands() is True
 
@@ -72,3 +76,11 @@ def test_jump():
 
 def test_jump_none():
     assert Parser(["D=D+1"]).jump() is None
+
+
+def test_parse_all():
+    assert Parser(["@i", "(LOOP)", "AM=M-1;JGT"]).parse_all() == [
+        Command(type=CommandType.A_COMMAND, symbol="i", dest=None, comp=None, jump=None, text="@i"),
+        Command(type=CommandType.L_COMMAND, symbol="LOOP", dest=None, comp=None, jump=None, text="(LOOP)"),
+        Command(type=CommandType.C_COMMAND, symbol=None, dest="AM", comp="M-1", jump="JGT", text="AM=M-1;JGT"),
+    ]
@@ -9,3 +9,20 @@ def test_symbol_table():
     table.add_entry("foo", 12)
     assert table.contains("foo") is True
     assert table.get_address("foo") == 12
+
+
+def test_add_variable():
+    table = SymbolTable()
+
+    assert table.add_variable("foo") == 16
+    assert table.add_variable("bar") == 17
+    assert table.get_address("foo") == 16
+    assert table.next_variable_address == 18
+
+
+def test_add_label():
+    table = SymbolTable()
+    table.add_label("LOOP", 4)
+
+    assert table.get_address("LOOP") == 4
+    assert table.label_addresses == {4}
@@ -0,0 +1,454 @@
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List
+
+import click
+
+from code_writer import CodeWriter
+from command_type import CommandType
+from parser import Parser
+from vm_emulator import VMEmulator, compile_program, read_vmb, write_vmb
+from vm_emulator.fusion import fuse as fuse_bytecode
+from translation_cache import TranslationCache
+from vm_translator import TRANSLATOR_VERSION, link, translate_file, translate_files, write_asm
+
+REPOSITORY_PATH = Path(__file__).parent.parent
+
+# Starts the chapter 12 OS classes written in Jack, which the emulator runs as VM code like the rest of the program
+JACK_OS_SYS_JACK = """
+class Sys {
+    function void init() {
+        do Memory.init();
+        do Math.init();
+        do Screen.init();
+        do Output.init();
+        do Main.main();
+        do Sys.halt();
+        return;
+    }
+}
+"""
+JACK_OS_CLASSES = ["Array.jack", "Math.jack", "Memory.jack"]
+# For programs that also use the native String class, whose allocations would overlap 12/Memory.jack's heap
+JACK_OS_CLASSES_WITH_NATIVE_MEMORY = ["Array.jack", "Math.jack", "Output.jack"]
+
+# Guesses that win 09/Hangman
+HANGMAN_KEYS = "XYZBAN"
+
+MATH_TEST_RESULTS = [6, -180, -18000, -18000, 0, 3, -3000, 0, 3, 181, 123, 123, 27, 32767]
+STRING_TEST_OUTPUT = (
+    "new,appendChar: abcde\n"
+    "setInt: 12345\n"
+    "setInt: -32767\n"
+    "length: 5\n"
+    "charAt[2]: 99\n"
+    "setCharAt(2,'-'): ab-de\n"
+    "eraseLastChar: ab-d\n"
+    "intValue: 456\n"
+    "intValue: -32123\n"
+    "backSpace: 129\n"
+    "doubleQuote: 34\n"
+    "newLine: 128\n"
+)
+
+
+def generate_vm_program(lines: int):
+    """
+    Generate a synthetic .vm file of about the given number of lines, with comments, blank lines and inline comments
+    """
+    block = [
+        "// push the arguments",
+        "push argument 0",
+        "push constant 7    // inline comment",
+        "add",
+        "",
+        "pop local 0\t// tab before an inline comment",
+        "label LOOP",
+        "push local 0",
+        "if-goto LOOP",
+        "call Main.f 2",
+    ]
+    return (block * (lines // len(block) + 1))[:lines]
+
+
+def best_of(repeat, func, *args, **kwargs):
+    """
+    Run func repeat times and return the fastest wall time in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _parse_all(vm_lines):
+    parser_ = Parser(commands=vm_lines)
+    while parser_.has_more_commands():
+        parser_.advance()
+        if parser_.command_type() != CommandType.C_ARITHMETIC:
+            parser_.arg1()
+
+
+@click.group()
+def cli():
+    """VM translator benchmarks"""
+
+
+@cli.command()
+@click.option("--lines", default=200_000, show_default=True, help="Number of lines in the largest .vm file")
+@click.option("--repeat", default=3, show_default=True)
+def parser(lines, repeat):
+    """Check that parsing scales linearly with the number of lines"""
+    sizes = [lines // 8, lines // 4, lines // 2, lines]
+    per_line = {}
+    for size in sizes:
+        run_time = best_of(repeat, _parse_all, generate_vm_program(size))
+        per_line[size] = run_time / size
+        click.echo(f"{size:>8} lines: {run_time:.3f}s, {per_line[size] * 1e6:.2f}us per line")
+
+    # Quadratic parsing would take 8x as long per line on the largest file as on the smallest
+    ratio = per_line[sizes[-1]] / per_line[sizes[0]]
+    assert ratio < 3, f"time per line grew {ratio:.2f}x from {sizes[0]} to {sizes[-1]} lines"
+    click.echo(f"time per line grew {ratio:.2f}x")
+
+
+def _compile_jack(directory: Path, jack_files: List[Path], jack_os_classes: List[str] = ()):
+    """
+    Compile jack_files into directory, with the chapter 12 OS classes in jack_os_classes
+    """
+    directory.mkdir()
+    for jack_file in jack_files:
+        (directory / jack_file.name).write_text(jack_file.read_text())
+    if jack_os_classes:
+        for jack_file in jack_os_classes:
+            (directory / jack_file).write_text((REPOSITORY_PATH / "12" / jack_file).read_text())
+        (directory / "Sys.jack").write_text(JACK_OS_SYS_JACK)
+    subprocess.run(
+        [sys.executable, "jack_compiler.py", str(directory)],
+        cwd=REPOSITORY_PATH / "11",
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return directory
+
+
+def _test_main(test_name: str):
+    """
+    The Main class of a chapter 12 test program, without the OS class it tests
+    """
+    return [REPOSITORY_PATH / "12" / test_name / "Main.jack"]
+
+
+def _run_emulator(directory: Path, max_commands: int, keys: str = "", fuse: bool = True):
+    """
+    Run the program in directory on a new emulator, and return the emulator and how long running it took
+    """
+    emulator = VMEmulator(fuse=fuse)
+    emulator.load_directory(directory)
+    emulator.os_classes["Keyboard"].keys.extend(ord(c) for c in keys)
+    start = time.perf_counter()
+    emulator.run(max_commands)
+    run_time = time.perf_counter() - start
+    assert emulator.halted, f"{directory.name} didn't halt in {max_commands} commands"
+    return emulator, run_time
+
+
+def _check_math_test(emulator: VMEmulator):
+    results = list(emulator.ram[8000 : 8000 + len(MATH_TEST_RESULTS)])
+    assert results == MATH_TEST_RESULTS, f"MathTest wrote {results}"
+
+
+def _check_string_test(emulator: VMEmulator):
+    output = "".join(emulator.os_classes["Output"].text)
+    assert output == STRING_TEST_OUTPUT, f"StringTest printed {output!r}"
+
+
+def _run_repeatedly(directory: Path, max_commands: int, min_commands: int):
+    """
+    Run the program in directory on new emulators until at least min_commands have been executed in total
+
+    Some test programs finish in a few hundred commands, too quickly to time one run. Returns the last emulator, the
+    commands executed in total, and how long running them took, leaving out loading the program. The program is
+    compiled and fused once, as each emulator starts with a fresh OS.
+    """
+    bytecode = fuse_bytecode(compile_program(sorted(directory.glob("*.vm"))))
+    executed = 0
+    run_time = 0.0
+    while executed < min_commands:
+        emulator = VMEmulator(fuse=False)
+        emulator.load_bytecode(bytecode)
+        start = time.perf_counter()
+        emulator.run(max_commands)
+        run_time += time.perf_counter() - start
+        assert emulator.halted, f"{directory.name} didn't halt in {max_commands} commands"
+        executed += emulator.executed
+    return emulator, executed, run_time
+
+
+@cli.command()
+@click.option("--max-commands", default=10_000_000, show_default=True, help="Commands to run each program for at most")
+@click.option(
+    "--min-commands", default=1_000_000, show_default=True, help="Commands to run each program for in total, at least"
+)
+@click.option("--repeat", default=3, show_default=True)
+def emulator(max_commands, min_commands, repeat):
+    """VM commands per second running the chapter 12 test programs on the VM emulator"""
+    # StringTest only runs on the native OS, as 12/String.jack lays strings out differently to the native Output class
+    programs = [("MathTest", _check_math_test, False), ("MathTest", _check_math_test, True)]
+    programs.append(("StringTest", _check_string_test, False))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for test_name, check, jack_os in programs:
+            directory = Path(tmp_dir) / f"{test_name}{'JackOS' if jack_os else ''}"
+            _compile_jack(directory, _test_main(test_name), JACK_OS_CLASSES if jack_os else [])
+            emulator_, _ = _run_emulator(directory, max_commands)
+            check(emulator_)
+            rates = []
+            for _ in range(repeat):
+                _, executed, run_time = _run_repeatedly(directory, max_commands, min_commands)
+                rates.append(executed / run_time)
+            os_name = "Jack OS" if jack_os else "native OS"
+            click.echo(
+                f"{test_name:<10} {os_name:<9}: {emulator_.executed:>8} commands per run, "
+                f"{max(rates):,.0f} commands/s over at least {min_commands} commands"
+            )
+
+
+@cli.command()
+@click.option("--repeat", default=10, show_default=True)
+def bytecode(repeat):
+    """Time loading programs from .vm files, which are parsed and compiled, against loading them from .vmb files"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        programs = {
+            "MathTest": _compile_jack(Path(tmp_dir) / "MathTest", _test_main("MathTest"), JACK_OS_CLASSES),
+            "StringTest": _compile_jack(Path(tmp_dir) / "StringTest", _test_main("StringTest")),
+            "Hangman": _compile_jack(
+                Path(tmp_dir) / "Hangman", sorted((REPOSITORY_PATH / "09" / "Hangman").glob("*.jack"))
+            ),
+        }
+        for name, directory in programs.items():
+            vm_files = sorted(directory.glob("*.vm"))
+            vmb_file = directory / f"{name}.vmb"
+            bytecode_ = compile_program(vm_files)
+            write_vmb(bytecode_, vmb_file)
+            assert read_vmb(vmb_file) == bytecode_, f"{name} changed when written to a .vmb file"
+
+            compile_time = best_of(repeat, compile_program, vm_files)
+            read_time = best_of(repeat, read_vmb, vmb_file)
+            vm_size = sum(vm_file.stat().st_size for vm_file in vm_files)
+            click.echo(
+                f"{name:<10}: {vm_size:>6} bytes of .vm parsed in {compile_time * 1000:.2f}ms, "
+                f"{vmb_file.stat().st_size:>6} bytes of .vmb read in {read_time * 1000:.2f}ms "
+                f"({compile_time / read_time:.0f}x faster)"
+            )
+
+
+def _fusion_programs(tmp_dir: Path):
+    """
+    The programs superinstructions were chosen for, as directories of .vm files and the keys they read
+    """
+    jack_os_tests = ["ArrayTest", "MathTest", "MemoryTest", "OutputTest", "StringTest"]
+    programs = {
+        test_name: (_compile_jack(tmp_dir / test_name, _test_main(test_name), JACK_OS_CLASSES_WITH_NATIVE_MEMORY), "")
+        for test_name in jack_os_tests
+    }
+    # 12/Screen.jack takes hundreds of millions of commands to draw the picture
+    programs["ScreenTest"] = (_compile_jack(tmp_dir / "ScreenTest", _test_main("ScreenTest")), "")
+    hangman_files = sorted((REPOSITORY_PATH / "09" / "Hangman").glob("*.jack"))
+    hangman = _compile_jack(tmp_dir / "Hangman", hangman_files, JACK_OS_CLASSES_WITH_NATIVE_MEMORY)
+    programs["Hangman"] = (hangman, HANGMAN_KEYS)
+    return programs
+
+
+def _emulator_state(emulator: VMEmulator):
+    """
+    RAM and the output of a finished program, leaving out the stack above SP
+
+    Superinstructions don't leave the intermediate values of the instructions they replace above the top of the stack.
+    """
+    ram = emulator.ram
+    return list(ram[: ram[0]]) + list(ram[2048:]), emulator.os_classes["Output"].text
+
+
+@cli.command()
+@click.option("--max-commands", default=100_000_000, show_default=True, help="Commands to run each program for at most")
+@click.option("--repeat", default=1, show_default=True)
+def fusion(max_commands, repeat):
+    """Dispatches and wall time running the chapter 12 OS tests and Hangman, with and without superinstructions"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        totals = {False: [0, 0.0], True: [0, 0.0]}
+        for name, (directory, keys) in _fusion_programs(Path(tmp_dir)).items():
+            results = {}
+            for fuse in [False, True]:
+                emulator_, _ = _run_emulator(directory, max_commands, keys, fuse)
+                run_time = min(_run_emulator(directory, max_commands, keys, fuse)[1] for _ in range(repeat))
+                results[fuse] = emulator_, run_time
+                totals[fuse][0] += emulator_.executed
+                totals[fuse][1] += run_time
+            (plain, plain_time), (fused, fused_time) = results[False], results[True]
+            assert _emulator_state(plain) == _emulator_state(fused), f"{name} ended differently with superinstructions"
+            click.echo(
+                f"{name:<10}: {plain.executed:>9} dispatches in {plain_time:.3f}s, "
+                f"fused {fused.executed:>9} dispatches in {fused_time:.3f}s ({plain_time / fused_time:.2f}x faster)"
+            )
+        (plain_dispatches, plain_time), (fused_dispatches, fused_time) = totals[False], totals[True]
+        click.echo(
+            f"{'total':<10}: {plain_dispatches:>9} dispatches in {plain_time:.3f}s, "
+            f"fused {fused_dispatches:>9} dispatches in {fused_time:.3f}s ({plain_time / fused_time:.2f}x faster)"
+        )
+
+
+def _os_program(tmp_dir: Path):
+    """
+    A directory of .vm files for Hangman and every chapter 12 OS class
+    """
+    jack_files = sorted((REPOSITORY_PATH / "09" / "Hangman").glob("*.jack")) + sorted(
+        (REPOSITORY_PATH / "12").glob("*.jack")
+    )
+    return _compile_jack(tmp_dir / "Hangman", jack_files)
+
+
+@cli.command()
+@click.option("--copies", default=8, show_default=True, help="Copies of each .vm file to translate")
+@click.option("--repeat", default=3, show_default=True)
+def translate(copies, repeat):
+    """Time translating Hangman and the OS with a process pool, against one process"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        vm_files = sorted(_os_program(Path(tmp_dir)).glob("*.vm"))
+        # Copies are translated the same way as the originals, just making the job bigger
+        for i in range(1, copies):
+            for vm_file in vm_files:
+                copy = vm_file.with_name(f"{vm_file.stem}{i}.vm")
+                copy.write_text(vm_file.read_text())
+        vm_files = sorted(Path(tmp_dir, "Hangman").glob("*.vm"))
+        click.echo(f"{len(vm_files)} files, {sum(len(f.read_text().splitlines()) for f in vm_files)} lines")
+
+        expected = link(translate_files(vm_files, compact=False), compact=False)
+        for jobs in [1, 2, 4]:
+            assert link(translate_files(vm_files, compact=False, jobs=jobs), compact=False) == expected
+            run_time = best_of(repeat, lambda: list(translate_files(vm_files, compact=False, jobs=jobs)))
+            click.echo(f"jobs={jobs}: {run_time:.3f}s")
+
+
+def _build_cached(vm_files: List[Path], cache: TranslationCache):
+    return link(translate_files(vm_files, compact=False, cache=cache), compact=False)
+
+
+@cli.command()
+@click.option("--repeat", default=3, show_default=True)
+def cache(repeat):
+    """Time rebuilding Hangman and the OS with cached translations, after changing one file"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        vm_files = sorted(_os_program(Path(tmp_dir)).glob("*.vm"))
+        expected = link(translate_files(vm_files, compact=False), compact=False)
+        cold_time = best_of(repeat, lambda: link(translate_files(vm_files, compact=False), compact=False))
+
+        cache_ = TranslationCache(directory=Path(tmp_dir) / "cache", version=TRANSLATOR_VERSION)
+        assert _build_cached(vm_files, cache_) == expected
+        warm_time = best_of(repeat, _build_cached, vm_files, cache_)
+
+        # Change one file each time, so it is never in the cache
+        changed_file = vm_files[0]
+        original_text = changed_file.read_text()
+        changes = iter(range(repeat + 1))
+
+        def build_after_change():
+            changed_file.write_text(f"{original_text}\n// change {next(changes)}\n")
+            return _build_cached(vm_files, cache_)
+
+        assert build_after_change() == expected
+        changed_time = best_of(repeat, build_after_change)
+
+        click.echo(f"{len(vm_files)} files")
+        click.echo(f"no cache:            {cold_time * 1000:.1f}ms")
+        click.echo(f"all cached:          {warm_time * 1000:.1f}ms")
+        click.echo(f"one file changed:    {changed_time * 1000:.1f}ms")
+
+
+def _write_commands(vm_commands):
+    code_writer = CodeWriter()
+    for command, segment, index in vm_commands:
+        if command is None:
+            code_writer.write_arithmetic(segment)
+        else:
+            code_writer.write_push_pop(command=command, segment=segment, index=index)
+    return code_writer.get_output()
+
+
+@cli.command()
+@click.option("--repeat", default=5, show_default=True)
+def codewriter(repeat):
+    """Time writing the assembly for the push, pop and arithmetic commands of Hangman and the OS"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        vm_files = sorted(_os_program(Path(tmp_dir)).glob("*.vm"))
+        vm_commands = []
+        vm_lines = 0
+        for vm_file in vm_files:
+            parser_ = Parser(commands=vm_file.read_text().splitlines())
+            vm_lines += len(parser_.commands)
+            while parser_.has_more_commands():
+                parser_.advance()
+                command_type = parser_.command_type()
+                if command_type == CommandType.C_ARITHMETIC:
+                    vm_commands.append((None, parser_.arg1(), None))
+                elif command_type in (CommandType.C_PUSH, CommandType.C_POP):
+                    vm_commands.append((command_type, parser_.arg1(), parser_.arg2()))
+
+        write_time = best_of(repeat, _write_commands, vm_commands)
+        translate_time = best_of(repeat, lambda: link(translate_files(vm_files, compact=False), compact=False))
+        click.echo(f"{len(vm_files)} files, {vm_lines} commands, {len(vm_commands)} push, pop or arithmetic")
+        click.echo(
+            f"push/pop/arithmetic: {write_time * 1000:.1f}ms, {len(vm_commands) / write_time / 1000:.0f}K commands/s"
+        )
+        click.echo(
+            f"whole translation:   {translate_time * 1000:.1f}ms, {vm_lines / translate_time / 1000:.0f}K lines/s"
+        )
+
+
+def peak_memory(func, *args, **kwargs):
+    """
+    Run func and return the peak memory allocated while it ran, in bytes
+    """
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def _translate_in_memory(vm_file: Path):
+    asm_commands = link([translate_file(vm_file, compact=False)], compact=False)
+    vm_file.with_suffix(".asm").write_text("\n".join(asm_commands))
+
+
+def _translate_streaming(vm_file: Path):
+    write_asm(vm_file.with_suffix(".asm"), [vm_file], compact=False, optimize=False)
+
+
+@cli.command()
+@click.option("--lines", default=200_000, show_default=True, help="Number of lines in the largest .vm file")
+def memory(lines):
+    """Compare peak memory of translating to a list of lines and streaming to the .asm file"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        vm_file = Path(tmp_dir) / "Prog.vm"
+        for size in [lines // 4, lines // 2, lines]:
+            vm_file.write_text("\n".join(generate_vm_program(size)))
+            in_memory_peak = peak_memory(_translate_in_memory, vm_file)
+            in_memory_output = vm_file.with_suffix(".asm").read_text()
+            streaming_peak = peak_memory(_translate_streaming, vm_file)
+            assert vm_file.with_suffix(".asm").read_text() == in_memory_output
+            click.echo(
+                f"{size:>8} lines: in memory {in_memory_peak / 1024:>8.0f} KiB peak, "
+                f"streaming {streaming_peak / 1024:>6.0f} KiB peak"
+            )
+
+
+if __name__ == "__main__":
+    cli()
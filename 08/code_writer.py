@@ -1,9 +1,133 @@
+from functools import lru_cache
+from typing import Optional, TextIO
+
 from command_type import CommandType
 
 
+# The jump that makes each comparison true
+COMPARISON_JUMPS = {"eq": "JEQ", "gt": "JGT", "lt": "JLT"}
+
+DEFAULT_CHUNK_LINES = 4096
+
+# Rendered push and pop commands that are kept, as a few like push constant 0 make up much of every program
+RENDERED_CACHE_SIZE = 1024
+
+# Dereference stack pointer and store D into stack, then increment stack pointer
+PUSH_D = ["@SP", "A=M", "M=D", "@SP", "M=M+1"]
+# Decrement stack pointer, and get value from top of stack and store in d
+POP_D = ["@SP", "M=M-1", "A=M", "D=M"]
+# Apply the operation in D and the value below in the stack, then decrement stack pointer
+BINARY_OPERATION = ["@SP", "A=M-1", "D=M", "A=A-1", "{operation}", "@SP", "M=M-1"]
+# Apply the operation to the value at the top of the stack
+UNARY_OPERATION = ["@SP", "A=M-1", "{operation}"]
+
+
+def _push_segment(base, base_value):
+    # Get address of segment, index into it and read the value at the index
+    return [f"@{base}", f"D={base_value}", "@{index}", "A=D+A", "D=M"] + PUSH_D
+
+
+def _pop_segment(base, base_value):
+    # Store address of index in segment in R13, then store the value from top of stack there
+    return [f"@{base}", f"D={base_value}", "@{index}", "D=D+A", "@R13", "M=D"] + POP_D + ["@R13", "A=M", "M=D"]
+
+
+# The assembly for each command, precompiled into one string with the index, or static symbol, left to fill in
+PUSH_TEMPLATES = {
+    segment: "\n".join(["// push " + segment + " {index}"] + lines)
+    for segment, lines in {
+        "constant": ["@{index}", "D=A"] + PUSH_D,
+        "local": _push_segment("LCL", "M"),
+        "argument": _push_segment("ARG", "M"),
+        "this": _push_segment("THIS", "M"),
+        "that": _push_segment("THAT", "M"),
+        "temp": _push_segment("5", "A"),
+        "pointer": _push_segment("3", "A"),
+        "static": ["@{symbol}", "D=M"] + PUSH_D,
+    }.items()
+}
+POP_TEMPLATES = {
+    segment: "\n".join(["// pop " + segment + " {index}"] + lines)
+    for segment, lines in {
+        "local": _pop_segment("LCL", "M"),
+        "argument": _pop_segment("ARG", "M"),
+        "this": _pop_segment("THIS", "M"),
+        "that": _pop_segment("THAT", "M"),
+        "temp": _pop_segment("R5", "A"),
+        "pointer": _pop_segment("R3", "A"),
+        "static": POP_D + ["@{symbol}", "M=D"],
+    }.items()
+}
+ARITHMETIC_LINES = {
+    command: tuple([f"// {command}"] + [line.format(operation=operation) for line in lines])
+    for command, lines, operation in [
+        ("add", BINARY_OPERATION, "M=D+M"),
+        ("sub", BINARY_OPERATION, "M=M-D"),
+        ("and", BINARY_OPERATION, "M=D&M"),
+        ("or", BINARY_OPERATION, "M=D|M"),
+        ("neg", UNARY_OPERATION, "M=-M"),
+        ("not", UNARY_OPERATION, "M=!M"),
+    ]
+}
+
+
+@lru_cache(maxsize=RENDERED_CACHE_SIZE)
+def render_template(template: str, index, symbol: str):
+    """
+    The lines of a push or pop template for index
+    """
+    return tuple(template.format(index=index, symbol=symbol).split("\n"))
+
+
+class StreamOutput:
+    """
+    Buffers lines of output, and writes them to a text stream in chunks, once chunk_lines of them have built up
+
+    Lines are separated by newlines, with none after the last, the same as joining every line at the end. Lines can
+    only be added, as the ones already written can't be taken back.
+    """
+
+    def __init__(self, stream: TextIO, chunk_lines: int = DEFAULT_CHUNK_LINES):
+        self.stream = stream
+        self.chunk_lines = chunk_lines
+        self.lines = []
+        self.lines_written = 0
+
+    def append(self, line):
+        self.lines.append(line)
+        if len(self.lines) >= self.chunk_lines:
+            self.flush()
+
+    def extend(self, lines):
+        self.lines.extend(lines)
+        if len(self.lines) >= self.chunk_lines:
+            self.flush()
+
+    def flush(self):
+        if not self.lines:
+            return
+        if self.lines_written:
+            self.stream.write("\n")
+        self.stream.write("\n".join(self.lines))
+        self.lines_written += len(self.lines)
+        self.lines = []
+
+
 class CodeWriter:
-    def __init__(self):
-        self.output = []
+    """
+    Writes Hack assembly for VM commands
+
+    In compact mode, call, return and the comparisons jump to routines that are written once, after the bootstrap
+    code, instead of being written out in full every time. Programs are much smaller, at the cost of a few more
+    instructions run per command.
+
+    If a stream is given, the output is written to it as it goes instead of being kept. Call flush() once everything
+    has been written. One CodeWriter can translate several files, one after another, with set_file_name() before each.
+    """
+
+    def __init__(self, compact=False, stream: Optional[TextIO] = None):
+        self.compact = compact
+        self.output = [] if stream is None else StreamOutput(stream)
         self.file_name = ""
         self.function_name = ""
         self.label_counter = 0
@@ -12,20 +136,34 @@ class CodeWriter:
     def get_output(self):
         return self.output
 
+    def flush(self):
+        if isinstance(self.output, StreamOutput):
+            self.output.flush()
+
+    def write_fragment(self, fragment):
+        """
+        Write the assembly of a file translated by another CodeWriter, e.g. in another process or taken from a cache
+        """
+        self.output.extend(fragment)
+
     def set_file_name(self, file_name):
+        # Start each file afresh, so it's translated the same as by a CodeWriter of its own
         self.file_name = file_name
+        self.function_name = ""
         self.label_counter = 0
+        self.return_counter = 0
 
     def set_function_name(self, function_name):
         self.function_name = function_name
 
     def new_label(self):
-        label = f"DAN{self.label_counter}DAN"
+        label = f"{self.file_name}$DAN{self.label_counter}DAN"
         self.label_counter += 1
         return label
 
     def new_return_label(self):
-        label = f"{self.function_name}$ret.{self.return_counter}"
+        # Calls outside of any function are namespaced by the file instead, so files never share return labels
+        label = f"{self.function_name or self.file_name}$ret.{self.return_counter}"
         self.return_counter += 1
         return label
 
@@ -33,501 +171,60 @@ class CodeWriter:
         return f"@{self.file_name}.{index}"
 
     def write_arithmetic(self, command):
-        self.output.append(f"// {command}")
-        match command:
-            case "add":
-                self.output.extend(
-                    [
-                        # Get value from top of stack, load into D
-                        "@SP",
-                        "A=M-1",
-                        "D=M",
-                        # Add D to value below in stack
-                        "A=A-1",
-                        "M=D+M",
-                        # Decrement stack pointer,
-                        "@SP",
-                        "M=M-1",
-                    ]
-                )
-            case "sub":
-                self.output.extend(
-                    [
-                        # Get value from top of stack, load into D
-                        "@SP",
-                        "A=M-1",
-                        "D=M",
-                        # Sub D from value below in stack
-                        "A=A-1",
-                        "M=M-D",
-                        # Decrement stack pointer,
-                        "@SP",
-                        "M=M-1",
-                    ]
-                )
-            case "neg":
-                self.output.extend(
-                    [
-                        # Get value from top of stack
-                        "@SP",
-                        "A=M-1",
-                        # Apply arithmetic negation
-                        "M=-M",
-                    ]
-                )
-            case "eq":
-                done_label = self.new_label()
-                self.output.extend(
-                    [
-                        # Get value from top of stack, load into D
-                        "@SP",
-                        "A=M-1",
-                        "D=M",
-                        # Do x - y, store result in D
-                        "A=A-1",
-                        "D=M-D",
-                        # Set initial result to true (-1)
-                        "M=-1",
-                        # Decrement stack pointer,
-                        "@SP",
-                        "M=M-1",
-                        # We are done if x - y == 0
-                        f"@{done_label}",
-                        "D;JEQ",
-                        # Otherwise result is false (0)
-                        "@SP",
-                        "A=M-1",
-                        "M=0",
-                        f"({done_label})",
-                    ]
-                )
-            case "gt":
-                done_label = self.new_label()
-                self.output.extend(
-                    [
-                        # Get value from top of stack, load into D
-                        "@SP",
-                        "A=M-1",
-                        "D=M",
-                        # Do x - y, store result in D
-                        "A=A-1",
-                        "D=M-D",
-                        # Set initial result to true (-1)
-                        "M=-1",
-                        # Decrement stack pointer,
-                        "@SP",
-                        "M=M-1",
-                        # We are done if x - y > 0
-                        f"@{done_label}",
-                        "D;JGT",
-                        # Otherwise result is false (0)
-                        "@SP",
-                        "A=M-1",
-                        "M=0",
-                        f"({done_label})",
-                    ]
-                )
-            case "lt":
-                done_label = self.new_label()
-                self.output.extend(
-                    [
-                        # Get value from top of stack, load into D
-                        "@SP",
-                        "A=M-1",
-                        "D=M",
-                        # Do x - y, store result in D
-                        "A=A-1",
-                        "D=M-D",
-                        # Set initial result to true (-1)
-                        "M=-1",
-                        # Decrement stack pointer,
-                        "@SP",
-                        "M=M-1",
-                        # We are done if x - y < 0
-                        f"@{done_label}",
-                        "D;JLT",
-                        # Otherwise result is false (0)
-                        "@SP",
-                        "A=M-1",
-                        "M=0",
-                        f"({done_label})",
-                    ]
-                )
-            case "and":
-                self.output.extend(
-                    [
-                        # Get value from top of stack, load into D
-                        "@SP",
-                        "A=M-1",
-                        "D=M",
-                        # Bitwise AND with D and value below in stack
-                        "A=A-1",
-                        "M=D&M",
-                        # Decrement stack pointer,
-                        "@SP",
-                        "M=M-1",
-                    ]
-                )
-            case "or":
-                self.output.extend(
-                    [
-                        # Get value from top of stack, load into D
-                        "@SP",
-                        "A=M-1",
-                        "D=M",
-                        # Bitwise OR with D and value below in stack
-                        "A=A-1",
-                        "M=D|M",
-                        # Decrement stack pointer,
-                        "@SP",
-                        "M=M-1",
-                    ]
-                )
-            case "not":
-                self.output.extend(
-                    [
-                        # Get value from top of stack
-                        "@SP",
-                        "A=M-1",
-                        # Apply bitwise not
-                        "M=!M",
-                    ]
-                )
-            case _:
-                raise NotImplementedError(f"Unsupported arithmetic command {command}")
+        if command in ARITHMETIC_LINES:
+            self.output.extend(ARITHMETIC_LINES[command])
+        elif command in COMPARISON_JUMPS:
+            self.output.append(f"// {command}")
+            if self.compact:
+                self.write_shared_routine_call(f"$${command.upper()}")
+            else:
+                self.output.extend(self.comparison(jump=COMPARISON_JUMPS[command], done_label=self.new_label()))
+        else:
+            raise NotImplementedError(f"Unsupported arithmetic command {command}")
+
+    @staticmethod
+    def comparison(jump, done_label):
+        return [
+            # Get value from top of stack, load into D
+            "@SP",
+            "A=M-1",
+            "D=M",
+            # Do x - y, store result in D
+            "A=A-1",
+            "D=M-D",
+            # Set initial result to true (-1)
+            "M=-1",
+            # Decrement stack pointer,
+            "@SP",
+            "M=M-1",
+            # We are done if the jump condition holds for x - y
+            f"@{done_label}",
+            f"D;{jump}",
+            # Otherwise result is false (0)
+            "@SP",
+            "A=M-1",
+            "M=0",
+            f"({done_label})",
+        ]
 
     def write_push_pop(self, command, segment, index):
         match command:
             case CommandType.C_PUSH:
-                self.output.append(f"// push {segment} {index}")
-
-                if segment == "constant":
-                    self.output.extend(
-                        [
-                            # Load constant into D register
-                            f"@{index}",
-                            "D=A",
-                            # Dereference stack pointer and store value into stack
-                            "@SP",
-                            "A=M",
-                            "M=D",
-                            # Increment stack pointer
-                            "@SP",
-                            "M=M+1",
-                        ]
-                    )
-                elif segment == "local":
-                    self.output.extend(
-                        [
-                            # Get address of local segment, store in d register
-                            "@LCL",
-                            "D=M",
-                            # Index into d
-                            f"@{index}",
-                            "A=D+A",
-                            # Read value at index
-                            "D=M",
-                            # Dereference stack pointer and store value into stack
-                            "@SP",
-                            "A=M",
-                            "M=D",
-                            # Increment stack pointer
-                            "@SP",
-                            "M=M+1",
-                        ]
-                    )
-                elif segment == "argument":
-                    self.output.extend(
-                        [
-                            # Get address of argument segment, store in d register
-                            "@ARG",
-                            "D=M",
-                            # Index into d
-                            f"@{index}",
-                            "A=D+A",
-                            # Read value at index
-                            "D=M",
-                            # Dereference stack pointer and store value into stack
-                            "@SP",
-                            "A=M",
-                            "M=D",
-                            # Increment stack pointer
-                            "@SP",
-                            "M=M+1",
-                        ]
-                    )
-                elif segment == "this":
-                    self.output.extend(
-                        [
-                            # Get address of this segment, store in d register
-                            "@THIS",
-                            "D=M",
-                            # Index into d
-                            f"@{index}",
-                            "A=D+A",
-                            # Read value at index
-                            "D=M",
-                            # Dereference stack pointer and store value into stack
-                            "@SP",
-                            "A=M",
-                            "M=D",
-                            # Increment stack pointer
-                            "@SP",
-                            "M=M+1",
-                        ]
-                    )
-                elif segment == "that":
-                    self.output.extend(
-                        [
-                            # Get address of this segment, store in d register
-                            "@THAT",
-                            "D=M",
-                            # Index into d
-                            f"@{index}",
-                            "A=D+A",
-                            # Read value at index
-                            "D=M",
-                            # Dereference stack pointer and store value into stack
-                            "@SP",
-                            "A=M",
-                            "M=D",
-                            # Increment stack pointer
-                            "@SP",
-                            "M=M+1",
-                        ]
-                    )
-                elif segment == "temp":
-                    self.output.extend(
-                        [
-                            # Set d register to base of temp segment
-                            "@5",
-                            "D=A",
-                            # Index into d
-                            f"@{index}",
-                            "A=D+A",
-                            # Read value at index
-                            "D=M",
-                            # Dereference stack pointer and store value into stack
-                            "@SP",
-                            "A=M",
-                            "M=D",
-                            # Increment stack pointer
-                            "@SP",
-                            "M=M+1",
-                        ]
-                    )
-                elif segment == "pointer":
-                    self.output.extend(
-                        [
-                            # Set d register to base of pointer segment
-                            "@3",
-                            "D=A",
-                            # Index into d
-                            f"@{index}",
-                            "A=D+A",
-                            # Read value at index
-                            "D=M",
-                            # Dereference stack pointer and store value into stack
-                            "@SP",
-                            "A=M",
-                            "M=D",
-                            # Increment stack pointer
-                            "@SP",
-                            "M=M+1",
-                        ]
-                    )
-                elif segment == "static":
-                    self.output.extend(
-                        [
-                            self.get_static_symbol(index=index),
-                            # Read value at index
-                            "D=M",
-                            # Dereference stack pointer and store value into stack
-                            "@SP",
-                            "A=M",
-                            "M=D",
-                            # Increment stack pointer
-                            "@SP",
-                            "M=M+1",
-                        ]
-                    )
-                else:
+                template = PUSH_TEMPLATES.get(segment)
+                if template is None:
                     raise NotImplementedError(f"Unsupported push segment {segment}")
-
             case CommandType.C_POP:
-                self.output.append(f"// pop {segment} {index}")
                 if segment == "constant":
                     raise Exception("Cannot pop into constant segment")
-                elif segment == "local":
-                    self.output.extend(
-                        [
-                            # Get address of local segment, store in d register
-                            "@LCL",
-                            "D=M",
-                            # Index into d
-                            f"@{index}",
-                            "D=D+A",
-                            # Store address of index in segment in R13
-                            "@R13",
-                            "M=D",
-                            # Decrement stack pointer
-                            "@SP",
-                            "M=M-1",
-                            # Get value from top of stack and store in d,
-                            "A=M",
-                            "D=M",
-                            # Reference address of index in segment
-                            "@R13",
-                            "A=M",
-                            # Store result
-                            "M=D",
-                        ]
-                    )
-                elif segment == "argument":
-                    self.output.extend(
-                        [
-                            # Get address of argument segment, store in d register
-                            "@ARG",
-                            "D=M",
-                            # Index into d
-                            f"@{index}",
-                            "D=D+A",
-                            # Store address of index in segment in R13
-                            "@R13",
-                            "M=D",
-                            # Decrement stack pointer
-                            "@SP",
-                            "M=M-1",
-                            # Get value from top of stack and store in d,
-                            "A=M",
-                            "D=M",
-                            # Reference address of index in segment
-                            "@R13",
-                            "A=M",
-                            # Store result
-                            "M=D",
-                        ]
-                    )
-                elif segment == "this":
-                    self.output.extend(
-                        [
-                            # Get address of this segment, store in d register
-                            "@THIS",
-                            "D=M",
-                            # Index into d
-                            f"@{index}",
-                            "D=D+A",
-                            # Store address of index in segment in R13
-                            "@R13",
-                            "M=D",
-                            # Decrement stack pointer
-                            "@SP",
-                            "M=M-1",
-                            # Get value from top of stack and store in d,
-                            "A=M",
-                            "D=M",
-                            # Reference address of index in segment
-                            "@R13",
-                            "A=M",
-                            # Store result
-                            "M=D",
-                        ]
-                    )
-                elif segment == "that":
-                    self.output.extend(
-                        [
-                            # Get address of that segment, store in d register
-                            "@THAT",
-                            "D=M",
-                            # Index into d
-                            f"@{index}",
-                            "D=D+A",
-                            # Store address of index in segment in R13
-                            "@R13",
-                            "M=D",
-                            # Decrement stack pointer
-                            "@SP",
-                            "M=M-1",
-                            # Get value from top of stack and store in d,
-                            "A=M",
-                            "D=M",
-                            # Reference address of index in segment
-                            "@R13",
-                            "A=M",
-                            # Store result
-                            "M=D",
-                        ]
-                    )
-                elif segment == "temp":
-                    self.output.extend(
-                        [
-                            # Get address of temp segment, store in d register
-                            "@R5",
-                            "D=A",
-                            # Index into d
-                            f"@{index}",
-                            "D=D+A",
-                            # Store address of index in segment in R13
-                            "@R13",
-                            "M=D",
-                            # Decrement stack pointer
-                            "@SP",
-                            "M=M-1",
-                            # Get value from top of stack and store in d,
-                            "A=M",
-                            "D=M",
-                            # Reference address of index in segment
-                            "@R13",
-                            "A=M",
-                            # Store result
-                            "M=D",
-                        ]
-                    )
-                elif segment == "pointer":
-                    self.output.extend(
-                        [
-                            # Get address of pointer segment, store in d register
-                            "@R3",
-                            "D=A",
-                            # Index into d
-                            f"@{index}",
-                            "D=D+A",
-                            # Store address of index in segment in R13
-                            "@R13",
-                            "M=D",
-                            # Decrement stack pointer
-                            "@SP",
-                            "M=M-1",
-                            # Get value from top of stack and store in d,
-                            "A=M",
-                            "D=M",
-                            # Reference address of index in segment
-                            "@R13",
-                            "A=M",
-                            # Store result
-                            "M=D",
-                        ]
-                    )
-                elif segment == "static":
-                    self.output.extend(
-                        [
-                            # Decrement stack pointer
-                            "@SP",
-                            "M=M-1",
-                            # Get value from top of stack and store in d,
-                            "A=M",
-                            "D=M",
-                            # Reference address of index in segment
-                            self.get_static_symbol(index=index),
-                            # Store result
-                            "M=D",
-                        ]
-                    )
-                else:
+                template = POP_TEMPLATES.get(segment)
+                if template is None:
                     raise NotImplementedError(f"Unsupported segment {segment}")
             case _:
                 raise NotImplementedError(f"Unknown push/pop command {command}")
 
+        symbol = f"{self.file_name}.{index}" if segment == "static" else ""
+        self.output.extend(render_template(template, index, symbol))
+
     def write_init(self):
         self.output.append("// init")
         self.output.extend(
@@ -542,6 +239,84 @@ class CodeWriter:
         # call Sys.init
         self.write_call("Sys.init", 0)
         self.output.extend(["// loop forever", "(END)", "@END", "0;JMP"])
+        if self.compact:
+            self.write_shared_routines()
+
+    def write_shared_routine_call(self, routine):
+        """
+        Jump to one of the shared routines of compact mode, passing the address to return to in D
+        """
+        return_address_label = self.new_return_label()
+        self.output.extend(
+            [
+                f"@{return_address_label}",
+                "D=A",
+                f"@{routine}",
+                "0;JMP",
+                f"({return_address_label})",
+            ]
+        )
+
+    def write_shared_routines(self):
+        self.output.append("// shared call routine")
+        self.output.extend(
+            [
+                "($$CALL)",
+                # push return-address, which is in D
+                "@SP",
+                "A=M",
+                "M=D",
+                "@SP",
+                "M=M+1",
+            ]
+        )
+        self.output.extend(self.push_frame())
+        self.output.extend(
+            [
+                # ARG = SP-n-5, with n in R13
+                "@R13",
+                "D=M",
+                "@5",
+                "D=D+A",
+                "@SP",
+                "D=M-D",
+                "@ARG",
+                "M=D",
+                # LCL = SP
+                "@SP",
+                "D=M",
+                "@LCL",
+                "M=D",
+                # goto f, which is in R14
+                "@R14",
+                "A=M",
+                "0;JMP",
+            ]
+        )
+
+        self.output.append("// shared return routine")
+        self.output.append("($$RETURN)")
+        self.output.extend(self.return_instructions())
+
+        for command, jump in COMPARISON_JUMPS.items():
+            routine = f"$${command.upper()}"
+            self.output.append(f"// shared {command} routine")
+            self.output.extend(
+                [
+                    f"({routine})",
+                    # Save return address
+                    "@R15",
+                    "M=D",
+                ]
+            )
+            self.output.extend(self.comparison(jump=jump, done_label=f"{routine}$DONE"))
+            self.output.extend(
+                [
+                    "@R15",
+                    "A=M",
+                    "0;JMP",
+                ]
+            )
 
     def write_label(self, label):
         self.output.append(f"// label {label}")
@@ -574,6 +349,24 @@ class CodeWriter:
 
     def write_call(self, function_name, num_args):
         self.output.append(f"// call {function_name} {num_args}")
+        if self.compact:
+            self.output.extend(
+                [
+                    # R13 = n
+                    f"@{num_args}",
+                    "D=A",
+                    "@R13",
+                    "M=D",
+                    # R14 = f
+                    f"@{function_name}",
+                    "D=A",
+                    "@R14",
+                    "M=D",
+                ]
+            )
+            self.write_shared_routine_call("$$CALL")
+            return
+
         return_address_label = self.new_return_label()
         self.output.extend(
             [
@@ -585,40 +378,9 @@ class CodeWriter:
                 "M=D",
                 "@SP",
                 "M=M+1",
-                # push LCL
-                "@LCL",
-                "D=M",
-                "@SP",
-                "A=M",
-                "M=D",
-                "@SP",
-                "M=M+1",
-                # push ARG
-                "@ARG",
-                "D=M",
-                "@SP",
-                "A=M",
-                "M=D",
-                "@SP",
-                "M=M+1",
-                # push THIS
-                "@THIS",
-                "D=M",
-                "@SP",
-                "A=M",
-                "M=D",
-                "@SP",
-                "M=M+1",
-                # push THAT
-                "@THAT",
-                "D=M",
-                "@SP",
-                "A=M",
-                "M=D",
-                "@SP",
-                "M=M+1",
             ]
         )
+        self.output.extend(self.push_frame())
         self.output.extend(
             [
                 # ARG = SP-n-5 = SP-(n+5)
@@ -647,72 +409,117 @@ class CodeWriter:
             ]
         )
 
+    @staticmethod
+    def push_frame():
+        """
+        Save the caller's LCL, ARG, THIS and THAT on the stack
+        """
+        return [
+            # push LCL
+            "@LCL",
+            "D=M",
+            "@SP",
+            "A=M",
+            "M=D",
+            "@SP",
+            "M=M+1",
+            # push ARG
+            "@ARG",
+            "D=M",
+            "@SP",
+            "A=M",
+            "M=D",
+            "@SP",
+            "M=M+1",
+            # push THIS
+            "@THIS",
+            "D=M",
+            "@SP",
+            "A=M",
+            "M=D",
+            "@SP",
+            "M=M+1",
+            # push THAT
+            "@THAT",
+            "D=M",
+            "@SP",
+            "A=M",
+            "M=D",
+            "@SP",
+            "M=M+1",
+        ]
+
     def write_return(self):
         self.output.append("// return")
-        self.output.extend(
-            [
-                # FRAME = LCL; Use R13 for FRAME var, and copy LCL into FRAME
-                "@LCL",
-                "D=M",
-                "@R13",
-                "M=D",
-                # RET = *(FRAME-5); Use R14 for RET var, copy *(FRAME - 5) into RET
-                "A=M-1",
-                "A=A-1",
-                "A=A-1",
-                "A=A-1",
-                "A=A-1",
-                "D=M",
-                "@R14",
-                "M=D",
-                # $ARG = pop(); Reposition return value for caller (copy value from top of stack to ARG)
-                "@SP",
-                "A=M-1",
-                "D=M",
-                "@ARG",
-                "A=M",
-                "M=D",
-                # SP = ARG + 1; store address of ARG + 1 in d, and set SP to d
-                "@ARG",
-                "D=M+1",
-                "@SP",
-                "M=D",
-                # THAT = *(FRAME-1)
-                "@R13",
-                "A=M-1",
-                "D=M",
-                "@THAT",
-                "M=D",
-                # THIS = *(FRAME-2)
-                "@R13",
-                "A=M-1",
-                "A=A-1",
-                "D=M",
-                "@THIS",
-                "M=D",
-                # ARG = *(FRAME-3)
-                "@R13",
-                "A=M-1",
-                "A=A-1",
-                "A=A-1",
-                "D=M",
-                "@ARG",
-                "M=D",
-                # LCL = *(FRAME-4)
-                "@R13",
-                "A=M-1",
-                "A=A-1",
-                "A=A-1",
-                "A=A-1",
-                "D=M",
-                "@LCL",
-                "M=D",
-                # goto RET
-                "@R14",
-                "A=M",
-                "0;JMP",
-            ]
-        )
+        if self.compact:
+            self.output.extend(["@$$RETURN", "0;JMP"])
+        else:
+            self.output.extend(self.return_instructions())
+
+    @staticmethod
+    def return_instructions():
+        return [
+            # FRAME = LCL; Use R13 for FRAME var, and copy LCL into FRAME
+            "@LCL",
+            "D=M",
+            "@R13",
+            "M=D",
+            # RET = *(FRAME-5); Use R14 for RET var, copy *(FRAME - 5) into RET
+            "A=M-1",
+            "A=A-1",
+            "A=A-1",
+            "A=A-1",
+            "A=A-1",
+            "D=M",
+            "@R14",
+            "M=D",
+            # $ARG = pop(); Reposition return value for caller (copy value from top of stack to ARG)
+            "@SP",
+            "A=M-1",
+            "D=M",
+            "@ARG",
+            "A=M",
+            "M=D",
+            # SP = ARG + 1; store address of ARG + 1 in d, and set SP to d
+            "@ARG",
+            "D=M+1",
+            "@SP",
+            "M=D",
+            # THAT = *(FRAME-1)
+            "@R13",
+            "A=M-1",
+            "D=M",
+            "@THAT",
+            "M=D",
+            # THIS = *(FRAME-2)
+            "@R13",
+            "A=M-1",
+            "A=A-1",
+            "D=M",
+            "@THIS",
+            "M=D",
+            # ARG = *(FRAME-3)
+            "@R13",
+            "A=M-1",
+            "A=A-1",
+            "A=A-1",
+            "D=M",
+            "@ARG",
+            "M=D",
+            # LCL = *(FRAME-4)
+            "@R13",
+            "A=M-1",
+            "A=A-1",
+            "A=A-1",
+            "A=A-1",
+            "D=M",
+            "@LCL",
+            "M=D",
+            # goto RET
+            "@R14",
+            "A=M",
+            "0;JMP",
+        ]
 
     def write_function(self, function_name, num_locals):
         self.output.append(f"// function {function_name} {num_locals}")
@@ -739,3 +546,11 @@ class CodeWriter:
             ]
             * int(num_locals)
         )
+        self.output.extend(
+            [
+                # Move stack pointer past the local variables
+                "D=A",
+                "@SP",
+                "M=D",
+            ]
+        )
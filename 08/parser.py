@@ -3,25 +3,28 @@ from command_type import CommandType
 
 class Parser:
     def __init__(self, commands):
-        self.commands = commands
+        self.commands = self.split_commands(commands)
         self.position = -1
         self.current_command = []
 
+    @staticmethod
+    def split_commands(lines):
+        """
+        Split each line into its words, with comments removed and blank lines skipped
+        """
+        commands = []
+        for line in lines:
+            words = line.split("//", 1)[0].split()
+            if words:
+                commands.append(words)
+        return commands
+
     def has_more_commands(self):
-        for c in self.commands[self.position + 1 :]:
-            if c and not c.startswith("//"):
-                return True
-        return False
+        return self.position + 1 < len(self.commands)
 
     def advance(self):
-        while self.position + 1 < len(self.commands):
-            self.position += 1
-
-            command = self.commands[self.position]
-
-            if command and not command.startswith("//"):
-                self.current_command = command.split(" ")
-                return
+        self.position += 1
+        self.current_command = self.commands[self.position]
 
     def command_type(self):
         match self.current_command[0]:
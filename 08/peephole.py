@@ -0,0 +1,135 @@
+from typing import List, Optional
+
+# Instruction sequences emitted by CodeWriter
+PUSH_D = ["@SP", "A=M", "M=D", "@SP", "M=M+1"]
+POP_D = ["@SP", "M=M-1", "A=M", "D=M"]
+BINARY_OPERANDS = ["@SP", "A=M-1", "D=M", "A=A-1"]
+DECREMENT_SP = ["@SP", "M=M-1"]
+POP_TO_R13_ADDRESS = ["@R13", "M=D", "@SP", "M=M-1", "A=M", "D=M", "@R13", "A=M", "M=D"]
+
+# Matches any A- or C-instruction in a pattern
+ANY = None
+
+
+def _is_comment(line: str):
+    return line.startswith("//")
+
+
+def _is_label(line: str):
+    return line.startswith("(")
+
+
+def _match(output: List[str], start: int, pattern: List[Optional[str]]):
+    """
+    Match pattern against the instructions of output from start, skipping comments
+
+    Returns the index after the match, and the comments within it, or None if it doesn't match. Labels never match,
+    as code can jump to them.
+    """
+    comments = []
+    position = start
+    for expected in pattern:
+        while position < len(output) and _is_comment(output[position]):
+            comments.append(output[position])
+            position += 1
+        if position == len(output):
+            return None
+        line = output[position]
+        if _is_label(line) or (expected is not ANY and line != expected):
+            return None
+        position += 1
+    return position, comments
+
+
+def _next_instruction(output: List[str], start: int):
+    # Walk forward by index, as a slice copies the rest of output and islice steps through everything before start
+    position = start
+    while position < len(output):
+        if not _is_comment(output[position]):
+            return output[position]
+        position += 1
+    return None
+
+
+def _fold_push_pop(output: List[str], start: int):
+    """
+    Fold a push of D into the command after it, so the value doesn't go through the stack
+
+    Returns the replacement instructions, and the index to carry on from, or None if nothing can be folded at start.
+    Every CodeWriter command starts by loading A, so A and D hold nothing useful between commands, and nothing reads
+    the stack above SP.
+    """
+    # push, then pop into D: the value is already in D
+    if (match := _match(output, start, PUSH_D + POP_D)) is not None:
+        end, comments = match
+        next_instruction = _next_instruction(output, end)
+        if next_instruction is not None and next_instruction.startswith("@"):
+            return comments, end
+
+    # push, then a binary operation: operate on the top of the stack and D directly, leaving SP where it was
+    if (match := _match(output, start, PUSH_D + BINARY_OPERANDS)) is not None:
+        end, comments = match
+        operations = []
+        while end < len(output) and not output[end].startswith(("@", "(")):
+            if _is_comment(output[end]):
+                comments.append(output[end])
+            else:
+                operations.append(output[end])
+            end += 1
+        if operations and (match := _match(output, end, DECREMENT_SP)) is not None:
+            end, more_comments = match
+            return comments + more_comments + ["@SP", "A=M-1"] + operations, end
+
+    # push, then pop into a segment: leave the value just above the top of the stack while working out the address
+    if (match := _match(output, start, PUSH_D + [ANY] * 4 + POP_TO_R13_ADDRESS)) is not None:
+        end, comments = match
+        instructions = [line for line in output[start:end] if not _is_comment(line)]
+        address = instructions[len(PUSH_D) : len(PUSH_D) + 4]
+        if address[0].startswith("@"):
+            return (
+                comments + ["@SP", "A=M", "M=D"] + address + ["@R13", "M=D", "@SP", "A=M", "D=M", "@R13", "A=M", "M=D"],
+                end,
+            )
+
+    return None
+
+
+def _rewrite(output: List[str], start: int):
+    """
+    Shorter equivalents of the instructions at start, or None if there aren't any
+    """
+    # Decrement SP and point A at the new top of the stack in one instruction
+    if (match := _match(output, start, ["@SP", "M=M-1", "A=M"])) is not None:
+        end, comments = match
+        return comments + ["@SP", "AM=M-1"], end
+
+    # push D, incrementing SP first
+    if (match := _match(output, start, PUSH_D)) is not None:
+        end, comments = match
+        return comments + ["@SP", "AM=M+1", "A=A-1", "M=D"], end
+
+    return None
+
+
+def _apply(output: List[str], rule):
+    result = []
+    position = 0
+    while position < len(output):
+        replacement = rule(output, position)
+        if replacement is None:
+            result.append(output[position])
+            position += 1
+        else:
+            instructions, position = replacement
+            result.extend(instructions)
+    return result
+
+
+def optimize(output: List[str]):
+    """
+    Peephole optimise the assembly written by CodeWriter
+
+    Pushes followed by a command that pops the value straight back off are folded together, then common sequences
+    are replaced by shorter equivalents.
+    """
+    return _apply(_apply(output, _fold_push_pop), _rewrite)
@@ -0,0 +1,85 @@
+from command_type import CommandType
+from parser import Parser
+
+
+def _commands(lines):
+    parser = Parser(commands=lines)
+    commands = []
+    while parser.has_more_commands():
+        parser.advance()
+        commands.append(parser.current_command)
+    return commands
+
+
+def test_split_commands():
+    assert Parser.split_commands(["push constant 7", "add"]) == [["push", "constant", "7"], ["add"]]
+
+
+def test_inline_comments():
+    assert _commands(["push local 0 // i", "add// sum", "pop temp 1//x//y"]) == [
+        ["push", "local", "0"],
+        ["add"],
+        ["pop", "temp", "1"],
+    ]
+
+
+def test_tab_separated_arguments():
+    assert _commands(["push\tconstant\t7", "\tcall  Math.multiply \t 2\r"]) == [
+        ["push", "constant", "7"],
+        ["call", "Math.multiply", "2"],
+    ]
+
+
+def test_blank_and_comment_only_lines():
+    lines = ["", "// comment", "   ", "\t// indented comment", "add", "", "  // trailing"]
+
+    assert _commands(lines) == [["add"]]
+    assert _commands(["", "// only comments"]) == []
+
+
+def test_arguments():
+    lines = [
+        "add",
+        "not",
+        "push argument 2",
+        "pop that 5",
+        "label LOOP",
+        "goto END",
+        "if-goto LOOP",
+        "function Main.main 3",
+        "call Math.max 2",
+        "return",
+    ]
+    expected = [
+        (CommandType.C_ARITHMETIC, "add", None),
+        (CommandType.C_ARITHMETIC, "not", None),
+        (CommandType.C_PUSH, "argument", "2"),
+        (CommandType.C_POP, "that", "5"),
+        (CommandType.C_LABEL, "LOOP", None),
+        (CommandType.C_GOTO, "END", None),
+        (CommandType.C_IF, "LOOP", None),
+        (CommandType.C_FUNCTION, "Main.main", "3"),
+        (CommandType.C_CALL, "Math.max", "2"),
+        (CommandType.C_RETURN, None, None),
+    ]
+    parser = Parser(commands=lines)
+    for command_type, arg1, arg2 in expected:
+        parser.advance()
+        assert parser.command_type() == command_type
+        if arg1 is not None:
+            assert parser.arg1() == arg1
+        if arg2 is not None:
+            assert parser.arg2() == arg2
+
+
+def test_has_more_commands_and_advance():
+    parser = Parser(commands=["// start", "push constant 1", "", "pop local 0 // end"])
+
+    assert parser.has_more_commands()
+    parser.advance()
+    assert parser.current_command == ["push", "constant", "1"]
+    assert parser.has_more_commands()
+    parser.advance()
+    assert parser.current_command == ["pop", "local", "0"]
+    assert not parser.has_more_commands()
+    assert not Parser(commands=[]).has_more_commands()
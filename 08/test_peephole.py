@@ -0,0 +1,106 @@
+from peephole import optimize
+
+PUSH_CONSTANT_7 = ["// push constant 7", "@7", "D=A", "@SP", "A=M", "M=D", "@SP", "M=M+1"]
+
+
+def test_push_then_pop_into_d():
+    output = PUSH_CONSTANT_7 + ["// if-goto LOOP", "@SP", "M=M-1", "A=M", "D=M", "@Foo$LOOP", "D;JNE"]
+
+    assert optimize(output) == ["// push constant 7", "@7", "D=A", "// if-goto LOOP", "@Foo$LOOP", "D;JNE"]
+
+
+def test_push_then_pop_into_d_needs_an_a_instruction_after():
+    output = PUSH_CONSTANT_7 + ["@SP", "M=M-1", "A=M", "D=M", "D=D+1"]
+
+    # Only the rewrites apply
+    assert optimize(output) == [
+        "// push constant 7",
+        "@7",
+        "D=A",
+        "@SP",
+        "AM=M+1",
+        "A=A-1",
+        "M=D",
+        "@SP",
+        "AM=M-1",
+        "D=M",
+        "D=D+1",
+    ]
+
+
+def test_push_then_binary_operation():
+    output = PUSH_CONSTANT_7 + ["// add", "@SP", "A=M-1", "D=M", "A=A-1", "M=D+M", "@SP", "M=M-1"]
+
+    assert optimize(output) == ["// push constant 7", "@7", "D=A", "// add", "@SP", "A=M-1", "M=D+M"]
+
+
+def test_push_then_pop_into_segment():
+    pop_local_2 = ["@LCL", "D=M", "@2", "D=D+A", "@R13", "M=D", "@SP", "M=M-1", "A=M", "D=M", "@R13", "A=M", "M=D"]
+    output = PUSH_CONSTANT_7 + ["// pop local 2"] + pop_local_2
+
+    assert optimize(output) == [
+        "// push constant 7",
+        "@7",
+        "D=A",
+        "// pop local 2",
+        "@SP",
+        "A=M",
+        "M=D",
+        "@LCL",
+        "D=M",
+        "@2",
+        "D=D+A",
+        "@R13",
+        "M=D",
+        "@SP",
+        "A=M",
+        "D=M",
+        "@R13",
+        "A=M",
+        "M=D",
+    ]
+
+
+def test_decrement_sp_and_load_a():
+    output = ["@SP", "M=M-1", "A=M", "D=M", "@R5", "M=D"]
+
+    assert optimize(output) == ["@SP", "AM=M-1", "D=M", "@R5", "M=D"]
+
+
+def test_push_d():
+    output = ["@R5", "D=M", "@SP", "A=M", "M=D", "@SP", "M=M+1"]
+
+    assert optimize(output) == ["@R5", "D=M", "@SP", "AM=M+1", "A=A-1", "M=D"]
+
+
+def test_comments_are_kept():
+    output = ["@SP", "// comment", "A=M", "M=D", "@SP", "M=M+1"]
+
+    assert optimize(output) == ["// comment", "@SP", "AM=M+1", "A=A-1", "M=D"]
+
+
+def test_label_between_push_and_pop():
+    output = PUSH_CONSTANT_7 + ["(Foo$LOOP)", "@SP", "M=M-1", "A=M", "D=M", "@Foo$END", "D;JNE"]
+
+    # Code can jump to the label with something else on the stack, so the push and pop aren't folded
+    assert optimize(output) == [
+        "// push constant 7",
+        "@7",
+        "D=A",
+        "@SP",
+        "AM=M+1",
+        "A=A-1",
+        "M=D",
+        "(Foo$LOOP)",
+        "@SP",
+        "AM=M-1",
+        "D=M",
+        "@Foo$END",
+        "D;JNE",
+    ]
+
+
+def test_label_within_sequence():
+    output = ["@SP", "A=M", "(Foo$LOOP)", "M=D", "@SP", "M=M+1", "@SP", "M=M-1", "(Foo$END)", "A=M"]
+
+    assert optimize(output) == output
@@ -0,0 +1,67 @@
+import os
+
+from translation_cache import DEFAULT_MAX_ENTRIES, TranslationCache
+
+
+def _key(cache, vm_text="push constant 1", file_name="Main", compact=False):
+    return cache.key(vm_text=vm_text, file_name=file_name, compact=compact)
+
+
+def test_key_depends_on_version(tmp_path):
+    assert _key(TranslationCache(tmp_path, version="1")) != _key(TranslationCache(tmp_path, version="2"))
+
+
+def test_key_depends_on_compact(tmp_path):
+    cache = TranslationCache(tmp_path, version="1")
+    assert _key(cache, compact=False) != _key(cache, compact=True)
+
+
+def test_key_depends_on_file_text(tmp_path):
+    cache = TranslationCache(tmp_path, version="1")
+    assert _key(cache) == _key(cache)
+    assert _key(cache, vm_text="push constant 1") != _key(cache, vm_text="push constant 2")
+
+
+def test_key_depends_on_file_name(tmp_path):
+    cache = TranslationCache(tmp_path, version="1")
+    assert _key(cache, file_name="Main") != _key(cache, file_name="Other")
+
+
+def test_get_missing(tmp_path):
+    assert TranslationCache(tmp_path, version="1").get("abc") is None
+
+
+def test_put_and_get(tmp_path):
+    cache = TranslationCache(tmp_path, version="1")
+    cache.put("a", ["@1", "D=A"])
+    cache.put("empty", [])
+
+    assert cache.get("a") == ["@1", "D=A"]
+    assert cache.get("empty") == []
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = TranslationCache(tmp_path, version="1", max_entries=2)
+    cache.put("a", ["@1"])
+    cache.put("b", ["@2"])
+    os.utime(tmp_path / "a.asm", (1, 1))
+    os.utime(tmp_path / "b.asm", (2, 2))
+    cache.get("a")
+    cache.put("c", ["@3"])
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_keeps_default_max_entries(tmp_path):
+    cache = TranslationCache(tmp_path, version="1")
+    for i in range(DEFAULT_MAX_ENTRIES + 1):
+        cache.put(f"{i:04}", [f"@{i}"])
+        os.utime(tmp_path / f"{i:04}.asm", (i, i))
+    cache.put("last", ["@last"])
+
+    assert len(list(tmp_path.glob("*.asm"))) == DEFAULT_MAX_ENTRIES
+    assert cache.get("0000") is None
+    assert cache.get("0001") is None
+    assert cache.get("last") == ["@last"]
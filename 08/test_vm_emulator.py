@@ -0,0 +1,129 @@
+from vm_emulator import VMEmulator, compile_program, read_vmb, write_vmb
+from vm_emulator.bytecode import disassemble
+from vm_emulator.fusion import SUPERINSTRUCTIONS, fuse
+
+# Sums an array while filling it, with a sequence for every superinstruction
+MAIN_VM = """
+function Main.main 3
+push constant 0
+pop local 0
+push constant 0
+pop local 1
+label LOOP
+push local 0
+push constant 10
+lt
+not
+if-goto END
+push constant 3000
+push local 0
+add
+push local 0
+push local 0
+add
+pop temp 0
+pop pointer 1
+push temp 0
+pop that 0
+push local 1
+push constant 3000
+push local 0
+add
+pop pointer 1
+push that 0
+add
+pop local 1
+push local 0
+push constant 5
+eq
+not
+if-goto NOT_FIVE
+push local 1
+pop static 0
+label NOT_FIVE
+push local 1
+push local 0
+gt
+not
+if-goto NOT_GREATER
+push constant 1
+pop static 1
+label NOT_GREATER
+push local 0
+push constant 1
+add
+pop local 0
+goto LOOP
+label END
+push local 2
+not
+if-goto DONE
+push constant 7
+pop local 2
+label DONE
+push local 1
+pop static 2
+push constant 0
+return
+"""
+
+
+def _program(tmp_path):
+    main = tmp_path / "Main.vm"
+    main.write_text(MAIN_VM)
+    return compile_program([main])
+
+
+def _run(bytecode, fuse_):
+    emulator = VMEmulator(fuse=fuse_)
+    emulator.load_bytecode(bytecode)
+    emulator.run(10_000)
+    assert emulator.halted is True
+    return emulator
+
+
+def _state(emulator):
+    # Superinstructions don't leave the values of the instructions they replace above the top of the stack
+    ram = emulator.ram
+    return list(ram[: ram[0]]) + list(ram[2048:])
+
+
+def test_run(tmp_path):
+    emulator = _run(_program(tmp_path), fuse_=False)
+
+    assert list(emulator.ram[3000:3010]) == [2 * i for i in range(10)]
+    assert list(emulator.ram[16:19]) == [30, 1, 90]
+
+
+def test_fused_program_ends_the_same(tmp_path):
+    bytecode = _program(tmp_path)
+    plain = _run(bytecode, fuse_=False)
+    fused = _run(bytecode, fuse_=True)
+
+    assert _state(fused) == _state(plain)
+    assert fused.executed < plain.executed
+
+
+def test_every_superinstruction_is_used(tmp_path):
+    opcodes = {opcode for _, opcode, _ in disassemble(fuse(_program(tmp_path)))}
+
+    assert {superinstruction.opcode for superinstruction in SUPERINSTRUCTIONS} <= opcodes
+
+
+def test_vmb_round_trip(tmp_path):
+    bytecode = _program(tmp_path)
+    vmb_file = tmp_path / "Main.vmb"
+    write_vmb(bytecode, vmb_file)
+
+    assert read_vmb(vmb_file) == bytecode
+
+
+def test_run_from_vmb(tmp_path):
+    bytecode = _program(tmp_path)
+    vmb_file = tmp_path / "Main.vmb"
+    write_vmb(bytecode, vmb_file)
+    emulator = VMEmulator()
+    emulator.load_vmb(vmb_file)
+    emulator.run(10_000)
+
+    assert _state(emulator) == _state(_run(bytecode, fuse_=True))
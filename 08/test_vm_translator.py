@@ -0,0 +1,48 @@
+import io
+from pathlib import Path
+
+from code_writer import StreamOutput
+from vm_translator import link, translate_file, translate_files, write_asm
+
+STATICS_TEST_PATH = Path(__file__).parent / "fixtures" / "FunctionCalls" / "StaticsTest"
+
+
+def test_stream_output_writes_in_chunks():
+    stream = io.StringIO()
+    output = StreamOutput(stream, chunk_lines=3)
+    output.append("a")
+    output.extend(["b"])
+    assert stream.getvalue() == ""
+
+    output.extend(["c", "d"])
+    assert stream.getvalue() == "a\nb\nc\nd"
+    output.append("e")
+    output.flush()
+    output.flush()
+    assert stream.getvalue() == "a\nb\nc\nd\ne"
+
+
+def test_stream_output_empty():
+    stream = io.StringIO()
+    StreamOutput(stream).flush()
+
+    assert stream.getvalue() == ""
+
+
+def test_streamed_program_matches_linked_fragments(tmp_path):
+    vm_files = sorted(STATICS_TEST_PATH.glob("*.vm"))
+    for compact in [False, True]:
+        expected = "\n".join(link([translate_file(vm_file, compact=compact) for vm_file in vm_files], compact=compact))
+
+        write_asm(tmp_path / "serial.asm", vm_files, compact=compact, optimize=False)
+        write_asm(tmp_path / "parallel.asm", vm_files, compact=compact, optimize=False, jobs=2)
+        assert (tmp_path / "serial.asm").read_text() == expected
+        assert (tmp_path / "parallel.asm").read_text() == expected
+
+
+def test_link_to_stream():
+    vm_files = sorted(STATICS_TEST_PATH.glob("*.vm"))
+    stream = io.StringIO()
+    link(translate_files(vm_files, compact=False), compact=False, stream=stream)
+
+    assert stream.getvalue() == "\n".join(link(translate_files(vm_files, compact=False), compact=False))
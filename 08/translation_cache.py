@@ -0,0 +1,52 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import List, Optional
+
+CACHE_DIRECTORY_NAME = ".n2tcache"
+DEFAULT_MAX_ENTRIES = 256
+FRAGMENT_SUFFIX = ".asm"
+
+
+class TranslationCache:
+    """
+    On-disk cache of the assembly translated from single .vm files, keyed by a hash of the file and how it was translated
+
+    Each entry is a .asm file of the fragment. Once there are more than max_entries entries, the least recently used
+    are removed.
+    """
+
+    def __init__(self, directory: Path, version: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.directory = directory
+        self.version = version
+        self.max_entries = max_entries
+
+    def key(self, vm_text: str, file_name: str, compact: bool):
+        """
+        The file name is part of the key, as it is in the fragment's static variables and labels
+        """
+        digest = hashlib.sha256(f"{self.version}\n{file_name}\n{compact}\n".encode())
+        digest.update(vm_text.encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        fragment_file = self.directory / f"{key}{FRAGMENT_SUFFIX}"
+        try:
+            fragment = fragment_file.read_text()
+        except FileNotFoundError:
+            return None
+
+        # Mark as recently used
+        os.utime(fragment_file)
+        return fragment.split("\n") if fragment else []
+
+    def put(self, key: str, fragment: List[str]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / f"{key}{FRAGMENT_SUFFIX}").write_text("\n".join(fragment))
+        self._evict()
+
+    def _evict(self):
+        fragment_files = list(self.directory.glob(f"*{FRAGMENT_SUFFIX}"))
+        fragment_files.sort(key=lambda f: f.stat().st_mtime, reverse=True)
+        for fragment_file in fragment_files[self.max_entries :]:
+            fragment_file.unlink(missing_ok=True)
@@ -0,0 +1,3 @@
+from vm_emulator.bytecode import Bytecode, Opcode, compile_program, read_vmb, write_vmb
+from vm_emulator.emulator import RAM_SIZE, VMEmulator
+from vm_emulator.os_classes import OS_CLASSES, OSClass, read_string
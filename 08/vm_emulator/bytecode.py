@@ -0,0 +1,299 @@
+import struct
+import sys
+from array import array
+from enum import IntEnum
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+from command_type import CommandType
+from parser import Parser
+
+TEMP = 5
+POINTER = 3
+FIRST_STATIC_ADDRESS = 16
+STACK_BASE = 256
+
+# Return addresses are saved on the stack as unsigned 16-bit words, and this one is kept for halting
+MAX_CODE_LENGTH = 0xFFFF
+
+VMB_MAGIC = b"VMB\x01"
+# Words of code, functions and external functions
+VMB_HEADER = struct.Struct("<4sIII")
+
+
+class Opcode(IntEnum):
+    # Operand: the value
+    PUSH_CONSTANT = 0
+    # Operand: the index into the segment
+    PUSH_LOCAL = 1
+    PUSH_ARGUMENT = 2
+    PUSH_THIS = 3
+    PUSH_THAT = 4
+    # Operand: the RAM address, for the temp, pointer and static segments
+    PUSH_ADDRESS = 5
+    POP_LOCAL = 6
+    POP_ARGUMENT = 7
+    POP_THIS = 8
+    POP_THAT = 9
+    POP_ADDRESS = 10
+    ADD = 11
+    SUB = 12
+    NEG = 13
+    EQ = 14
+    GT = 15
+    LT = 16
+    AND = 17
+    OR = 18
+    NOT = 19
+    # Operand: the offset to jump to
+    GOTO = 20
+    IF_GOTO = 21
+    # Operand: the number of local variables
+    FUNCTION = 22
+    # Operands: the offset of the function, and the number of arguments
+    CALL = 23
+    # Operands: the index of the function in Bytecode.externals, and the number of arguments
+    CALL_EXTERNAL = 24
+    RETURN = 25
+
+    # Superinstructions, which replace common sequences of the instructions above when a program is loaded. They are
+    # never written to .vmb files. See fusion.py for the sequences, and the operands they keep.
+    PUSH_LOCAL_LOCAL = 26
+    PUSH_LOCAL_CONSTANT = 27
+    ADD_POP_LOCAL = 28
+    LOCAL_ADD_CONSTANT = 29
+    NOT_IF_GOTO = 30
+    IF_NOT_EQ_GOTO = 31
+    IF_NOT_GT_GOTO = 32
+    IF_NOT_LT_GOTO = 33
+    ARRAY_READ = 34
+    ARRAY_WRITE = 35
+
+
+OPERAND_COUNTS = {opcode: 0 for opcode in Opcode}
+OPERAND_COUNTS.update({opcode: 1 for opcode in Opcode if opcode <= Opcode.POP_ADDRESS})
+OPERAND_COUNTS.update({Opcode.GOTO: 1, Opcode.IF_GOTO: 1, Opcode.FUNCTION: 1, Opcode.CALL: 2, Opcode.CALL_EXTERNAL: 2})
+OPERAND_COUNTS.update(
+    {
+        Opcode.PUSH_LOCAL_LOCAL: 2,
+        Opcode.PUSH_LOCAL_CONSTANT: 2,
+        Opcode.ADD_POP_LOCAL: 1,
+        Opcode.LOCAL_ADD_CONSTANT: 3,
+        Opcode.NOT_IF_GOTO: 1,
+        Opcode.IF_NOT_EQ_GOTO: 1,
+        Opcode.IF_NOT_GT_GOTO: 1,
+        Opcode.IF_NOT_LT_GOTO: 1,
+    }
+)
+
+# Opcodes with an offset into the code as their first operand
+JUMP_OPCODES = {
+    Opcode.GOTO,
+    Opcode.IF_GOTO,
+    Opcode.CALL,
+    Opcode.NOT_IF_GOTO,
+    Opcode.IF_NOT_EQ_GOTO,
+    Opcode.IF_NOT_GT_GOTO,
+    Opcode.IF_NOT_LT_GOTO,
+}
+
+ARITHMETIC_OPCODES = {
+    "add": Opcode.ADD,
+    "sub": Opcode.SUB,
+    "neg": Opcode.NEG,
+    "eq": Opcode.EQ,
+    "gt": Opcode.GT,
+    "lt": Opcode.LT,
+    "and": Opcode.AND,
+    "or": Opcode.OR,
+    "not": Opcode.NOT,
+}
+PUSH_OPCODES = {
+    "local": Opcode.PUSH_LOCAL,
+    "argument": Opcode.PUSH_ARGUMENT,
+    "this": Opcode.PUSH_THIS,
+    "that": Opcode.PUSH_THAT,
+}
+POP_OPCODES = {
+    "local": Opcode.POP_LOCAL,
+    "argument": Opcode.POP_ARGUMENT,
+    "this": Opcode.POP_THIS,
+    "that": Opcode.POP_THAT,
+}
+
+
+class Bytecode(NamedTuple):
+    """
+    A whole VM program, as a flat array of opcodes each followed by its operands
+
+    Labels are resolved to offsets into code, and static variables to RAM addresses. Calls to functions the program
+    doesn't define, e.g. the OS, go through the names in externals.
+    """
+
+    code: array
+    # The offset of each function's FUNCTION instruction
+    functions: Dict[str, int]
+    externals: List[str]
+
+
+def _instructions(vm_file: Path):
+    """
+    The parsed commands of a .vm file, as (command type, arg1, arg2) tuples
+    """
+    parser_ = Parser(commands=vm_file.read_text().splitlines())
+    while parser_.has_more_commands():
+        parser_.advance()
+        command_type = parser_.command_type()
+        arg1 = None if command_type == CommandType.C_RETURN else parser_.arg1()
+        arg2 = None
+        if command_type in (CommandType.C_PUSH, CommandType.C_POP, CommandType.C_FUNCTION, CommandType.C_CALL):
+            arg2 = int(parser_.arg2())
+        yield command_type, arg1, arg2
+
+
+def _instruction_length(command_type: CommandType):
+    match command_type:
+        case CommandType.C_LABEL:
+            return 0
+        case CommandType.C_ARITHMETIC | CommandType.C_RETURN:
+            return 1
+        case CommandType.C_CALL:
+            return 3
+        case _:
+            return 2
+
+
+def compile_program(vm_files: List[Path]):
+    """
+    Compile the .vm files of a program into bytecode
+
+    Labels are scoped to the function they are in. Each file's static variables are given the next free addresses
+    from 16, in the order of vm_files.
+    """
+    files = [(vm_file.stem, list(_instructions(vm_file))) for vm_file in vm_files]
+
+    # First pass: find where every function and label will be
+    functions = {}
+    labels = {}
+    static_bases = {}
+    next_static_address = FIRST_STATIC_ADDRESS
+    offset = 0
+    for file_name, instructions in files:
+        function_name = ""
+        statics = -1
+        for command_type, arg1, arg2 in instructions:
+            match command_type:
+                case CommandType.C_FUNCTION:
+                    function_name = arg1
+                    functions[function_name] = offset
+                case CommandType.C_LABEL:
+                    labels[f"{function_name}${arg1}"] = offset
+                case CommandType.C_PUSH | CommandType.C_POP if arg1 == "static":
+                    statics = max(statics, arg2)
+            offset += _instruction_length(command_type)
+        static_bases[file_name] = next_static_address
+        next_static_address += statics + 1
+
+    if offset > MAX_CODE_LENGTH:
+        raise Exception(f"Program of {offset} words of bytecode is too big")
+    if next_static_address > STACK_BASE:
+        raise Exception(f"Static variables take up {next_static_address - FIRST_STATIC_ADDRESS} words, too many")
+
+    # Second pass: write the instructions, with everything resolved
+    code = array("i")
+    externals = {}
+    for file_name, instructions in files:
+        function_name = ""
+        for command_type, arg1, arg2 in instructions:
+            match command_type:
+                case CommandType.C_ARITHMETIC:
+                    code.append(ARITHMETIC_OPCODES[arg1])
+                case CommandType.C_PUSH if arg1 == "constant":
+                    code.extend([Opcode.PUSH_CONSTANT, arg2])
+                case CommandType.C_PUSH if arg1 in PUSH_OPCODES:
+                    code.extend([PUSH_OPCODES[arg1], arg2])
+                case CommandType.C_PUSH:
+                    code.extend([Opcode.PUSH_ADDRESS, _address(arg1, arg2, static_bases[file_name])])
+                case CommandType.C_POP if arg1 in POP_OPCODES:
+                    code.extend([POP_OPCODES[arg1], arg2])
+                case CommandType.C_POP:
+                    code.extend([Opcode.POP_ADDRESS, _address(arg1, arg2, static_bases[file_name])])
+                case CommandType.C_LABEL:
+                    pass
+                case CommandType.C_GOTO | CommandType.C_IF:
+                    label = f"{function_name}${arg1}"
+                    if label not in labels:
+                        raise Exception(f"Undefined label {arg1} in {function_name}")
+                    opcode = Opcode.GOTO if command_type == CommandType.C_GOTO else Opcode.IF_GOTO
+                    code.extend([opcode, labels[label]])
+                case CommandType.C_FUNCTION:
+                    function_name = arg1
+                    code.extend([Opcode.FUNCTION, arg2])
+                case CommandType.C_CALL if arg1 in functions:
+                    code.extend([Opcode.CALL, functions[arg1], arg2])
+                case CommandType.C_CALL:
+                    code.extend([Opcode.CALL_EXTERNAL, externals.setdefault(arg1, len(externals)), arg2])
+                case CommandType.C_RETURN:
+                    code.append(Opcode.RETURN)
+                case _:
+                    raise NotImplementedError(f"Unsupported command type {command_type}")
+
+    return Bytecode(code=code, functions=functions, externals=list(externals))
+
+
+def _address(segment: str, index: int, static_base: int):
+    match segment:
+        case "temp":
+            return TEMP + index
+        case "pointer":
+            return POINTER + index
+        case "static":
+            return static_base + index
+        case _:
+            raise NotImplementedError(f"Unsupported segment {segment}")
+
+
+def write_vmb(bytecode: Bytecode, vmb_file: Path):
+    """
+    Write bytecode to a .vmb file: a header, the code as little-endian 32-bit words, then the function names
+    """
+    code = array("i", bytecode.code)
+    if sys.byteorder != "little":
+        code.byteswap()
+    names = [f"{name} {offset}" for name, offset in bytecode.functions.items()] + bytecode.externals
+    with open(vmb_file, "wb") as f:
+        f.write(VMB_HEADER.pack(VMB_MAGIC, len(code), len(bytecode.functions), len(bytecode.externals)))
+        f.write(code.tobytes())
+        f.write("\n".join(names).encode())
+
+
+def read_vmb(vmb_file: Path):
+    data = vmb_file.read_bytes()
+    magic, code_length, function_count, external_count = VMB_HEADER.unpack_from(data)
+    if magic != VMB_MAGIC:
+        raise Exception(f"{vmb_file} is not a .vmb file")
+
+    code_end = VMB_HEADER.size + 4 * code_length
+    code = array("i", data[VMB_HEADER.size : code_end])
+    if sys.byteorder != "little":
+        code.byteswap()
+
+    names = data[code_end:].decode().split("\n") if function_count + external_count else []
+    functions = {}
+    for line in names[:function_count]:
+        name, offset = line.split(" ")
+        functions[name] = int(offset)
+    return Bytecode(code=code, functions=functions, externals=names[function_count:])
+
+
+def disassemble(bytecode: Bytecode):
+    """
+    The instructions of bytecode, as (offset, opcode, operands) tuples
+    """
+    code = bytecode.code
+    offset = 0
+    while offset < len(code):
+        opcode = Opcode(code[offset])
+        operand_count = OPERAND_COUNTS[opcode]
+        yield offset, opcode, list(code[offset + 1 : offset + 1 + operand_count])
+        offset += 1 + operand_count
@@ -0,0 +1,341 @@
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Type
+
+from vm_emulator.bytecode import STACK_BASE, Bytecode, Opcode, compile_program, read_vmb
+from vm_emulator.fusion import fuse
+from vm_emulator.os_classes import OS_CLASSES, OSClass
+
+RAM_SIZE = 32768
+
+SP = 0
+LCL = 1
+ARG = 2
+THIS = 3
+THAT = 4
+TEMP = 5
+
+# Where the function the program starts in returns to
+HALT = 0xFFFF
+
+PUSH_CONSTANT = Opcode.PUSH_CONSTANT
+PUSH_LOCAL = Opcode.PUSH_LOCAL
+PUSH_ARGUMENT = Opcode.PUSH_ARGUMENT
+PUSH_THIS = Opcode.PUSH_THIS
+PUSH_THAT = Opcode.PUSH_THAT
+PUSH_ADDRESS = Opcode.PUSH_ADDRESS
+POP_LOCAL = Opcode.POP_LOCAL
+POP_ARGUMENT = Opcode.POP_ARGUMENT
+POP_THIS = Opcode.POP_THIS
+POP_THAT = Opcode.POP_THAT
+POP_ADDRESS = Opcode.POP_ADDRESS
+ADD = Opcode.ADD
+SUB = Opcode.SUB
+NEG = Opcode.NEG
+EQ = Opcode.EQ
+GT = Opcode.GT
+LT = Opcode.LT
+AND = Opcode.AND
+OR = Opcode.OR
+NOT = Opcode.NOT
+GOTO = Opcode.GOTO
+IF_GOTO = Opcode.IF_GOTO
+FUNCTION = Opcode.FUNCTION
+CALL = Opcode.CALL
+CALL_EXTERNAL = Opcode.CALL_EXTERNAL
+RETURN = Opcode.RETURN
+PUSH_LOCAL_LOCAL = Opcode.PUSH_LOCAL_LOCAL
+PUSH_LOCAL_CONSTANT = Opcode.PUSH_LOCAL_CONSTANT
+ADD_POP_LOCAL = Opcode.ADD_POP_LOCAL
+LOCAL_ADD_CONSTANT = Opcode.LOCAL_ADD_CONSTANT
+NOT_IF_GOTO = Opcode.NOT_IF_GOTO
+IF_NOT_EQ_GOTO = Opcode.IF_NOT_EQ_GOTO
+IF_NOT_GT_GOTO = Opcode.IF_NOT_GT_GOTO
+IF_NOT_LT_GOTO = Opcode.IF_NOT_LT_GOTO
+ARRAY_READ = Opcode.ARRAY_READ
+ARRAY_WRITE = Opcode.ARRAY_WRITE
+
+
+def _wrap(value: int):
+    """
+    Wrap value to a signed 16-bit word
+    """
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+
+class VMEmulator:
+    """
+    Runs a program of .vm files directly, on a stack machine with the standard Hack RAM layout
+
+    The program is compiled to bytecode when it is loaded, so running it involves no parsing or name lookups. Unless
+    fuse is False, common sequences of instructions are then fused into superinstructions.
+
+    Functions the program calls but doesn't define, e.g. the OS, are run by the Python classes in os_classes. Each is
+    created with the emulator, and its public methods are called with the arguments and return the value to push.
+    """
+
+    def __init__(self, os_classes: Iterable[Type[OSClass]] = OS_CLASSES, fuse: bool = True):
+        self.fuse = fuse
+        self.ram = array("h", bytes(2 * RAM_SIZE))
+        self.os_classes: Dict[str, OSClass] = {os_class.__name__: os_class(self) for os_class in os_classes}
+        self.os_functions: Dict[str, Callable] = {
+            f"{class_name}.{name}": getattr(instance, name)
+            for class_name, instance in self.os_classes.items()
+            for name in dir(type(instance))
+            if not name.startswith("_") and not hasattr(OSClass, name)
+        }
+        self.bytecode = Bytecode(code=array("i"), functions={}, externals=[])
+        # The OS function for each of the program's external functions, or None if there isn't one
+        self.external_functions: List[Optional[Callable]] = []
+        self.pc = 0
+        self.executed = 0
+        self.halted = False
+
+    def load_directory(self, directory: Path):
+        """
+        Load every .vm file in directory, in name order
+        """
+        self.load_files(sorted(directory.glob("*.vm")))
+
+    def load_files(self, vm_files: List[Path]):
+        self.load_bytecode(compile_program(vm_files))
+
+    def load_vmb(self, vmb_file: Path):
+        """
+        Load a program compiled to a .vmb file, without parsing it again
+        """
+        self.load_bytecode(read_vmb(vmb_file))
+
+    def load_bytecode(self, bytecode: Bytecode):
+        self.bytecode = fuse(bytecode) if self.fuse else bytecode
+        self.external_functions = [self.os_functions.get(name) for name in bytecode.externals]
+        self.reset()
+
+    def reset(self):
+        """
+        Start the program from Sys.init, or Main.main if it has no Sys.init of its own
+        """
+        self.ram[SP] = STACK_BASE
+        self.ram[LCL] = STACK_BASE
+        self.ram[ARG] = STACK_BASE
+        self.executed = 0
+        self.halted = False
+        functions = self.bytecode.functions
+        entry_point = "Sys.init" if "Sys.init" in functions else "Main.main"
+        if entry_point not in functions:
+            raise Exception(f"Program has no {entry_point} function")
+
+        # Call the entry point, saving the caller's frame as a call instruction would
+        for value in [_wrap(HALT), self.ram[LCL], self.ram[ARG], self.ram[THIS], self.ram[THAT]]:
+            self.push(value)
+        self.ram[ARG] = self.ram[SP] - 5
+        self.ram[LCL] = self.ram[SP]
+        self.pc = functions[entry_point]
+
+    def push(self, value: int):
+        self.ram[self.ram[SP]] = _wrap(value)
+        self.ram[SP] += 1
+
+    def pop(self):
+        self.ram[SP] -= 1
+        return self.ram[self.ram[SP]]
+
+    def call_external(self, index: int, num_args: int):
+        """
+        Call an OS function, replacing its arguments on the stack with the value it returns
+        """
+        os_function = self.external_functions[index]
+        if os_function is None:
+            raise Exception(f"Call to undefined function {self.bytecode.externals[index]}")
+        args = [self.pop() for _ in range(num_args)][::-1]
+        result = os_function(*args)
+        self.push(0 if result is None else result)
+
+    def run(self, max_commands: int):
+        """
+        Execute up to max_commands instructions, and return how many were executed
+
+        A superinstruction counts as one instruction, as it takes one dispatch.
+
+        Stops early if the function the program started in returns, or an OS function halts the program. The stack
+        pointer is kept in a local variable, and only written to RAM when an OS function might use it.
+        """
+        ram = self.ram
+        code = self.bytecode.code
+        pc = self.pc
+        sp = ram[SP]
+        executed = 0
+        while executed < max_commands and not self.halted:
+            opcode = code[pc]
+            executed += 1
+
+            if opcode == PUSH_LOCAL:
+                ram[sp] = ram[ram[LCL] + code[pc + 1]]
+                sp += 1
+                pc += 2
+            elif opcode == PUSH_ARGUMENT:
+                ram[sp] = ram[ram[ARG] + code[pc + 1]]
+                sp += 1
+                pc += 2
+            elif opcode == PUSH_CONSTANT:
+                ram[sp] = code[pc + 1]
+                sp += 1
+                pc += 2
+            elif opcode == PUSH_LOCAL_LOCAL:
+                lcl = ram[LCL]
+                ram[sp] = ram[lcl + code[pc + 1]]
+                ram[sp + 1] = ram[lcl + code[pc + 2]]
+                sp += 2
+                pc += 3
+            elif opcode == PUSH_LOCAL_CONSTANT:
+                ram[sp] = ram[ram[LCL] + code[pc + 1]]
+                ram[sp + 1] = code[pc + 2]
+                sp += 2
+                pc += 3
+            elif opcode == ADD_POP_LOCAL:
+                sp -= 2
+                ram[ram[LCL] + code[pc + 1]] = ((ram[sp] + ram[sp + 1] + 0x8000) & 0xFFFF) - 0x8000
+                pc += 2
+            elif opcode == LOCAL_ADD_CONSTANT:
+                lcl = ram[LCL]
+                ram[lcl + code[pc + 3]] = ((ram[lcl + code[pc + 1]] + code[pc + 2] + 0x8000) & 0xFFFF) - 0x8000
+                pc += 4
+            elif opcode == IF_NOT_LT_GOTO:
+                sp -= 2
+                pc = pc + 2 if ram[sp] < ram[sp + 1] else code[pc + 1]
+            elif opcode == IF_NOT_GT_GOTO:
+                sp -= 2
+                pc = pc + 2 if ram[sp] > ram[sp + 1] else code[pc + 1]
+            elif opcode == IF_NOT_EQ_GOTO:
+                sp -= 2
+                pc = pc + 2 if ram[sp] == ram[sp + 1] else code[pc + 1]
+            elif opcode == NOT_IF_GOTO:
+                sp -= 1
+                pc = pc + 2 if ram[sp] == -1 else code[pc + 1]
+            elif opcode == ARRAY_READ:
+                sp -= 1
+                address = ((ram[sp - 1] + ram[sp] + 0x8000) & 0xFFFF) - 0x8000
+                ram[THAT] = address
+                ram[sp - 1] = ram[address]
+                pc += 1
+            elif opcode == ARRAY_WRITE:
+                sp -= 2
+                value = ram[sp + 1]
+                address = ram[sp]
+                ram[TEMP] = value
+                ram[THAT] = address
+                ram[address] = value
+                pc += 1
+            elif opcode == PUSH_THIS:
+                ram[sp] = ram[ram[THIS] + code[pc + 1]]
+                sp += 1
+                pc += 2
+            elif opcode == PUSH_THAT:
+                ram[sp] = ram[ram[THAT] + code[pc + 1]]
+                sp += 1
+                pc += 2
+            elif opcode == PUSH_ADDRESS:
+                ram[sp] = ram[code[pc + 1]]
+                sp += 1
+                pc += 2
+            elif opcode == POP_LOCAL:
+                sp -= 1
+                ram[ram[LCL] + code[pc + 1]] = ram[sp]
+                pc += 2
+            elif opcode == POP_ARGUMENT:
+                sp -= 1
+                ram[ram[ARG] + code[pc + 1]] = ram[sp]
+                pc += 2
+            elif opcode == POP_THIS:
+                sp -= 1
+                ram[ram[THIS] + code[pc + 1]] = ram[sp]
+                pc += 2
+            elif opcode == POP_THAT:
+                sp -= 1
+                ram[ram[THAT] + code[pc + 1]] = ram[sp]
+                pc += 2
+            elif opcode == POP_ADDRESS:
+                sp -= 1
+                ram[code[pc + 1]] = ram[sp]
+                pc += 2
+            elif opcode == ADD:
+                sp -= 1
+                ram[sp - 1] = ((ram[sp - 1] + ram[sp] + 0x8000) & 0xFFFF) - 0x8000
+                pc += 1
+            elif opcode == SUB:
+                sp -= 1
+                ram[sp - 1] = ((ram[sp - 1] - ram[sp] + 0x8000) & 0xFFFF) - 0x8000
+                pc += 1
+            elif opcode == NEG:
+                ram[sp - 1] = _wrap(-ram[sp - 1])
+                pc += 1
+            elif opcode == EQ:
+                sp -= 1
+                ram[sp - 1] = -1 if ram[sp - 1] == ram[sp] else 0
+                pc += 1
+            elif opcode == GT:
+                sp -= 1
+                ram[sp - 1] = -1 if ram[sp - 1] > ram[sp] else 0
+                pc += 1
+            elif opcode == LT:
+                sp -= 1
+                ram[sp - 1] = -1 if ram[sp - 1] < ram[sp] else 0
+                pc += 1
+            elif opcode == AND:
+                sp -= 1
+                ram[sp - 1] &= ram[sp]
+                pc += 1
+            elif opcode == OR:
+                sp -= 1
+                ram[sp - 1] |= ram[sp]
+                pc += 1
+            elif opcode == NOT:
+                ram[sp - 1] = ~ram[sp - 1]
+                pc += 1
+            elif opcode == GOTO:
+                pc = code[pc + 1]
+            elif opcode == IF_GOTO:
+                sp -= 1
+                pc = code[pc + 1] if ram[sp] else pc + 2
+            elif opcode == FUNCTION:
+                num_locals = code[pc + 1]
+                for i in range(sp, sp + num_locals):
+                    ram[i] = 0
+                sp += num_locals
+                pc += 2
+            elif opcode == CALL:
+                # Save the caller's frame
+                ram[sp] = _wrap(pc + 3)
+                ram[sp + 1] = ram[LCL]
+                ram[sp + 2] = ram[ARG]
+                ram[sp + 3] = ram[THIS]
+                ram[sp + 4] = ram[THAT]
+                sp += 5
+                ram[ARG] = sp - code[pc + 2] - 5
+                ram[LCL] = sp
+                pc = code[pc + 1]
+            elif opcode == RETURN:
+                frame = ram[LCL]
+                return_address = ram[frame - 5] & 0xFFFF
+                arg = ram[ARG]
+                ram[arg] = ram[sp - 1]
+                sp = arg + 1
+                ram[THAT] = ram[frame - 1]
+                ram[THIS] = ram[frame - 2]
+                ram[ARG] = ram[frame - 3]
+                ram[LCL] = ram[frame - 4]
+                if return_address == HALT:
+                    self.halted = True
+                pc = return_address
+            elif opcode == CALL_EXTERNAL:
+                ram[SP] = sp
+                self.call_external(code[pc + 1], code[pc + 2])
+                sp = ram[SP]
+                pc += 3
+            else:
+                raise NotImplementedError(f"Unsupported opcode {opcode}")
+
+        ram[SP] = sp
+        self.pc = pc
+        self.executed += executed
+        return executed
@@ -0,0 +1,109 @@
+from array import array
+from typing import NamedTuple, Optional, Tuple
+
+from vm_emulator.bytecode import JUMP_OPCODES, TEMP, Bytecode, Opcode, disassemble
+
+THAT_POINTER = 4
+
+# Matches any operand, which the superinstruction keeps as one of its own
+ANY = None
+
+
+class Superinstruction(NamedTuple):
+    opcode: Opcode
+    # The instructions it replaces, as opcodes and their operands
+    pattern: Tuple[Tuple[Opcode, Tuple[Optional[int], ...]], ...]
+
+
+# The most frequently executed sequences when running the chapter 12 OS tests and 09/Hangman, with the Jack OS for
+# Array, Math and Output. The first that matches is used, so longer sequences come first.
+SUPERINSTRUCTIONS = [
+    # let i = i + k;
+    Superinstruction(
+        Opcode.LOCAL_ADD_CONSTANT,
+        ((Opcode.PUSH_LOCAL, (ANY,)), (Opcode.PUSH_CONSTANT, (ANY,)), (Opcode.ADD, ()), (Opcode.POP_LOCAL, (ANY,))),
+    ),
+    # let a[i] = x; once a + i and x are on the stack
+    Superinstruction(
+        Opcode.ARRAY_WRITE,
+        (
+            (Opcode.POP_ADDRESS, (TEMP,)),
+            (Opcode.POP_ADDRESS, (THAT_POINTER,)),
+            (Opcode.PUSH_ADDRESS, (TEMP,)),
+            (Opcode.POP_THAT, (0,)),
+        ),
+    ),
+    # a[i], once a and i are on the stack
+    Superinstruction(
+        Opcode.ARRAY_READ,
+        ((Opcode.ADD, ()), (Opcode.POP_ADDRESS, (THAT_POINTER,)), (Opcode.PUSH_THAT, (0,))),
+    ),
+    # The condition of a while loop
+    Superinstruction(Opcode.IF_NOT_EQ_GOTO, ((Opcode.EQ, ()), (Opcode.NOT, ()), (Opcode.IF_GOTO, (ANY,)))),
+    Superinstruction(Opcode.IF_NOT_GT_GOTO, ((Opcode.GT, ()), (Opcode.NOT, ()), (Opcode.IF_GOTO, (ANY,)))),
+    Superinstruction(Opcode.IF_NOT_LT_GOTO, ((Opcode.LT, ()), (Opcode.NOT, ()), (Opcode.IF_GOTO, (ANY,)))),
+    Superinstruction(Opcode.NOT_IF_GOTO, ((Opcode.NOT, ()), (Opcode.IF_GOTO, (ANY,)))),
+    Superinstruction(Opcode.ADD_POP_LOCAL, ((Opcode.ADD, ()), (Opcode.POP_LOCAL, (ANY,)))),
+    Superinstruction(Opcode.PUSH_LOCAL_LOCAL, ((Opcode.PUSH_LOCAL, (ANY,)), (Opcode.PUSH_LOCAL, (ANY,)))),
+    Superinstruction(Opcode.PUSH_LOCAL_CONSTANT, ((Opcode.PUSH_LOCAL, (ANY,)), (Opcode.PUSH_CONSTANT, (ANY,)))),
+]
+
+
+def _match(superinstruction: Superinstruction, instructions, start: int, targets):
+    """
+    The operands of superinstruction if it matches instructions from start, or None if it doesn't
+
+    Only the first instruction of the sequence can be jumped to.
+    """
+    pattern = superinstruction.pattern
+    if start + len(pattern) > len(instructions):
+        return None
+    operands = []
+    for i, (opcode, expected_operands) in enumerate(pattern):
+        offset, actual_opcode, actual_operands = instructions[start + i]
+        if actual_opcode != opcode or (i > 0 and offset in targets):
+            return None
+        for expected, actual in zip(expected_operands, actual_operands):
+            if expected is ANY:
+                operands.append(actual)
+            elif expected != actual:
+                return None
+    return operands
+
+
+def fuse(bytecode: Bytecode):
+    """
+    Replace common sequences of instructions with superinstructions, so they take one dispatch instead of several
+    """
+    instructions = list(disassemble(bytecode))
+    targets = set(bytecode.functions.values())
+    targets.update(operands[0] for _, opcode, operands in instructions if opcode in JUMP_OPCODES)
+
+    fused = []
+    # The new offset of each instruction that can still be jumped to
+    new_offsets = {}
+    new_offset = 0
+    position = 0
+    while position < len(instructions):
+        for superinstruction in SUPERINSTRUCTIONS:
+            operands = _match(superinstruction, instructions, position, targets)
+            if operands is not None:
+                instruction = (superinstruction.opcode, operands)
+                length = len(superinstruction.pattern)
+                break
+        else:
+            instruction = instructions[position][1:]
+            length = 1
+        new_offsets[instructions[position][0]] = new_offset
+        fused.append(instruction)
+        new_offset += 1 + len(instruction[1])
+        position += length
+
+    code = array("i")
+    for opcode, operands in fused:
+        if opcode in JUMP_OPCODES:
+            operands = [new_offsets[operands[0]]] + operands[1:]
+        code.append(opcode)
+        code.extend(operands)
+    functions = {name: new_offsets[offset] for name, offset in bytecode.functions.items()}
+    return Bytecode(code=code, functions=functions, externals=bytecode.externals)
@@ -0,0 +1,336 @@
+import math
+from collections import deque
+
+HEAP_BASE = 2048
+HEAP_END = 16384
+SCREEN = 16384
+KBD = 24576
+
+SCREEN_WIDTH = 512
+SCREEN_HEIGHT = 256
+WORDS_PER_ROW = SCREEN_WIDTH // 16
+
+NEW_LINE = 128
+BACKSPACE = 129
+DOUBLE_QUOTE = 34
+
+
+def _wrap(value: int):
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+
+def read_string(ram, address: int):
+    """
+    The contents of the String object at address, as a Python string
+    """
+    length = ram[address + 1]
+    return "".join(chr(c) for c in ram[address + 2 : address + 2 + length])
+
+
+class OSClass:
+    """
+    A Python implementation of one of the Jack OS classes
+
+    Every public method is callable from VM code as <class name>.<method name>, with the same arguments as the Jack
+    function. Methods of the Jack class take the object as their first argument.
+    """
+
+    def __init__(self, emulator):
+        self.emulator = emulator
+        self.ram = emulator.ram
+
+    def os_class(self, name: str):
+        return self.emulator.os_classes[name]
+
+
+class Math(OSClass):
+    def init(self):
+        pass
+
+    def abs(self, x):
+        return abs(x)
+
+    def multiply(self, x, y):
+        return _wrap(x * y)
+
+    def divide(self, x, y):
+        if y == 0:
+            self.os_class("Sys").error(3)
+        # Jack division rounds towards zero
+        quotient = abs(x) // abs(y)
+        return quotient if (x < 0) == (y < 0) else -quotient
+
+    def min(self, x, y):
+        return min(x, y)
+
+    def max(self, x, y):
+        return max(x, y)
+
+    def sqrt(self, x):
+        if x < 0:
+            self.os_class("Sys").error(4)
+        return math.isqrt(x)
+
+
+class Memory(OSClass):
+    """
+    First-fit allocation from a free list of (address, size) blocks in the heap
+    """
+
+    def __init__(self, emulator):
+        super().__init__(emulator)
+        self.free_blocks = [(HEAP_BASE, HEAP_END - HEAP_BASE)]
+        self.allocated = {}
+
+    def init(self):
+        pass
+
+    def peek(self, address):
+        return self.ram[address]
+
+    def poke(self, address, value):
+        self.ram[address] = value
+
+    def alloc(self, size):
+        if size < 0:
+            self.os_class("Sys").error(5)
+        # Zero-sized objects, e.g. String.new(0), still need an address of their own
+        size = max(size, 1)
+        for i, (address, block_size) in enumerate(self.free_blocks):
+            if block_size >= size:
+                if block_size == size:
+                    del self.free_blocks[i]
+                else:
+                    self.free_blocks[i] = (address + size, block_size - size)
+                self.allocated[address] = size
+                return address
+        self.os_class("Sys").error(6)
+
+    def deAlloc(self, o):
+        size = self.allocated.pop(o)
+        self.free_blocks.append((o, size))
+        self.free_blocks.sort()
+
+
+class Array(OSClass):
+    def new(self, size):
+        if size <= 0:
+            self.os_class("Sys").error(2)
+        return self.os_class("Memory").alloc(size)
+
+    def dispose(self, this):
+        self.os_class("Memory").deAlloc(this)
+
+
+class String(OSClass):
+    """
+    Strings are stored as their maximum length, their length, then their characters
+    """
+
+    def new(self, maxLength):
+        if maxLength < 0:
+            self.os_class("Sys").error(14)
+        this = self.os_class("Memory").alloc(maxLength + 2)
+        self.ram[this] = maxLength
+        self.ram[this + 1] = 0
+        return this
+
+    def dispose(self, this):
+        self.os_class("Memory").deAlloc(this)
+
+    def length(self, this):
+        return self.ram[this + 1]
+
+    def charAt(self, this, j):
+        if not 0 <= j < self.ram[this + 1]:
+            self.os_class("Sys").error(15)
+        return self.ram[this + 2 + j]
+
+    def setCharAt(self, this, j, c):
+        if not 0 <= j < self.ram[this + 1]:
+            self.os_class("Sys").error(16)
+        self.ram[this + 2 + j] = c
+
+    def appendChar(self, this, c):
+        length = self.ram[this + 1]
+        if length >= self.ram[this]:
+            self.os_class("Sys").error(17)
+        self.ram[this + 2 + length] = c
+        self.ram[this + 1] = length + 1
+        return this
+
+    def eraseLastChar(self, this):
+        if self.ram[this + 1] == 0:
+            self.os_class("Sys").error(18)
+        self.ram[this + 1] -= 1
+
+    def intValue(self, this):
+        text = read_string(self.ram, this)
+        digits = len(text) - len(text.lstrip("-"))
+        value = 0
+        for c in text[digits:]:
+            if not c.isdigit():
+                break
+            value = value * 10 + int(c)
+        return _wrap(-value if digits else value)
+
+    def setInt(self, this, number):
+        text = str(number)
+        if len(text) > self.ram[this]:
+            self.os_class("Sys").error(19)
+        self.ram[this + 1] = 0
+        for c in text:
+            self.appendChar(this, ord(c))
+
+    def newLine(self):
+        return NEW_LINE
+
+    def backSpace(self):
+        return BACKSPACE
+
+    def doubleQuote(self):
+        return DOUBLE_QUOTE
+
+
+class Output(OSClass):
+    """
+    Collects what is printed as text, rather than drawing it on the screen
+    """
+
+    def __init__(self, emulator):
+        super().__init__(emulator)
+        self.text = []
+
+    def init(self):
+        pass
+
+    def moveCursor(self, i, j):
+        pass
+
+    def printChar(self, c):
+        if c == NEW_LINE:
+            self.println()
+        elif c == BACKSPACE:
+            self.backSpace()
+        else:
+            self.text.append(chr(c))
+
+    def printString(self, s):
+        self.text.append(read_string(self.ram, s))
+
+    def printInt(self, i):
+        self.text.append(str(i))
+
+    def println(self):
+        self.text.append("\n")
+
+    def backSpace(self):
+        if self.text:
+            self.text[-1] = self.text[-1][:-1]
+
+
+class Screen(OSClass):
+    def __init__(self, emulator):
+        super().__init__(emulator)
+        self.color = True
+
+    def init(self):
+        self.color = True
+
+    def clearScreen(self):
+        self.ram[SCREEN:KBD] = type(self.ram)("h", bytes(2 * (KBD - SCREEN)))
+
+    def setColor(self, b):
+        self.color = b != 0
+
+    def drawPixel(self, x, y):
+        if not (0 <= x < SCREEN_WIDTH and 0 <= y < SCREEN_HEIGHT):
+            self.os_class("Sys").error(7)
+        address = SCREEN + y * WORDS_PER_ROW + x // 16
+        word = self.ram[address] & 0xFFFF
+        bit = 1 << (x % 16)
+        self.ram[address] = _wrap(word | bit if self.color else word & ~bit)
+
+    def drawLine(self, x1, y1, x2, y2):
+        # Bresenham's algorithm
+        dx = abs(x2 - x1)
+        dy = -abs(y2 - y1)
+        step_x = 1 if x1 < x2 else -1
+        step_y = 1 if y1 < y2 else -1
+        error = dx + dy
+        while True:
+            self.drawPixel(x1, y1)
+            if x1 == x2 and y1 == y2:
+                return
+            double_error = 2 * error
+            if double_error >= dy:
+                error += dy
+                x1 += step_x
+            if double_error <= dx:
+                error += dx
+                y1 += step_y
+
+    def drawRectangle(self, x1, y1, x2, y2):
+        for y in range(y1, y2 + 1):
+            for x in range(x1, x2 + 1):
+                self.drawPixel(x, y)
+
+    def drawCircle(self, x, y, r):
+        for dy in range(-r, r + 1):
+            half_width = math.isqrt(r * r - dy * dy)
+            for dx in range(-half_width, half_width + 1):
+                self.drawPixel(x + dx, y + dy)
+
+
+class Keyboard(OSClass):
+    """
+    Reads keys from a queue, as there is no one to type them
+    """
+
+    def __init__(self, emulator):
+        super().__init__(emulator)
+        self.keys = deque()
+
+    def init(self):
+        pass
+
+    def keyPressed(self):
+        return self.ram[KBD]
+
+    def readChar(self):
+        if not self.keys:
+            raise Exception("Keyboard.readChar: no more keys to read")
+        c = self.keys.popleft()
+        self.os_class("Output").printChar(c)
+        return c
+
+    def readLine(self, message):
+        self.os_class("Output").printString(message)
+        line = self.os_class("String").new(SCREEN_WIDTH // 8)
+        while (c := self.readChar()) != NEW_LINE:
+            if c == BACKSPACE:
+                if self.os_class("String").length(line):
+                    self.os_class("String").eraseLastChar(line)
+            else:
+                self.os_class("String").appendChar(line, c)
+        return line
+
+    def readInt(self, message):
+        line = self.readLine(message)
+        value = self.os_class("String").intValue(line)
+        self.os_class("String").dispose(line)
+        return value
+
+
+class Sys(OSClass):
+    def halt(self):
+        self.emulator.halted = True
+
+    def error(self, errorCode):
+        raise Exception(f"Sys.error: error code {errorCode}")
+
+    def wait(self, duration):
+        pass
+
+
+OS_CLASSES = [Math, Memory, Array, String, Output, Screen, Keyboard, Sys]
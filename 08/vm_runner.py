@@ -0,0 +1,40 @@
+from pathlib import Path
+
+import click
+
+from vm_emulator import VMEmulator, compile_program, write_vmb
+
+
+@click.command()
+@click.argument("filename", type=click.Path(exists=True, path_type=Path))
+@click.option("--max-commands", default=100_000_000, show_default=True, help="Commands to run the program for at most")
+@click.option("--keys", default="", help="Characters for the program to read from the keyboard, in order")
+@click.option("--compile-only", is_flag=True, help="Write the .vmb file without running the program")
+def run(filename: Path, max_commands: int, keys: str, compile_only: bool):
+    """
+    Run a program on the VM emulator, with the OS written in Python
+
+    FILENAME is a directory of .vm files, which is compiled to bytecode in a new file with the extension .vmb, or a
+    .vmb file to run without parsing the program again.
+    """
+    emulator = VMEmulator()
+    if filename.is_dir():
+        bytecode = compile_program(sorted(filename.glob("*.vm")))
+        write_vmb(bytecode, filename / f"{filename.stem}.vmb")
+        if compile_only:
+            return
+        emulator.load_bytecode(bytecode)
+    elif filename.suffix == ".vmb":
+        emulator.load_vmb(filename)
+    else:
+        raise NotImplementedError(f"Unsupported path type {filename}")
+
+    emulator.os_classes["Keyboard"].keys.extend(ord(c) for c in keys)
+    emulator.run(max_commands)
+    click.echo("".join(emulator.os_classes["Output"].text), nl=False)
+    if not emulator.halted:
+        click.echo(f"Stopped after {emulator.executed} commands without halting")
+
+
+if __name__ == "__main__":
+    run()
@@ -1,54 +1,214 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import repeat
 from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, TextIO
 
 import click
 
+import peephole
 from code_writer import CodeWriter
 from command_type import CommandType
 from parser import Parser
+from translation_cache import CACHE_DIRECTORY_NAME, TranslationCache
+
+# Bump whenever a change to the translator changes its output, so cached translations aren't reused
+TRANSLATOR_VERSION = "1"
+
+# Lines of a .vm file that are read and translated at a time
+BATCH_LINES = 4096
 
 
 @click.command()
 @click.argument("filename", type=click.Path(exists=True, path_type=Path))
-def translate(filename: Path):
+@click.option("--optimize", is_flag=True, help="Fold redundant stack operations with a peephole pass")
+@click.option("--compact", is_flag=True, help="Share one copy of the code for call, return, eq, gt and lt")
+@click.option("--jobs", default=1, show_default=True, help="Number of processes to translate a directory's files with")
+@click.option(
+    "--cache",
+    is_flag=True,
+    help=f"Cache each file's translation in {CACHE_DIRECTORY_NAME} in the directory, and reuse it while unchanged",
+)
+@click.option("--verbose", is_flag=True, help="Echo the VM commands and the assembly")
+def translate(filename: Path, optimize: bool, compact: bool, jobs: int, cache: bool, verbose: bool):
     """
     Translate VM commands to Hack assembly
 
-    Creates a new file with the extension .asm
+    Creates a new file with the extension .asm. When translating a directory with --cache, the translation of each
+    file is cached, so only files that have changed are translated again.
     """
-    code_writer = CodeWriter()
-    code_writer.write_init()
-
+    translation_cache = None
     if filename.is_file():
-        _process_file_path(code_writer=code_writer, filename=filename)
-
-        asm_commands = code_writer.get_output()
-        click.echo(asm_commands)
-
+        vm_files = [filename]
         output_file = filename.with_suffix(".asm")
-        output_file.write_text("\n".join(asm_commands))
 
     elif filename.is_dir():
-        for f in filename.iterdir():
+        vm_files = []
+        for f in sorted(filename.iterdir()):
             if f.suffix == ".vm":
                 print(f"Translating {f}")
-                _process_file_path(code_writer=code_writer, filename=f)
+                vm_files.append(f)
             else:
                 print(f"Skipping {f}")
 
-        asm_commands = code_writer.get_output()
-        click.echo(asm_commands)
-
+        if cache:
+            translation_cache = TranslationCache(directory=filename / CACHE_DIRECTORY_NAME, version=TRANSLATOR_VERSION)
         output_file = filename / f"{filename.stem}.asm"
-        output_file.write_text("\n".join(asm_commands))
     else:
         raise NotImplementedError(f"Unsupported path type {filename}")
 
+    write_asm(
+        output_file=output_file,
+        vm_files=vm_files,
+        compact=compact,
+        optimize=optimize,
+        jobs=jobs,
+        cache=translation_cache,
+        verbose=verbose,
+    )
+
+    if verbose:
+        click.echo(output_file.read_text())
+
+
+def write_asm(
+    output_file: Path,
+    vm_files: List[Path],
+    compact: bool,
+    optimize: bool,
+    jobs: int = 1,
+    cache: Optional[TranslationCache] = None,
+    verbose: bool = False,
+):
+    """
+    Translate vm_files into a program, and write it to output_file as it's translated
+
+    Only a chunk of the program is kept in memory at a time, except that a file's whole fragment is while it's taken
+    from or added to the cache, or translated in another process. The peephole optimiser works on the whole program,
+    so with optimize the program is built in memory first.
+    """
+    if optimize:
+        code_writer = CodeWriter(compact=compact)
+        write_program(code_writer=code_writer, vm_files=vm_files, jobs=jobs, cache=cache, verbose=verbose)
+        output_file.write_text("\n".join(peephole.optimize(code_writer.get_output())))
+        return
+
+    with output_file.open("w") as f:
+        code_writer = CodeWriter(compact=compact, stream=f)
+        write_program(code_writer=code_writer, vm_files=vm_files, jobs=jobs, cache=cache, verbose=verbose)
+        code_writer.flush()
+
+
+def write_program(
+    code_writer: CodeWriter,
+    vm_files: List[Path],
+    jobs: int = 1,
+    cache: Optional[TranslationCache] = None,
+    verbose: bool = False,
+):
+    """
+    Write the bootstrap code, and the shared routines in compact mode, followed by the translation of each of vm_files
+
+    Without a cache or other processes to translate them, the files are translated straight into code_writer.
+    """
+    code_writer.write_init()
+    if jobs > 1 or cache is not None:
+        for fragment in translate_files(
+            vm_files=vm_files, compact=code_writer.compact, jobs=jobs, cache=cache, verbose=verbose
+        ):
+            code_writer.write_fragment(fragment)
+    else:
+        for vm_file in vm_files:
+            write_file(code_writer=code_writer, vm_file=vm_file, verbose=verbose)
+
+
+def translate_file(vm_file: Path, compact: bool, verbose: bool = False):
+    """
+    Translate one .vm file into a fragment of assembly, with a CodeWriter of its own
+
+    Labels in the fragment are all prefixed by the file or function they belong to, so fragments of different files
+    can be linked in any combination.
+    """
+    code_writer = CodeWriter(compact=compact)
+    write_file(code_writer=code_writer, vm_file=vm_file, verbose=verbose)
+    return code_writer.get_output()
+
+
+def translate_files(
+    vm_files: List[Path],
+    compact: bool,
+    jobs: int = 1,
+    cache: Optional[TranslationCache] = None,
+    verbose: bool = False,
+) -> Iterator[List[str]]:
+    """
+    Translate each of vm_files into a fragment, in separate processes if jobs > 1
+
+    The fragments are yielded in the order of vm_files, whichever process finishes first. If a cache is given,
+    fragments of files that haven't changed are taken from it, and the rest are added to it.
+    """
+    fragments = [None] * len(vm_files)
+    keys = [None] * len(vm_files)
+    if cache is not None:
+        for i, vm_file in enumerate(vm_files):
+            keys[i] = cache.key(vm_text=vm_file.read_text(), file_name=vm_file.stem, compact=compact)
+            fragments[i] = cache.get(keys[i])
+
+    to_translate = [vm_file for vm_file, fragment in zip(vm_files, fragments) if fragment is None]
+    with ProcessPoolExecutor(max_workers=jobs) if jobs > 1 and len(to_translate) > 1 else nullcontext() as executor:
+        if executor is None:
+            translated = (translate_file(vm_file=vm_file, compact=compact, verbose=verbose) for vm_file in to_translate)
+        else:
+            translated = executor.map(translate_file, to_translate, repeat(compact), repeat(verbose))
+
+        for key, fragment in zip(keys, fragments):
+            if fragment is None:
+                fragment = next(translated)
+                if cache is not None:
+                    cache.put(key, fragment)
+            yield fragment
+
+
+def link(fragments: Iterable[List[str]], compact: bool, stream: Optional[TextIO] = None):
+    """
+    Put the bootstrap code, and the shared routines in compact mode, in front of fragments of translated files
+
+    Returns the program, or writes it to stream if one is given.
+    """
+    code_writer = CodeWriter(compact=compact, stream=stream)
+    code_writer.write_init()
+    for fragment in fragments:
+        code_writer.write_fragment(fragment)
+    code_writer.flush()
+    return code_writer.get_output()
+
+
+def _batches(lines: Iterable[str], size: int):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_file(code_writer: CodeWriter, vm_file: Path, verbose: bool = False):
+    """
+    Translate a .vm file into code_writer, reading and translating BATCH_LINES lines at a time
+
+    Each command is on a line of its own, so the file can be split between any two lines.
+    """
+    code_writer.set_file_name(vm_file.stem)
+    with vm_file.open() as f:
+        for vm_commands in _batches((line.rstrip("\n") for line in f), BATCH_LINES):
+            if verbose:
+                click.echo(vm_commands)
+            _process_commands(code_writer=code_writer, vm_commands=vm_commands)
 
-def _process_file_path(code_writer, filename):
-    code_writer.set_file_name(filename.stem)
 
-    vm_commands = filename.read_text().splitlines()
-    click.echo(vm_commands)
+def _process_commands(code_writer, vm_commands):
     parser_ = Parser(commands=vm_commands)
 
     while parser_.has_more_commands():
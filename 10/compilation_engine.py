@@ -1,6 +1,6 @@
 import xml.etree.ElementTree as ET
 
-from jack_tokenizer import JackTokenizer, TokenType, Keyword
+from jack_tokenizer import JackSyntaxError, JackTokenizer, TokenType, Keyword
 
 
 class CompilationEngine:
@@ -37,8 +37,12 @@ class CompilationEngine:
             self._raise_syntax_error(message)
 
     def _raise_syntax_error(self, message):
+        line, column = self._tokenizer.position()
         raise JackSyntaxError(
-            f"{message}\nGot '{self._tokenizer.current_token()}' at:\n{self._tokenizer.current_line()}"
+            message=f"{message}\nGot '{self._tokenizer.current_token()}' at:\n{self._tokenizer.current_line()}",
+            file_name=self._tokenizer.file_name,
+            line=line,
+            column=column,
         )
 
     def compile_class(self):
@@ -387,7 +391,3 @@ class CompilationEngine:
             e.append(self._eat(","))
             e.append(self.compile_expression())
         return e
-
-
-class JackSyntaxError(Exception):
-    pass
@@ -3,7 +3,7 @@ import xml.etree.ElementTree as ET
 
 import click
 
-from compilation_engine import CompilationEngine
+from compilation_engine import CompilationEngine, JackSyntaxError
 from jack_tokenizer import JackTokenizer, TokenType
 
 
@@ -14,26 +14,42 @@ def analyze(filename: Path):
     Translate Jack source into VM commands
     """
 
+    syntax_errors = []
     if filename.is_file():
-        _process_file(filename)
+        jack_files = [filename]
+        _analyze_file(filename, syntax_errors)
 
     elif filename.is_dir():
+        jack_files = []
         for f in filename.iterdir():
             if f.suffix == ".jack":
                 print(f"Processing {f}")
-                _process_file(f)
+                jack_files.append(f)
+                _analyze_file(f, syntax_errors)
             else:
                 print(f"Skipping {f}")
 
     else:
         raise NotImplementedError(f"Unsupported path type {filename}")
 
+    if syntax_errors:
+        raise click.ClickException(f"{len(syntax_errors)} of {len(jack_files)} files have syntax errors")
+
+
+def _analyze_file(filename, syntax_errors):
+    # Carry on past a file with a syntax error, so the errors in every file are reported at once
+    try:
+        _process_file(filename)
+    except JackSyntaxError as e:
+        click.echo(e, err=True)
+        syntax_errors.append(e)
+
 
 def _process_file(filename):
     name = filename.stem
     output_file = filename.with_name(f"{name}_").with_suffix(".xml")
 
-    tokenizer = JackTokenizer(filename.read_text())
+    tokenizer = JackTokenizer(filename.read_text(), file_name=str(filename))
     compilation_engine = CompilationEngine(tokenizer=tokenizer)
 
     tree = compilation_engine.compile_class()
@@ -1,28 +1,32 @@
 import re
+from array import array
+from bisect import bisect_right
 from enum import Enum
+from functools import cached_property
+from typing import Optional
 
 KEYWORD_RE_RAW = (
-    "(class)|(constructor)|(function)|(method)|(field)|(static)|(var)|(int)|(char)|(boolean)|(void)|"
-    "(true)|(false)|(null)|(this)|(let)|(do)|(if)|(else)|(while)|(return)"
+    r"(?:class|constructor|function|method|field|static|var|int|char|boolean|void|"
+    r"true|false|null|this|let|do|if|else|while|return)(?!\w)"
+)
+SYMBOL_RE_RAW = r"[{}\(\)\[\]\.,;\+\-\*\/&\|<>=~]"
+INTEGER_CONSTANT_RE_RAW = r"\d+"
+MAX_INTEGER_CONSTANT = 32767
+STRING_CONSTANT_RE_RAW = r'"[^"\n]*"'
+IDENTIFIER_RE_RAW = r"[A-Za-z_]\w*"
+
+# Every token, in the order they are tried. Each group is named after the token type it matches.
+TOKEN_RE = re.compile(
+    f"(?P<KEYWORD>{KEYWORD_RE_RAW})|(?P<SYMBOL>{SYMBOL_RE_RAW})|(?P<INT_CONST>{INTEGER_CONSTANT_RE_RAW})|"
+    f"(?P<STRING_CONST>{STRING_CONSTANT_RE_RAW})|(?P<IDENTIFIER>{IDENTIFIER_RE_RAW})"
 )
-KEYWORD_RE = re.compile(KEYWORD_RE_RAW)
-
-SYMBOL_RE_RAW = r"([{}\(\)\[\]\.,;\+\-\*\/&\|<>=~])"
-SYMBOL_RE = re.compile(SYMBOL_RE_RAW)
-
-INTEGER_CONSTANT_RE_RAW = r"(\d{1,5})"
-INTEGER_CONSTANT_RE = re.compile(INTEGER_CONSTANT_RE_RAW)
-
-STRING_CONSTANT_RE_RAW = r'(".*")'
-STRING_CONSTANT = re.compile(STRING_CONSTANT_RE_RAW)
 
-IDENTIFIER_RE_RAW = r"([A-Za-z_]\w*)"
-IDENTIFIER_RE = re.compile(IDENTIFIER_RE_RAW)
+NEWLINE_RE = re.compile(r"\n")
 
-WHITESPACE_RE_RAW = r"(\s+)"
-COMMENT_RE_RAW = r"(\/\/.*)|(\/\*(?:.|\n)*?\*\/)"
-WHITESPACE_OR_COMMENT_RE_RAW = f"{WHITESPACE_RE_RAW}|{COMMENT_RE_RAW}"
-WHITESPACE_OR_COMMENT_RE = re.compile(WHITESPACE_OR_COMMENT_RE_RAW)
+WHITESPACE_RE_RAW = r"\s+"
+COMMENT_RE_RAW = r"\/\/.*|\/\*[\s\S]*?\*\/"
+# Any run of whitespace and comments between two tokens
+WHITESPACE_OR_COMMENT_RE = re.compile(f"(?:{WHITESPACE_RE_RAW}|{COMMENT_RE_RAW})+")
 
 
 class TokenType(Enum):
@@ -58,48 +62,49 @@ class Keyword(Enum):
 
 
 class JackTokenizer:
-    def __init__(self, input_text: str):
+    """
+    Splits Jack source into tokens
+
+    Tokens are matched in place in the source, from an offset that moves past each one, so the source is never copied.
+    """
+
+    def __init__(self, input_text: str, file_name: Optional[str] = None):
         self.input_text = input_text
+        self.file_name = file_name
         self._current_token = None
         self._current_type = None
-        self._remaining_text = input_text
+        self._current_start = 0
+        self._position = 0
 
     def has_more_tokens(self):
         self._skip_whitespace_and_comments()
-        return len(self._remaining_text) > 0
+        return self._position < len(self.input_text)
 
     def advance(self):
         if not self.has_more_tokens():
             self._current_token = None
             self._current_type = None
+            self._current_start = self._position
             return
 
-        if match := KEYWORD_RE.match(self._remaining_text):
-            self._current_token = match.group()
-            self._current_type = TokenType.KEYWORD
-            self._remaining_text = self._remaining_text.replace(self._current_token, "", 1)
-        elif match := SYMBOL_RE.match(self._remaining_text):
-            self._current_token = match.group()
-            self._current_type = TokenType.SYMBOL
-            self._remaining_text = self._remaining_text.replace(self._current_token, "", 1)
-        elif match := INTEGER_CONSTANT_RE.match(self._remaining_text):
-            self._current_token = match.group()
-            self._current_type = TokenType.INT_CONST
-            self._remaining_text = self._remaining_text.replace(self._current_token, "", 1)
-        elif match := STRING_CONSTANT.match(self._remaining_text):
-            self._current_token = match.group()
-            self._current_type = TokenType.STRING_CONST
-            self._remaining_text = self._remaining_text.replace(self._current_token, "", 1)
-        elif match := IDENTIFIER_RE.match(self._remaining_text):
-            self._current_token = match.group()
-            self._current_type = TokenType.IDENTIFIER
-            self._remaining_text = self._remaining_text.replace(self._current_token, "", 1)
-        else:
-            raise NotImplementedError(f"Unknown token: {self._remaining_text}")
+        match = TOKEN_RE.match(self.input_text, self._position)
+        if match is None:
+            self._current_start = self._position
+            self._raise_syntax_error(f"Unknown character {self.input_text[self._position]!r}")
+        self._current_token = match.group()
+        self._current_type = TokenType[match.lastgroup]
+        self._current_start = self._position
+        self._position = match.end()
+        if self._current_type == TokenType.INT_CONST and int(self._current_token) > MAX_INTEGER_CONSTANT:
+            self._raise_syntax_error(f"Integer constant {self._current_token} is more than {MAX_INTEGER_CONSTANT}")
+
+    def _raise_syntax_error(self, message):
+        line, column = self.position()
+        raise JackSyntaxError(message=message, file_name=self.file_name, line=line, column=column)
 
     def _skip_whitespace_and_comments(self):
-        while match := WHITESPACE_OR_COMMENT_RE.match(self._remaining_text):
-            self._remaining_text = self._remaining_text.replace(match.group(), "", 1)
+        if match := WHITESPACE_OR_COMMENT_RE.match(self.input_text, self._position):
+            self._position = match.end()
 
     def token_type(self):
         return self._current_type
@@ -122,11 +127,38 @@ class JackTokenizer:
     def current_token(self):
         return self._current_token
 
+    @cached_property
+    def _line_starts(self):
+        """
+        Offset of the start of each line, so the line of any offset can be found by bisection
+        """
+        line_starts = array("I", [0])
+        line_starts.extend(match.end() for match in NEWLINE_RE.finditer(self.input_text))
+        return line_starts
+
+    def position(self):
+        """
+        The line and column of the current token, both counted from 1
+        """
+        offset = self._current_start
+        line = bisect_right(self._line_starts, offset)
+        return line, offset - self._line_starts[line - 1] + 1
+
     def current_line(self):
-        index = len(self.input_text) - len(self._remaining_text)
-        lines = self.input_text.splitlines(keepends=True)
-        count = 0
-        for line in lines:
-            count += len(line)
-            if count > index:
-                return line
+        line, _ = self.position()
+        start = self._line_starts[line - 1]
+        end = self._line_starts[line] if line < len(self._line_starts) else len(self.input_text)
+        return self.input_text[start:end]
+
+
+class JackSyntaxError(Exception):
+    """
+    An error in Jack source, at a line and column that are both counted from 1
+    """
+
+    def __init__(self, message, file_name, line, column):
+        super().__init__(f"{file_name or '<source>'}:{line}:{column}: {message}")
+        self.message = message
+        self.file_name = file_name
+        self.line = line
+        self.column = column
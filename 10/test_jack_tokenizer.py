@@ -0,0 +1,73 @@
+import pytest
+
+from jack_tokenizer import JackSyntaxError, JackTokenizer, TokenType
+
+
+def _tokens(source):
+    tokenizer = JackTokenizer(source, file_name="Main.jack")
+    tokens = []
+    while tokenizer.has_more_tokens():
+        tokenizer.advance()
+        tokens.append((tokenizer.token_type(), tokenizer.current_token()))
+    return tokens
+
+
+def test_tokens():
+    assert _tokens("let classy = x[1];") == [
+        (TokenType.KEYWORD, "let"),
+        (TokenType.IDENTIFIER, "classy"),
+        (TokenType.SYMBOL, "="),
+        (TokenType.IDENTIFIER, "x"),
+        (TokenType.SYMBOL, "["),
+        (TokenType.INT_CONST, "1"),
+        (TokenType.SYMBOL, "]"),
+        (TokenType.SYMBOL, ";"),
+    ]
+
+
+def test_advance_past_end():
+    tokenizer = JackTokenizer("x")
+    tokenizer.advance()
+    tokenizer.advance()
+
+    assert (tokenizer.token_type(), tokenizer.current_token(), tokenizer.position()) == (None, None, (1, 2))
+
+
+def test_comments():
+    source = "// line\nx /* block\nover lines */ y /** doc */ z // end"
+
+    assert _tokens(source) == [(TokenType.IDENTIFIER, "x"), (TokenType.IDENTIFIER, "y"), (TokenType.IDENTIFIER, "z")]
+
+
+def test_string_constants():
+    assert _tokens('"a // b" + "" + "c /* d */"') == [
+        (TokenType.STRING_CONST, '"a // b"'),
+        (TokenType.SYMBOL, "+"),
+        (TokenType.STRING_CONST, '""'),
+        (TokenType.SYMBOL, "+"),
+        (TokenType.STRING_CONST, '"c /* d */"'),
+    ]
+
+
+def test_string_constant_cant_span_lines():
+    with pytest.raises(JackSyntaxError) as e:
+        _tokens('x = "a\nb";')
+
+    assert (e.value.line, e.value.column) == (1, 5)
+
+
+def test_integer_bounds():
+    assert _tokens("0 32767") == [(TokenType.INT_CONST, "0"), (TokenType.INT_CONST, "32767")]
+
+    with pytest.raises(JackSyntaxError) as e:
+        _tokens("let x = 32768;")
+
+    assert str(e.value) == "Main.jack:1:9: Integer constant 32768 is more than 32767"
+
+
+def test_unknown_character():
+    with pytest.raises(JackSyntaxError) as e:
+        _tokens("class Main {\n  let x = 1 # 2;\n}")
+
+    assert str(e.value) == "Main.jack:2:13: Unknown character '#'"
+    assert (e.value.message, e.value.line, e.value.column) == ("Unknown character '#'", 2, 13)
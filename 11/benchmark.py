@@ -0,0 +1,171 @@
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import click
+
+from compilation_engine import CompilationEngine
+from jack_compiler import compile_files, compile_source
+from jack_tokenizer import JackTokenizer
+
+REPOSITORY_PATH = Path(__file__).parent.parent
+JACK_OS_PATH = REPOSITORY_PATH / "12"
+HANGMAN_PATH = REPOSITORY_PATH / "09" / "Hangman"
+
+
+def generate_jack_source(size: int):
+    """
+    Generate a synthetic Jack source of about size characters, by repeating the chapter 12 OS sources
+    """
+    os_source = "\n".join(f.read_text() for f in sorted(JACK_OS_PATH.glob("*.jack")))
+    return (os_source * (size // len(os_source) + 1))[:size]
+
+
+def best_of(repeat, func, *args, **kwargs):
+    """
+    Run func repeat times and return the fastest wall time in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def peak_memory(func, *args, **kwargs):
+    """
+    Run func and return the peak memory allocated while it ran, in bytes
+    """
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def count_tokens(source: str):
+    tokenizer = JackTokenizer(source)
+    tokens = 0
+    while tokenizer.has_more_tokens():
+        tokenizer.advance()
+        tokens += 1
+    return tokens
+
+
+@click.group()
+def cli():
+    """Jack compiler benchmarks"""
+
+
+@cli.command()
+@click.option("--max-size", default=1_000_000, show_default=True, help="Size of the largest synthetic source")
+@click.option("--repeat", default=3, show_default=True)
+def tokenizer(max_size, repeat):
+    """Time tokenizing the OS sources, and synthetic sources of doubling size to show how it scales"""
+    os_files = sorted(JACK_OS_PATH.glob("*.jack"))
+    os_sources = [f.read_text() for f in os_files]
+    tokens = sum(count_tokens(source) for source in os_sources)
+    run_time = best_of(repeat, lambda: [count_tokens(source) for source in os_sources])
+    click.echo(f"12/*.jack: {len(os_files)} files, {tokens} tokens, {run_time * 1000:.1f}ms")
+
+    sizes = []
+    size = max_size
+    while size >= max_size // 16:
+        sizes.insert(0, size)
+        size //= 2
+    for size in sizes:
+        source = generate_jack_source(size)
+        tokens = count_tokens(source)
+        run_time = best_of(repeat, count_tokens, source)
+        click.echo(
+            f"{size:>8} chars: {tokens:>7} tokens, {run_time * 1000:>8.1f}ms, "
+            f"{run_time / size * 1_000_000:.2f}us per char"
+        )
+
+
+def compile_sources(sources):
+    for source in sources:
+        CompilationEngine(tokenizer=JackTokenizer(source)).compile_class()
+
+
+@cli.command(name="compile")
+@click.option("--repeat", default=5, show_default=True)
+def compile_(repeat):
+    """Time compiling the OS sources, with and without the time to tokenize them"""
+    os_sources = [f.read_text() for f in sorted(JACK_OS_PATH.glob("*.jack"))]
+    tokenize_time = best_of(repeat, lambda: [count_tokens(source) for source in os_sources])
+    compile_time = best_of(repeat, compile_sources, os_sources)
+    click.echo(f"tokenize: {tokenize_time * 1000:.1f}ms")
+    click.echo(f"compile:  {compile_time * 1000:.1f}ms, of which parsing {(compile_time - tokenize_time) * 1000:.1f}ms")
+
+
+@cli.command()
+@click.option("--repeat", default=5, show_default=True)
+def xml(repeat):
+    """Time and measure the peak memory of compiling each OS and Hangman file, with and without the XML parse tree"""
+    jack_files = sorted(JACK_OS_PATH.glob("*.jack")) + sorted(HANGMAN_PATH.glob("*.jack"))
+    click.echo(f"{'file':<28} {'xml':>8} {'no xml':>8} {'xml peak':>10} {'no xml peak':>12}")
+    totals = [0.0, 0.0, 0, 0]
+    for jack_file in jack_files:
+        source = jack_file.read_text()
+        assert compile_source(source, xml=True)[0] == compile_source(source, xml=False)[0]
+        results = [
+            best_of(repeat, compile_source, source, xml=True),
+            best_of(repeat, compile_source, source, xml=False),
+            peak_memory(compile_source, source, xml=True),
+            peak_memory(compile_source, source, xml=False),
+        ]
+        totals = [total + result for total, result in zip(totals, results)]
+        _echo_xml_results(f"{jack_file.parent.name}/{jack_file.name}", *results)
+    _echo_xml_results("total", *totals)
+
+
+def _echo_xml_results(name, xml_time, no_xml_time, xml_peak, no_xml_peak):
+    click.echo(
+        f"{name:<28} {xml_time * 1000:>6.1f}ms {no_xml_time * 1000:>6.1f}ms "
+        f"{xml_peak / 1024:>8.0f}KiB {no_xml_peak / 1024:>10.0f}KiB"
+    )
+
+
+def generate_jack_classes(directory: Path, classes: int):
+    """
+    Write classes .jack files to directory, each a chapter 12 OS class renamed so every class name is different
+    """
+    os_files = sorted(JACK_OS_PATH.glob("*.jack"))
+    jack_files = []
+    for i in range(classes):
+        os_file = os_files[i % len(os_files)]
+        class_name = f"{os_file.stem}{i}"
+        jack_file = directory / f"{class_name}.jack"
+        jack_file.write_text(os_file.read_text().replace(f"class {os_file.stem}", f"class {class_name}", 1))
+        jack_files.append(jack_file)
+    return jack_files
+
+
+@cli.command()
+@click.option("--classes", default=200, show_default=True, help="Number of generated classes to compile")
+@click.option("--repeat", default=3, show_default=True)
+def jobs(classes, repeat):
+    """Time compiling a directory of generated classes with a process pool, against one process"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jack_files = generate_jack_classes(Path(tmp_dir), classes)
+        click.echo(f"{len(jack_files)} files, {os.cpu_count()} CPUs")
+
+        list(compile_files(jack_files))
+        expected = [f.with_suffix(".vm").read_text() for f in jack_files]
+        base_time = None
+        for jobs_ in [1, 2, 4, 8]:
+            assert all(error is None for _, _, error in compile_files(jack_files, jobs=jobs_))
+            assert [f.with_suffix(".vm").read_text() for f in jack_files] == expected
+            run_time = best_of(repeat, lambda: list(compile_files(jack_files, jobs=jobs_)))
+            base_time = base_time or run_time
+            click.echo(f"jobs={jobs_}: {run_time:.3f}s, {base_time / run_time:.2f}x")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,13 +1,60 @@
 import xml.etree.ElementTree as ET
 
-from jack_tokenizer import JackTokenizer, TokenType, Keyword
+from jack_tokenizer import JackSyntaxError, JackTokenizer, TokenType, Keyword
 from symbol_table import SymbolTable, Kind
 from vm_writer import VMWriter, Segment, ArithmeticCommand
 
 
+class _NullAttributes(dict):
+    def update(self, *args, **kwargs):
+        pass
+
+
+class _NullElement:
+    """
+    Stands in for every element of the parse tree when it isn't built, and ignores whatever is added to it
+    """
+
+    __slots__ = ()
+    attrib = _NullAttributes()
+
+    @property
+    def text(self):
+        return None
+
+    @text.setter
+    def text(self, value):
+        pass
+
+    def append(self, element):
+        pass
+
+
+NULL_ELEMENT = _NullElement()
+
+
+class NullTreeBuilder:
+    """
+    Has the Element and SubElement of xml.etree.ElementTree, but builds no tree, so nothing is allocated for it
+    """
+
+    @staticmethod
+    def Element(tag):
+        return NULL_ELEMENT
+
+    @staticmethod
+    def SubElement(parent, tag):
+        return NULL_ELEMENT
+
+
 class CompilationEngine:
-    def __init__(self, tokenizer: JackTokenizer):
+    """
+    Compiles a Jack class to VM commands, and builds its parse tree as XML unless xml is False
+    """
+
+    def __init__(self, tokenizer: JackTokenizer, xml: bool = True):
         self._tokenizer = tokenizer
+        self._tree = ET if xml else NullTreeBuilder
         self._symbol_table = SymbolTable()
         self._vm_writer = VMWriter()
         self._if_counter = 0
@@ -25,8 +72,8 @@ class CompilationEngine:
                     self._tokenizer.key_word() in tokens,
                     f"Expected one of {tokens}",
                 )
-                e = ET.Element("keyword")
-                e.text = self._tokenizer.key_word().value
+                e = self._tree.Element("keyword")
+                e.text = self._tokenizer.current_token()
                 self._tokenizer.advance()
                 return e
             case TokenType.SYMBOL:
@@ -34,7 +81,7 @@ class CompilationEngine:
                     self._tokenizer.symbol() in tokens,
                     f"Expected one of {' '.join(tokens)}",
                 )
-                e = ET.Element("symbol")
+                e = self._tree.Element("symbol")
                 e.text = self._tokenizer.symbol()
                 self._tokenizer.advance()
                 return e
@@ -47,12 +94,16 @@ class CompilationEngine:
             self._raise_syntax_error(message)
 
     def _raise_syntax_error(self, message):
+        line, column = self._tokenizer.position()
         raise JackSyntaxError(
-            f"{message}\nGot '{self._tokenizer.current_token()}' at:\n{self._tokenizer.current_line()}"
+            message=f"{message}\nGot '{self._tokenizer.current_token()}' at:\n{self._tokenizer.current_line()}",
+            file_name=self._tokenizer.file_name,
+            line=line,
+            column=column,
         )
 
     def compile_class(self):
-        e = ET.Element("class")
+        e = self._tree.Element("class")
         self._tokenizer.advance()
         e.append(self._eat(Keyword.CLASS))
 
@@ -60,75 +111,71 @@ class CompilationEngine:
             self._tokenizer.token_type() == TokenType.IDENTIFIER,
             "class must be followed by identifier",
         )
-        identifier = ET.SubElement(e, "identifier")
-        identifier.text = self._tokenizer.identifier()
+        class_name = self._tokenizer.identifier()
+        identifier = self._tree.SubElement(e, "identifier")
+        identifier.text = class_name
         identifier.attrib.update({"category": "class", "usage": "declared"})
-        class_name = identifier.text
         self._tokenizer.advance()
 
         e.append(self._eat("{"))
-        while self._tokenizer.token_type() == TokenType.KEYWORD and self._tokenizer.key_word() in [
-            Keyword.STATIC,
-            Keyword.FIELD,
-        ]:
+        while self._tokenizer.is_keyword(Keyword.STATIC, Keyword.FIELD):
             e.append(self.compile_class_var_dec())
 
-        while self._tokenizer.token_type() == TokenType.KEYWORD and self._tokenizer.key_word() in [
-            Keyword.CONSTRUCTOR,
-            Keyword.FUNCTION,
-            Keyword.METHOD,
-        ]:
+        while self._tokenizer.is_keyword(Keyword.CONSTRUCTOR, Keyword.FUNCTION, Keyword.METHOD):
             e.append(self.compile_subroutine(class_name=class_name))
 
         e.append(self._eat("}"))
         return e
 
     def _compile_type(self):
+        # Returns the element and the name of the type
+        type_ = self._tokenizer.current_token()
         if self._tokenizer.token_type() == TokenType.KEYWORD:
             self._assert(
                 self._tokenizer.key_word() in [Keyword.INT, Keyword.CHAR, Keyword.BOOLEAN],
                 "Type must be int, char or boolean",
             )
-            keyword = ET.Element("keyword")
-            keyword.text = self._tokenizer.key_word().value
+            keyword = self._tree.Element("keyword")
+            keyword.text = type_
             self._tokenizer.advance()
-            return keyword
+            return keyword, type_
         elif self._tokenizer.token_type() == TokenType.IDENTIFIER:
-            identifier = ET.Element("identifier")
-            identifier.text = self._tokenizer.identifier()
+            identifier = self._tree.Element("identifier")
+            identifier.text = type_
             identifier.attrib.update({"category": "class", "usage": "used"})
             self._tokenizer.advance()
-            return identifier
+            return identifier, type_
         else:
             self._raise_syntax_error("Type expected")
 
     def compile_class_var_dec(self):
-        e = ET.Element("classVarDec")
+        e = self._tree.Element("classVarDec")
 
-        kind = self._eat(Keyword.STATIC, Keyword.FIELD)
-        is_field = kind.text == Keyword.FIELD.value
-        e.append(kind)
+        kind = self._tokenizer.current_token()
+        e.append(self._eat(Keyword.STATIC, Keyword.FIELD))
+        is_field = kind == Keyword.FIELD.value
 
-        type_ = self._compile_type()
-        e.append(type_)
+        type_element, type_ = self._compile_type()
+        e.append(type_element)
 
         self._assert(
             self._tokenizer.token_type() == TokenType.IDENTIFIER,
             "Identifier must follow type",
         )
-        identifier = ET.SubElement(e, "identifier")
-        identifier.text = self._tokenizer.identifier()
+        name = self._tokenizer.identifier()
+        identifier = self._tree.SubElement(e, "identifier")
+        identifier.text = name
 
-        self._symbol_table.define(name=identifier.text, type_=type_.text, kind=Kind(kind.text))
+        self._symbol_table.define(name=name, type_=type_, kind=Kind(kind))
         identifier.attrib.update(
-            {"category": kind.text, "index": str(self._symbol_table.index_of(identifier.text)), "usage": "declared"}
+            {"category": kind, "index": str(self._symbol_table.index_of(name)), "usage": "declared"}
         )
         if is_field:
             self._class_field_count += 1
         self._tokenizer.advance()
 
-        while self._tokenizer.token_type() == TokenType.SYMBOL and self._tokenizer.symbol() == ",":
-            symbol = ET.SubElement(e, "symbol")
+        while self._tokenizer.is_symbol(","):
+            symbol = self._tree.SubElement(e, "symbol")
             symbol.text = ","
             self._tokenizer.advance()
 
@@ -136,11 +183,12 @@ class CompilationEngine:
                 self._tokenizer.token_type() == TokenType.IDENTIFIER,
                 f"Identifier must follow ','",
             )
-            identifier = ET.SubElement(e, "identifier")
-            identifier.text = self._tokenizer.identifier()
-            self._symbol_table.define(name=identifier.text, type_=type_.text, kind=Kind(kind.text))
+            name = self._tokenizer.identifier()
+            identifier = self._tree.SubElement(e, "identifier")
+            identifier.text = name
+            self._symbol_table.define(name=name, type_=type_, kind=Kind(kind))
             identifier.attrib.update(
-                {"category": kind.text, "index": str(self._symbol_table.index_of(identifier.text)), "usage": "declared"}
+                {"category": kind, "index": str(self._symbol_table.index_of(name)), "usage": "declared"}
             )
             if is_field:
                 self._class_field_count += 1
@@ -154,11 +202,11 @@ class CompilationEngine:
         self._if_counter = 0
         self._while_counter = 0
 
-        e = ET.Element("subroutineDec")
-        subroutine_type = self._eat(Keyword.CONSTRUCTOR, Keyword.FUNCTION, Keyword.METHOD)
-        e.append(subroutine_type)
+        e = self._tree.Element("subroutineDec")
+        subroutine_type = self._tokenizer.current_token()
+        e.append(self._eat(Keyword.CONSTRUCTOR, Keyword.FUNCTION, Keyword.METHOD))
 
-        if subroutine_type.text == Keyword.METHOD.value:
+        if subroutine_type == Keyword.METHOD.value:
             self._symbol_table.define(name="this", type_=class_name, kind=Kind.ARG)
 
         if self._tokenizer.token_type() == TokenType.KEYWORD:
@@ -166,12 +214,12 @@ class CompilationEngine:
                 self._tokenizer.key_word() in [Keyword.VOID, Keyword.INT, Keyword.CHAR, Keyword.BOOLEAN],
                 "Subroutine must have return type",
             )
-            keyword = ET.SubElement(e, "keyword")
-            keyword.text = f" {self._tokenizer.key_word().value} "
+            keyword = self._tree.SubElement(e, "keyword")
+            keyword.text = f" {self._tokenizer.current_token()} "
             self._tokenizer.advance()
 
         elif self._tokenizer.token_type() == TokenType.IDENTIFIER:
-            identifier = ET.SubElement(e, "identifier")
+            identifier = self._tree.SubElement(e, "identifier")
             identifier.text = f" {self._tokenizer.identifier()} "
             identifier.attrib.update({"category": "class", "usage": "used"})
             self._tokenizer.advance()
@@ -182,10 +230,10 @@ class CompilationEngine:
             self._tokenizer.token_type() == TokenType.IDENTIFIER,
             "Subroutine name expected",
         )
-        identifier = ET.SubElement(e, "identifier")
-        identifier.text = self._tokenizer.identifier()
+        subroutine_name = self._tokenizer.identifier()
+        identifier = self._tree.SubElement(e, "identifier")
+        identifier.text = subroutine_name
         identifier.attrib.update({"category": "subroutine", "usage": "declared"})
-        subroutine_name = identifier.text
         self._tokenizer.advance()
 
         e.append(self._eat("("))
@@ -200,70 +248,68 @@ class CompilationEngine:
         return e
 
     def compile_parameter_list(self):
-        e = ET.Element("parameterList")
+        e = self._tree.Element("parameterList")
 
         if self._tokenizer.token_type() == TokenType.KEYWORD:
             self._assert(
                 self._tokenizer.key_word() in [Keyword.INT, Keyword.CHAR, Keyword.BOOLEAN],
                 "Type must be int, char or boolean",
             )
-            keyword = ET.SubElement(e, "keyword")
-            keyword.text = self._tokenizer.key_word().value
+            parameter_type = self._tokenizer.current_token()
+            keyword = self._tree.SubElement(e, "keyword")
+            keyword.text = parameter_type
             self._tokenizer.advance()
 
-            parameter_type = keyword.text
-
         elif self._tokenizer.token_type() == TokenType.IDENTIFIER:
-            identifier = ET.SubElement(e, "identifier")
-            identifier.text = self._tokenizer.identifier()
+            parameter_type = self._tokenizer.identifier()
+            identifier = self._tree.SubElement(e, "identifier")
+            identifier.text = parameter_type
             identifier.attrib.update({"category": "class", "usage": "used"})
             self._tokenizer.advance()
 
-            parameter_type = identifier.text
-
         else:
             return e
 
-        identifier = self._compile_identifier("variable identifier expected")
+        identifier, name = self._compile_identifier("variable identifier expected")
         e.append(identifier)
-        self._symbol_table.define(name=identifier.text, type_=parameter_type, kind=Kind.ARG)
+        self._symbol_table.define(name=name, type_=parameter_type, kind=Kind.ARG)
         identifier.attrib.update(
-            {"category": "arg", "usage": "declared", "index": str(self._symbol_table.index_of(identifier.text))}
+            {"category": "arg", "usage": "declared", "index": str(self._symbol_table.index_of(name))}
         )
 
-        while self._tokenizer.token_type() == TokenType.SYMBOL and self._tokenizer.symbol() == ",":
+        while self._tokenizer.is_symbol(","):
             e.append(self._eat(","))
 
-            parameter_type = self._compile_type()
-            e.append(parameter_type)
+            type_element, parameter_type = self._compile_type()
+            e.append(type_element)
 
-            identifier = self._compile_identifier("parameter name expected")
+            identifier, name = self._compile_identifier("parameter name expected")
             e.append(identifier)
 
-            self._symbol_table.define(name=identifier.text, type_=parameter_type.text, kind=Kind.ARG)
+            self._symbol_table.define(name=name, type_=parameter_type, kind=Kind.ARG)
             identifier.attrib.update(
-                {"category": "arg", "usage": "declared", "index": str(self._symbol_table.index_of(identifier.text))}
+                {"category": "arg", "usage": "declared", "index": str(self._symbol_table.index_of(name))}
             )
 
         return e
 
     def compile_subroutine_body(self, class_name, subroutine_name, subroutine_type):
-        e = ET.Element("subroutineBody")
+        e = self._tree.Element("subroutineBody")
 
         e.append(self._eat("{"))
 
-        while self._tokenizer.token_type() == TokenType.KEYWORD and self._tokenizer.key_word() == Keyword.VAR:
+        while self._tokenizer.is_keyword(Keyword.VAR):
             e.append(self.compile_var_dec())
 
         self._vm_writer.write_function(
             name=f"{class_name}.{subroutine_name}", n_locals=self._symbol_table.var_count(Kind.VAR)
         )
 
-        if subroutine_type.text == Keyword.CONSTRUCTOR.value:
+        if subroutine_type == Keyword.CONSTRUCTOR.value:
             self._vm_writer.write_push(segment=Segment.CONST, index=self._class_field_count)
             self._vm_writer.write_call(name="Memory.alloc", n_args=1)
             self._vm_writer.write_pop(segment=Segment.POINTER, index=0)
-        elif subroutine_type.text == Keyword.METHOD.value:
+        elif subroutine_type == Keyword.METHOD.value:
             self._vm_writer.write_push(segment=Segment.ARG, index=0)
             self._vm_writer.write_pop(segment=Segment.POINTER, index=0)
 
@@ -272,27 +318,27 @@ class CompilationEngine:
         return e
 
     def compile_var_dec(self):
-        e = ET.Element("varDec")
+        e = self._tree.Element("varDec")
 
         e.append(self._eat(Keyword.VAR))
-        var_type = self._compile_type()
-        e.append(var_type)
+        type_element, var_type = self._compile_type()
+        e.append(type_element)
 
-        identifier = self._compile_identifier("variable identifier expected")
+        identifier, name = self._compile_identifier("variable identifier expected")
         e.append(identifier)
 
-        self._symbol_table.define(name=identifier.text, type_=var_type.text, kind=Kind.VAR)
+        self._symbol_table.define(name=name, type_=var_type, kind=Kind.VAR)
         identifier.attrib.update(
-            {"category": "local", "usage": "declared", "index": str(self._symbol_table.index_of(identifier.text))}
+            {"category": "local", "usage": "declared", "index": str(self._symbol_table.index_of(name))}
         )
 
-        while self._tokenizer.token_type() == TokenType.SYMBOL and self._tokenizer.symbol() == ",":
+        while self._tokenizer.is_symbol(","):
             e.append(self._eat(","))
-            identifier = self._compile_identifier("variable identifier expected")
+            identifier, name = self._compile_identifier("variable identifier expected")
             e.append(identifier)
-            self._symbol_table.define(name=identifier.text, type_=var_type.text, kind=Kind.VAR)
+            self._symbol_table.define(name=name, type_=var_type, kind=Kind.VAR)
             identifier.attrib.update(
-                {"category": "local", "usage": "declared", "index": str(self._symbol_table.index_of(identifier.text))}
+                {"category": "local", "usage": "declared", "index": str(self._symbol_table.index_of(name))}
             )
 
         e.append(self._eat(";"))
@@ -300,20 +346,22 @@ class CompilationEngine:
         return e
 
     def _compile_identifier(self, help_text):
+        # Returns the element and the identifier
         self._assert(self._tokenizer.token_type() == TokenType.IDENTIFIER, help_text)
-        identifier = ET.Element("identifier")
-        identifier.text = self._tokenizer.identifier()
+        name = self._tokenizer.identifier()
+        identifier = self._tree.Element("identifier")
+        identifier.text = name
         self._tokenizer.advance()
-        return identifier
+        return identifier, name
 
     def compile_statements(self, class_name):
-        e = ET.Element("statements")
+        e = self._tree.Element("statements")
 
-        if self._tokenizer.token_type() == TokenType.SYMBOL and self._tokenizer.symbol() == "}":
+        if self._tokenizer.is_symbol("}"):
             e.text = "\n"  # hacky workaround for output to pass TextCompare check
             return e
 
-        while not (self._tokenizer.token_type() == TokenType.SYMBOL and self._tokenizer.symbol() == "}"):
+        while not self._tokenizer.is_symbol("}"):
             self._assert(self._tokenizer.token_type() == TokenType.KEYWORD, "Start of statement expected")
 
             match self._tokenizer.key_word():
@@ -332,39 +380,37 @@ class CompilationEngine:
         return e
 
     def compile_do(self, class_name):
-        e = ET.Element("doStatement")
+        e = self._tree.Element("doStatement")
         e.append(self._eat(Keyword.DO))
-        identifier1 = self._compile_identifier("class or subroutine identifier expected")
+        identifier1, name1 = self._compile_identifier("class or subroutine identifier expected")
         e.append(identifier1)
 
         # Function or Method
         n_args = 0
-        if self._tokenizer.token_type() == TokenType.SYMBOL and self._tokenizer.symbol() == ".":
+        if self._tokenizer.is_symbol("."):
             e.append(self._eat("."))
-            identifier2 = self._compile_identifier("class method identifier expected")
+            identifier2, name2 = self._compile_identifier("class method identifier expected")
             e.append(identifier2)
 
             identifier1.attrib.update({"category": "class", "usage": "used"})
             identifier2.attrib.update({"category": "subroutine", "usage": "used"})
 
-            id1_is_object = self._symbol_table.type_of(identifier1.text)
+            id1_is_object = self._symbol_table.type_of(name1)
             if id1_is_object:
-                identifier1_type = self._symbol_table.type_of(identifier1.text)
+                identifier1_type = self._symbol_table.type_of(name1)
 
-                full_name = f"{identifier1_type}.{identifier2.text}"
+                full_name = f"{identifier1_type}.{name2}"
                 n_args += 1
                 self._vm_writer.write_push(
-                    segment=self._identifier_category_to_segment(
-                        category=self._symbol_table.kind_of(name=identifier1.text)
-                    ),
-                    index=self._symbol_table.index_of(name=identifier1.text),
+                    segment=self._identifier_category_to_segment(category=self._symbol_table.kind_of(name=name1)),
+                    index=self._symbol_table.index_of(name=name1),
                 )
             else:
-                full_name = f"{identifier1.text}.{identifier2.text}"
+                full_name = f"{name1}.{name2}"
         # Method call with this class
         else:
             identifier1.attrib.update({"category": "subroutine", "usage": "used"})
-            full_name = f"{class_name}.{identifier1.text}"
+            full_name = f"{class_name}.{name1}"
             n_args += 1
             self._vm_writer.write_push(
                 segment=Segment.POINTER,
@@ -372,8 +418,8 @@ class CompilationEngine:
             )
 
         e.append(self._eat("("))
-        expression_list = self.compile_expression_list(class_name=class_name)
-        n_args += int(expression_list.attrib["count"])
+        expression_list, n_expressions = self.compile_expression_list(class_name=class_name)
+        n_args += n_expressions
         e.append(expression_list)
         e.append(self._eat(")"))
 
@@ -384,27 +430,20 @@ class CompilationEngine:
         return e
 
     def compile_let(self, class_name):
-        e = ET.Element("letStatement")
+        e = self._tree.Element("letStatement")
         e.append(self._eat(Keyword.LET))
-        identifier = self._compile_identifier("variable name expected")
+        identifier, name = self._compile_identifier("variable name expected")
         e.append(identifier)
-        identifier.attrib.update(
-            {
-                "category": self._symbol_table.kind_of(identifier.text),
-                "index": str(self._symbol_table.index_of(identifier.text)),
-                "usage": "used",
-            }
-        )
+        category = self._symbol_table.kind_of(name)
+        index = self._symbol_table.index_of(name)
+        identifier.attrib.update({"category": category, "index": str(index), "usage": "used"})
 
-        if self._tokenizer.token_type() == TokenType.SYMBOL and self._tokenizer.symbol() == "[":
+        if self._tokenizer.is_symbol("["):
             e.append(self._eat("["))
             e.append(self.compile_expression(class_name=class_name))
             e.append(self._eat("]"))
 
-            self._vm_writer.write_push(
-                segment=self._identifier_category_to_segment(identifier.attrib["category"]),
-                index=int(identifier.attrib["index"]),
-            )
+            self._vm_writer.write_push(segment=self._identifier_category_to_segment(category), index=index)
             self._vm_writer.write_arithmetic(command=ArithmeticCommand.ADD)
 
             e.append(self._eat("="))
@@ -422,10 +461,7 @@ class CompilationEngine:
             e.append(self.compile_expression(class_name=class_name))
             e.append(self._eat(";"))
 
-            self._vm_writer.write_pop(
-                segment=self._identifier_category_to_segment(identifier.attrib["category"]),
-                index=int(identifier.attrib["index"]),
-            )
+            self._vm_writer.write_pop(segment=self._identifier_category_to_segment(category), index=index)
         return e
 
     def _identifier_category_to_segment(self, category):
@@ -444,7 +480,7 @@ class CompilationEngine:
     def compile_while(self, class_name):
         while_counter = self._while_counter
         self._while_counter += 1
-        e = ET.Element("whileStatement")
+        e = self._tree.Element("whileStatement")
         e.append(self._eat(Keyword.WHILE))
         e.append(self._eat("("))
         self._vm_writer.write_label(f"WHILE_EXP{while_counter}")
@@ -460,10 +496,10 @@ class CompilationEngine:
         return e
 
     def compile_return(self, class_name):
-        e = ET.Element("returnStatement")
+        e = self._tree.Element("returnStatement")
         e.append(self._eat(Keyword.RETURN))
 
-        if not (self._tokenizer.token_type() == TokenType.SYMBOL and self._tokenizer.symbol() == ";"):
+        if not self._tokenizer.is_symbol(";"):
             e.append(self.compile_expression(class_name=class_name))
         else:
             self._vm_writer.write_push(segment=Segment.CONST, index=0)
@@ -476,7 +512,7 @@ class CompilationEngine:
         if_counter = self._if_counter
         self._if_counter += 1
 
-        e = ET.Element("ifStatement")
+        e = self._tree.Element("ifStatement")
         e.append(self._eat(Keyword.IF))
         e.append(self._eat("("))
         e.append(self.compile_expression(class_name=class_name))
@@ -488,7 +524,7 @@ class CompilationEngine:
         e.append(self.compile_statements(class_name=class_name))
         e.append(self._eat("}"))
 
-        if self._tokenizer.token_type() == TokenType.KEYWORD and self._tokenizer.key_word() == Keyword.ELSE:
+        if self._tokenizer.is_keyword(Keyword.ELSE):
             self._vm_writer.write_goto(label=f"IF_END{if_counter}")
             e.append(self._eat(Keyword.ELSE))
             e.append(self._eat("{"))
@@ -501,14 +537,14 @@ class CompilationEngine:
         return e
 
     def compile_expression(self, class_name):
-        e = ET.Element("expression")
+        e = self._tree.Element("expression")
         e.append(self.compile_term(class_name=class_name))
 
-        if self._tokenizer.token_type() == TokenType.SYMBOL and self._tokenizer.symbol() in "+-*/&|<>=":
-            op = ET.SubElement(e, "symbol")
-            op.text = self._tokenizer.symbol()
+        while self._tokenizer.is_symbol("+-*/&|<>="):
+            symbol = self._tokenizer.symbol()
+            op = self._tree.SubElement(e, "symbol")
+            op.text = symbol
             self._tokenizer.advance()
-            symbol = op.text
 
             e.append(self.compile_term(class_name=class_name))
 
@@ -537,20 +573,20 @@ class CompilationEngine:
         return e
 
     def compile_term(self, class_name):
-        e = ET.Element("term")
+        e = self._tree.Element("term")
 
         match self._tokenizer.token_type():
             case TokenType.INT_CONST:
-                int_const = ET.SubElement(e, "integerConstant")
+                int_const = self._tree.SubElement(e, "integerConstant")
                 int_val = self._tokenizer.int_val()
                 int_const.text = str(int_val)
                 self._vm_writer.write_push(segment=Segment.CONST, index=int_val)
                 self._tokenizer.advance()
             case TokenType.STRING_CONST:
-                str_const = ET.SubElement(e, "stringConstant")
-                str_const.text = self._tokenizer.string_val()
+                new_str = self._tokenizer.string_val()
+                str_const = self._tree.SubElement(e, "stringConstant")
+                str_const.text = new_str
 
-                new_str = str_const.text
                 self._vm_writer.write_push(segment=Segment.CONST, index=len(new_str))
                 self._vm_writer.write_call(name="String.new", n_args=1)
 
@@ -594,21 +630,25 @@ class CompilationEngine:
                 e.append(self.compile_expression(class_name=class_name))
                 e.append(self._eat(")"))
             case TokenType.IDENTIFIER:
-                identifier1 = self._compile_identifier("identifier expected")
+                # The symbol after the identifier, if there is one, tells an array, call and variable apart
+                next_type, next_value = self._tokenizer.peek()
+                next_symbol = next_value if next_type == TokenType.SYMBOL else None
+
+                identifier1, name1 = self._compile_identifier("identifier expected")
                 e.append(identifier1)
 
                 # array
-                if self._tokenizer.token_type() == TokenType.SYMBOL and self._tokenizer.symbol() == "[":
+                if next_symbol == "[":
                     e.append(self._eat("["))
                     e.append(self.compile_expression(class_name=class_name))
                     e.append(self._eat("]"))
 
                     # index into array
+                    category = self._symbol_table.kind_of(name=name1)
+                    index = self._symbol_table.index_of(name=name1)
                     self._vm_writer.write_push(
-                        segment=self._identifier_category_to_segment(
-                            category=self._symbol_table.kind_of(name=identifier1.text)
-                        ),
-                        index=self._symbol_table.index_of(name=identifier1.text),
+                        segment=self._identifier_category_to_segment(category=category),
+                        index=index,
                     )
                     self._vm_writer.write_arithmetic(command=ArithmeticCommand.ADD)
 
@@ -616,72 +656,57 @@ class CompilationEngine:
                     self._vm_writer.write_pop(segment=Segment.POINTER, index=1)
                     self._vm_writer.write_push(segment=Segment.THAT, index=0)
 
-                    identifier1.attrib.update(
-                        {
-                            "category": self._symbol_table.kind_of(identifier1.text),
-                            "index": str(self._symbol_table.index_of(identifier1.text)),
-                            "usage": "used",
-                        }
-                    )
+                    identifier1.attrib.update({"category": category, "index": str(index), "usage": "used"})
                 # method call
-                elif self._tokenizer.token_type() == TokenType.SYMBOL and self._tokenizer.symbol() == "(":
+                elif next_symbol == "(":
                     self._vm_writer.write_push(segment=Segment.POINTER, index=0)
 
                     e.append(self._eat("("))
-                    expression_list = self.compile_expression_list(class_name=class_name)
+                    expression_list, expression_count = self.compile_expression_list(class_name=class_name)
                     e.append(expression_list)
                     e.append(self._eat(")"))
                     identifier1.attrib.update({"category": "subroutine", "usage": "used"})
 
-                    subroutine_name = identifier1.text
-                    expression_count = int(expression_list.attrib["count"])
-                    self._vm_writer.write_call(name=subroutine_name, n_args=expression_count + 1)
+                    self._vm_writer.write_call(name=name1, n_args=expression_count + 1)
 
                 # method or function call
-                elif self._tokenizer.token_type() == TokenType.SYMBOL and self._tokenizer.symbol() == ".":
+                elif next_symbol == ".":
                     e.append(self._eat("."))
-                    identifier2 = self._compile_identifier("function name expected")
+                    identifier2, name2 = self._compile_identifier("function name expected")
                     e.append(identifier2)
                     e.append(self._eat("("))
 
                     n_args = 0
-                    id1_is_object = self._symbol_table.type_of(name=identifier1.text)
+                    id1_is_object = self._symbol_table.type_of(name=name1)
                     if id1_is_object:
-                        id1_class = self._symbol_table.type_of(name=identifier1.text)
+                        id1_class = self._symbol_table.type_of(name=name1)
                         self._vm_writer.write_push(
                             segment=self._identifier_category_to_segment(
-                                category=self._symbol_table.kind_of(name=identifier1.text)
+                                category=self._symbol_table.kind_of(name=name1)
                             ),
-                            index=self._symbol_table.index_of(name=identifier1.text),
+                            index=self._symbol_table.index_of(name=name1),
                         )
                         n_args += 1
-                        full_name = f"{id1_class}.{identifier2.text}"
+                        full_name = f"{id1_class}.{name2}"
                     else:
-                        full_name = f"{identifier1.text}.{identifier2.text}"
+                        full_name = f"{name1}.{name2}"
 
-                    expression_list = self.compile_expression_list(class_name=class_name)
+                    expression_list, n_expressions = self.compile_expression_list(class_name=class_name)
                     e.append(expression_list)
                     e.append(self._eat(")"))
 
                     identifier1.attrib.update({"category": "class", "usage": "used"})
                     identifier2.attrib.update({"category": "subroutine", "usage": "used"})
 
-                    n_args += int(expression_list.attrib["count"])
+                    n_args += n_expressions
                     self._vm_writer.write_call(name=full_name, n_args=n_args)
 
                 else:
-                    identifier1.attrib.update(
-                        {
-                            "category": self._symbol_table.kind_of(identifier1.text),
-                            "index": str(self._symbol_table.index_of(identifier1.text)),
-                            "usage": "used",
-                        }
-                    )
+                    category = self._symbol_table.kind_of(name1)
+                    index = self._symbol_table.index_of(name1)
+                    identifier1.attrib.update({"category": category, "index": str(index), "usage": "used"})
 
-                    self._vm_writer.write_push(
-                        segment=self._identifier_category_to_segment(identifier1.attrib["category"]),
-                        index=int(identifier1.attrib["index"]),
-                    )
+                    self._vm_writer.write_push(segment=self._identifier_category_to_segment(category), index=index)
 
             case _:
                 raise self._raise_syntax_error("Do not know how to handle this term yet")
@@ -689,20 +714,17 @@ class CompilationEngine:
         return e
 
     def compile_expression_list(self, class_name):
-        e = ET.Element("expressionList")
+        # Returns the element and the number of expressions
+        e = self._tree.Element("expressionList")
         e.attrib.update({"count": "0"})
-        if self._tokenizer.token_type() == TokenType.SYMBOL and self._tokenizer.symbol() == ")":
-            return e
+        if self._tokenizer.is_symbol(")"):
+            return e, 0
 
         e.append(self.compile_expression(class_name=class_name))
         expression_count = 1
-        while self._tokenizer.token_type() == TokenType.SYMBOL and self._tokenizer.symbol() == ",":
+        while self._tokenizer.is_symbol(","):
             e.append(self._eat(","))
             e.append(self.compile_expression(class_name=class_name))
             expression_count += 1
         e.attrib.update({"count": str(expression_count)})
-        return e
-
-
-class JackSyntaxError(Exception):
-    pass
+        return e, expression_count
@@ -1,48 +1,104 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import repeat
 from pathlib import Path
+from typing import List, Optional
 import xml.etree.ElementTree as ET
 
 import click
 
-from compilation_engine import CompilationEngine
+from compilation_engine import CompilationEngine, JackSyntaxError
 from jack_tokenizer import JackTokenizer
 
 
 @click.command()
 @click.argument("filename", type=click.Path(exists=True, path_type=Path))
-def compile_(filename: Path):
+@click.option("--no-xml", is_flag=True, help="Don't build the parse tree or write the _.xml file")
+@click.option("--jobs", default=1, show_default=True, help="Number of processes to compile a directory's files with")
+def compile_(filename: Path, no_xml: bool, jobs: int):
     """
     Translate Jack source into VM commands
+
+    The parse tree of each file is also written to a file ending in _.xml, unless --no-xml is given.
     """
 
     if filename.is_file():
-        _process_file(filename)
+        jack_files = [filename]
 
     elif filename.is_dir():
-        for f in filename.iterdir():
+        jack_files = []
+        for f in sorted(filename.iterdir()):
             if f.suffix == ".jack":
-                print(f"Processing {f}")
-                _process_file(f)
+                jack_files.append(f)
             else:
                 print(f"Skipping {f}")
 
     else:
         raise NotImplementedError(f"Unsupported path type {filename}")
 
+    # Carry on past a file that fails to compile, so the errors in every file are reported together at the end
+    errors = []
+    start = time.perf_counter()
+    for f, compile_time, error in compile_files(jack_files=jack_files, xml=not no_xml, jobs=jobs):
+        if error is None:
+            print(f"Compiled {f} in {compile_time * 1000:.1f}ms")
+        else:
+            errors.append((f, error))
+    total_time = time.perf_counter() - start
+    print(f"Compiled {len(jack_files) - len(errors)} of {len(jack_files)} files in {total_time * 1000:.1f}ms")
 
-def _process_file(filename):
-    name = filename.stem
-    output_xml_file = filename.with_name(f"{name}_").with_suffix(".xml")
+    for f, error in errors:
+        if isinstance(error, JackSyntaxError):
+            click.echo(error, err=True)
+        else:
+            click.echo(f"{f}: {type(error).__name__}: {error}", err=True)
+    if errors:
+        raise click.ClickException(f"{len(errors)} of {len(jack_files)} files failed to compile")
 
-    tokenizer = JackTokenizer(filename.read_text())
-    compilation_engine = CompilationEngine(tokenizer=tokenizer)
 
+def compile_source(source: str, file_name: Optional[str] = None, xml: bool = True):
+    """
+    Compile one Jack class, returning its VM code, and its parse tree as XML if xml is True
+    """
+    compilation_engine = CompilationEngine(tokenizer=JackTokenizer(source, file_name=file_name), xml=xml)
     tree = compilation_engine.compile_class()
-    ET.indent(tree)
-    tree_str = ET.tostring(tree, encoding="unicode", short_empty_elements=True)
-    output_xml_file.write_text(tree_str)
+    tree_str = None
+    if xml:
+        ET.indent(tree)
+        tree_str = ET.tostring(tree, encoding="unicode", short_empty_elements=True)
+    return "\n".join(compilation_engine.get_vm_commands()), tree_str
+
+
+def compile_files(jack_files: List[Path], xml: bool = True, jobs: int = 1):
+    """
+    Compile each of jack_files to a .vm file of its own, in separate processes if jobs > 1
+
+    Yields each file, how long it took to compile, and its syntax error or OSError if it had one, in the order of
+    jack_files. An error in one file doesn't stop the others being compiled.
+    """
+    with ProcessPoolExecutor(max_workers=jobs) if jobs > 1 and len(jack_files) > 1 else nullcontext() as executor:
+        if executor is None:
+            yield from map(_process_file, jack_files, repeat(xml))
+        else:
+            yield from executor.map(_process_file, jack_files, repeat(xml))
+
+
+def _process_file(filename, xml=True):
+    start = time.perf_counter()
+    try:
+        vm_code, tree_str = compile_source(filename.read_text(), file_name=str(filename), xml=xml)
+        if xml:
+            output_xml_file = filename.with_name(f"{filename.stem}_").with_suffix(".xml")
+            output_xml_file.write_text(tree_str)
 
-    output_asm_file = filename.with_suffix(".vm")
-    output_asm_file.write_text("\n".join(compilation_engine.get_vm_commands()))
+        output_asm_file = filename.with_suffix(".vm")
+        output_asm_file.write_text(vm_code)
+    # Returned rather than raised, so one file's error in a worker process doesn't lose the other files' results. Any
+    # other exception is a bug in the compiler, so is left to stop the run with its traceback.
+    except (JackSyntaxError, OSError) as e:
+        return filename, time.perf_counter() - start, e
+    return filename, time.perf_counter() - start, None
 
 
 if __name__ == "__main__":
@@ -1,28 +1,35 @@
 import re
+from array import array
+from bisect import bisect_right
 from enum import Enum
+from functools import cached_property
+from typing import List, NamedTuple, Optional
 
 KEYWORD_RE_RAW = (
-    r"(?:(class)|(constructor)|(function)|(method)|(field)|(static)|(var)|(int)|(char)|(boolean)|(void)|"
-    r"(true)|(false)|(null)|(this)|(let)|(do)|(if)|(else)|(while)|(return))(?!\w)"
+    r"(?:class|constructor|function|method|field|static|var|int|char|boolean|void|"
+    r"true|false|null|this|let|do|if|else|while|return)(?!\w)"
+)
+SYMBOL_RE_RAW = r"[{}\(\)\[\]\.,;\+\-\*\/&\|<>=~]"
+INTEGER_CONSTANT_RE_RAW = r"\d+"
+MAX_INTEGER_CONSTANT = 32767
+STRING_CONSTANT_RE_RAW = r'"[^"\n]*"'
+IDENTIFIER_RE_RAW = r"[A-Za-z_]\w*"
+
+# Every token, in the order they are tried. Each group is named after the token type it matches.
+TOKEN_RE = re.compile(
+    f"(?P<KEYWORD>{KEYWORD_RE_RAW})|(?P<SYMBOL>{SYMBOL_RE_RAW})|(?P<INT_CONST>{INTEGER_CONSTANT_RE_RAW})|"
+    f"(?P<STRING_CONST>{STRING_CONSTANT_RE_RAW})|(?P<IDENTIFIER>{IDENTIFIER_RE_RAW})"
 )
-KEYWORD_RE = re.compile(KEYWORD_RE_RAW)
-
-SYMBOL_RE_RAW = r"([{}\(\)\[\]\.,;\+\-\*\/&\|<>=~])"
-SYMBOL_RE = re.compile(SYMBOL_RE_RAW)
-
-INTEGER_CONSTANT_RE_RAW = r"(\d{1,5})"
-INTEGER_CONSTANT_RE = re.compile(INTEGER_CONSTANT_RE_RAW)
 
-STRING_CONSTANT_RE_RAW = r'(".*")'
-STRING_CONSTANT = re.compile(STRING_CONSTANT_RE_RAW)
+NEWLINE_RE = re.compile(r"\n")
 
-IDENTIFIER_RE_RAW = r"([A-Za-z_]\w*)"
-IDENTIFIER_RE = re.compile(IDENTIFIER_RE_RAW)
+WHITESPACE_RE_RAW = r"\s+"
+COMMENT_RE_RAW = r"\/\/.*|\/\*[\s\S]*?\*\/"
+# Any run of whitespace and comments between two tokens
+WHITESPACE_OR_COMMENT_RE = re.compile(f"(?:{WHITESPACE_RE_RAW}|{COMMENT_RE_RAW})+")
 
-WHITESPACE_RE_RAW = r"(\s+)"
-COMMENT_RE_RAW = r"(\/\/.*)|(\/\*(?:.|\n)*?\*\/)"
-WHITESPACE_OR_COMMENT_RE_RAW = f"{WHITESPACE_RE_RAW}|{COMMENT_RE_RAW}"
-WHITESPACE_OR_COMMENT_RE = re.compile(WHITESPACE_OR_COMMENT_RE_RAW)
+# The whole source, as runs of whitespace and comments, which match no named group, tokens, and anything else
+SOURCE_RE = re.compile(f"{WHITESPACE_OR_COMMENT_RE.pattern}|{TOKEN_RE.pattern}|(?P<UNKNOWN>.)")
 
 
 class TokenType(Enum):
@@ -57,76 +64,178 @@ class Keyword(Enum):
     THIS = "this"
 
 
+# Token types and keywords are kept as their index in these lists, with 0 for no token, or a token that isn't a keyword
+TOKEN_TYPES = [None, *TokenType]
+KEYWORDS = [None, *Keyword]
+_TOKEN_TYPE_IDS = {token_type.name: i for i, token_type in enumerate(TOKEN_TYPES) if token_type is not None}
+_KEYWORD_IDS = {keyword.value: i for i, keyword in enumerate(KEYWORDS) if keyword is not None}
+_KEYWORD_TYPE_ID = _TOKEN_TYPE_IDS[TokenType.KEYWORD.name]
+_SYMBOL_TYPE_ID = _TOKEN_TYPE_IDS[TokenType.SYMBOL.name]
+_INT_CONST_TYPE_ID = _TOKEN_TYPE_IDS[TokenType.INT_CONST.name]
+
+
+class Tokens(NamedTuple):
+    # Index of the type of each token in TOKEN_TYPES
+    types: array
+    # Index of each keyword in KEYWORDS
+    keywords: array
+    values: List[Optional[str]]
+    # Offset of each token in the source
+    starts: array
+
+
+def line_starts(input_text: str):
+    """
+    Offset of the start of each line, so the line of any offset can be found by bisection
+    """
+    starts = array("I", [0])
+    starts.extend(match.end() for match in NEWLINE_RE.finditer(input_text))
+    return starts
+
+
+def position_of(starts: array, offset: int):
+    """
+    The line and column of offset, both counted from 1, given the starts of the lines
+    """
+    line = bisect_right(starts, offset)
+    return line, offset - starts[line - 1] + 1
+
+
+def _syntax_error(message: str, input_text: str, file_name: Optional[str], offset: int):
+    line, column = position_of(line_starts(input_text), offset)
+    return JackSyntaxError(message=message, file_name=file_name, line=line, column=column)
+
+
+def tokenize(input_text: str, file_name: Optional[str] = None):
+    """
+    Split the whole of input_text into tokens, followed by one with no type or value that marks the end
+
+    Tokens are matched in place in the source, from an offset that moves past each one, so the source is never copied.
+    Raises JackSyntaxError at the first character that doesn't start a token, or integer constant above
+    MAX_INTEGER_CONSTANT.
+    """
+    tokens = Tokens(types=array("B"), keywords=array("B"), values=[], starts=array("I"))
+    for match in SOURCE_RE.finditer(input_text):
+        token_type = match.lastgroup
+        if token_type is None:
+            continue
+        if token_type == "UNKNOWN":
+            raise _syntax_error(f"Unknown character {match.group()!r}", input_text, file_name, match.start())
+        value = match.group()
+        type_id = _TOKEN_TYPE_IDS[token_type]
+        if type_id == _INT_CONST_TYPE_ID and int(value) > MAX_INTEGER_CONSTANT:
+            message = f"Integer constant {value} is more than {MAX_INTEGER_CONSTANT}"
+            raise _syntax_error(message, input_text, file_name, match.start())
+        tokens.types.append(type_id)
+        tokens.keywords.append(_KEYWORD_IDS[value] if type_id == _KEYWORD_TYPE_ID else 0)
+        tokens.values.append(value)
+        tokens.starts.append(match.start())
+
+    tokens.types.append(0)
+    tokens.keywords.append(0)
+    tokens.values.append(None)
+    tokens.starts.append(len(input_text))
+    return tokens
+
+
 class JackTokenizer:
-    def __init__(self, input_text: str):
+    """
+    Steps through the tokens of Jack source, which is all tokenized up front
+
+    Once past the last token, the current token has no type or value.
+    """
+
+    def __init__(self, input_text: str, file_name: Optional[str] = None):
         self.input_text = input_text
-        self._current_token = None
-        self._current_type = None
-        self._remaining_text = input_text
+        self.file_name = file_name
+        self.tokens = tokenize(input_text, file_name=file_name)
+        self._types = self.tokens.types
+        self._keywords = self.tokens.keywords
+        self._values = self.tokens.values
+        self._index = -1
+        self._end = len(self._values) - 1
 
     def has_more_tokens(self):
-        self._skip_whitespace_and_comments()
-        return len(self._remaining_text) > 0
+        return self._index + 1 < self._end
 
     def advance(self):
-        if not self.has_more_tokens():
-            self._current_token = None
-            self._current_type = None
-            return
-
-        if match := KEYWORD_RE.match(self._remaining_text):
-            self._current_token = match.group()
-            self._current_type = TokenType.KEYWORD
-            self._remaining_text = self._remaining_text.replace(self._current_token, "", 1)
-        elif match := SYMBOL_RE.match(self._remaining_text):
-            self._current_token = match.group()
-            self._current_type = TokenType.SYMBOL
-            self._remaining_text = self._remaining_text.replace(self._current_token, "", 1)
-        elif match := INTEGER_CONSTANT_RE.match(self._remaining_text):
-            self._current_token = match.group()
-            self._current_type = TokenType.INT_CONST
-            self._remaining_text = self._remaining_text.replace(self._current_token, "", 1)
-        elif match := STRING_CONSTANT.match(self._remaining_text):
-            self._current_token = match.group()
-            self._current_type = TokenType.STRING_CONST
-            self._remaining_text = self._remaining_text.replace(self._current_token, "", 1)
-        elif match := IDENTIFIER_RE.match(self._remaining_text):
-            self._current_token = match.group()
-            self._current_type = TokenType.IDENTIFIER
-            self._remaining_text = self._remaining_text.replace(self._current_token, "", 1)
-        else:
-            raise NotImplementedError(f"Unknown token: {self._remaining_text}")
-
-    def _skip_whitespace_and_comments(self):
-        while match := WHITESPACE_OR_COMMENT_RE.match(self._remaining_text):
-            self._remaining_text = self._remaining_text.replace(match.group(), "", 1)
+        if self._index < self._end:
+            self._index += 1
+
+    def peek(self, k=1):
+        """
+        The type and value of the token k after the current one, in constant time
+
+        Raises JackSyntaxError if the source ends before then.
+        """
+        index = self._index + k
+        if index >= self._end:
+            raise _syntax_error("Unexpected end of file", self.input_text, self.file_name, len(self.input_text))
+        return TOKEN_TYPES[self._types[index]], self._values[index]
 
     def token_type(self):
-        return self._current_type
+        return TOKEN_TYPES[self._types[self._index]]
 
     def key_word(self):
-        return Keyword(self._current_token)
+        return KEYWORDS[self._keywords[self._index]]
+
+    def is_keyword(self, *keywords: Keyword):
+        return KEYWORDS[self._keywords[self._index]] in keywords
+
+    def is_symbol(self, symbols: str):
+        """
+        Whether the current token is a symbol, and one of the characters in symbols
+        """
+        index = self._index
+        return self._types[index] == _SYMBOL_TYPE_ID and self._values[index] in symbols
 
     def symbol(self):
-        return self._current_token
+        return self._values[self._index]
 
     def identifier(self):
-        return self._current_token
+        return self._values[self._index]
 
     def int_val(self):
-        return int(self._current_token)
+        return int(self._values[self._index])
 
     def string_val(self):
-        return self._current_token[1:-1]
+        return self._values[self._index][1:-1]
 
     def current_token(self):
-        return self._current_token
+        return self._values[self._index]
+
+    def _current_start(self):
+        return self.tokens.starts[max(self._index, 0)]
+
+    @cached_property
+    def _line_starts(self):
+        return line_starts(self.input_text)
+
+    def position(self):
+        """
+        The line and column of the current token, both counted from 1
+        """
+        return position_of(self._line_starts, self._current_start())
 
     def current_line(self):
-        index = len(self.input_text) - len(self._remaining_text)
-        lines = self.input_text.splitlines(keepends=True)
-        count = 0
-        for line in lines:
-            count += len(line)
-            if count > index:
-                return line
+        line, _ = self.position()
+        start = self._line_starts[line - 1]
+        end = self._line_starts[line] if line < len(self._line_starts) else len(self.input_text)
+        return self.input_text[start:end]
+
+
+class JackSyntaxError(Exception):
+    """
+    An error in Jack source, at a line and column that are both counted from 1
+    """
+
+    def __init__(self, message, file_name, line, column):
+        super().__init__(f"{file_name or '<source>'}:{line}:{column}: {message}")
+        self.message = message
+        self.file_name = file_name
+        self.line = line
+        self.column = column
+
+    def __reduce__(self):
+        # So it can be passed back from a compiler process
+        return JackSyntaxError, (self.message, self.file_name, self.line, self.column)
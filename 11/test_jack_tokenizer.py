@@ -0,0 +1,119 @@
+import pytest
+
+from jack_tokenizer import TOKEN_TYPES, JackSyntaxError, JackTokenizer, Keyword, TokenType, tokenize
+
+
+def _tokens(source):
+    tokens = tokenize(source)
+    return [(TOKEN_TYPES[token_type], value) for token_type, value in zip(tokens.types, tokens.values)][:-1]
+
+
+def test_tokens():
+    assert _tokens("let classy = x[1];") == [
+        (TokenType.KEYWORD, "let"),
+        (TokenType.IDENTIFIER, "classy"),
+        (TokenType.SYMBOL, "="),
+        (TokenType.IDENTIFIER, "x"),
+        (TokenType.SYMBOL, "["),
+        (TokenType.INT_CONST, "1"),
+        (TokenType.SYMBOL, "]"),
+        (TokenType.SYMBOL, ";"),
+    ]
+
+
+def test_ends_with_empty_token():
+    tokens = tokenize("x")
+
+    assert (TOKEN_TYPES[tokens.types[-1]], tokens.values[-1], tokens.starts[-1]) == (None, None, 1)
+    assert _tokens("") == []
+
+
+def test_comments():
+    source = "// line\nx /* block\nover lines */ y /** doc */ z // end"
+
+    assert _tokens(source) == [(TokenType.IDENTIFIER, "x"), (TokenType.IDENTIFIER, "y"), (TokenType.IDENTIFIER, "z")]
+
+
+def test_string_constants():
+    assert _tokens('"a // b" + "" + "c /* d */"') == [
+        (TokenType.STRING_CONST, '"a // b"'),
+        (TokenType.SYMBOL, "+"),
+        (TokenType.STRING_CONST, '""'),
+        (TokenType.SYMBOL, "+"),
+        (TokenType.STRING_CONST, '"c /* d */"'),
+    ]
+
+
+def test_string_constant_cant_span_lines():
+    with pytest.raises(JackSyntaxError) as e:
+        tokenize('x = "a\nb";')
+
+    assert (e.value.line, e.value.column) == (1, 5)
+
+
+def test_integer_bounds():
+    assert _tokens("0 32767") == [(TokenType.INT_CONST, "0"), (TokenType.INT_CONST, "32767")]
+
+    with pytest.raises(JackSyntaxError) as e:
+        tokenize("let x = 32768;", file_name="Main.jack")
+
+    assert str(e.value) == "Main.jack:1:9: Integer constant 32768 is more than 32767"
+
+
+def test_unknown_character():
+    with pytest.raises(JackSyntaxError) as e:
+        tokenize("class Main {\n  let x = 1 # 2;\n}", file_name="Main.jack")
+
+    assert str(e.value) == "Main.jack:2:13: Unknown character '#'"
+    assert (e.value.message, e.value.line, e.value.column) == ("Unknown character '#'", 2, 13)
+
+
+def test_tokenizer():
+    tokenizer = JackTokenizer('class Main {\n  do Output.printString("hi");\n}', file_name="Main.jack")
+    tokenizer.advance()
+    assert tokenizer.is_keyword(Keyword.CLASS, Keyword.FUNCTION)
+    assert not tokenizer.is_symbol("{")
+
+    for _ in range(3):
+        tokenizer.advance()
+    assert tokenizer.is_keyword(Keyword.DO)
+    assert tokenizer.position() == (2, 3)
+    assert tokenizer.current_line() == '  do Output.printString("hi");\n'
+
+    for _ in range(5):
+        tokenizer.advance()
+    assert (tokenizer.token_type(), tokenizer.string_val()) == (TokenType.STRING_CONST, "hi")
+
+
+def test_tokenizer_stops_at_end():
+    tokenizer = JackTokenizer("x")
+    assert tokenizer.has_more_tokens()
+    tokenizer.advance()
+    assert not tokenizer.has_more_tokens()
+    tokenizer.advance()
+    tokenizer.advance()
+
+    assert (tokenizer.token_type(), tokenizer.current_token(), tokenizer.key_word()) == (None, None, None)
+    assert not tokenizer.is_symbol("x")
+    assert tokenizer.position() == (1, 2)
+
+
+def test_peek():
+    tokenizer = JackTokenizer("let a[i] = x;")
+    tokenizer.advance()
+    tokenizer.advance()
+
+    assert tokenizer.peek() == (TokenType.SYMBOL, "[")
+    assert tokenizer.peek(2) == (TokenType.IDENTIFIER, "i")
+    assert tokenizer.peek(6) == (TokenType.SYMBOL, ";")
+    assert tokenizer.identifier() == "a"
+
+
+def test_peek_past_end():
+    tokenizer = JackTokenizer("let x\n= y", file_name="Main.jack")
+    tokenizer.advance()
+
+    assert tokenizer.peek(3) == (TokenType.IDENTIFIER, "y")
+    with pytest.raises(JackSyntaxError) as e:
+        tokenizer.peek(4)
+    assert str(e.value) == "Main.jack:2:4: Unexpected end of file"
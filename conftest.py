@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT_PATH = Path(__file__).parent.resolve()
+
+# The modules of each chapter that isn't the one being tested, by name
+_set_aside = {}
+_current_chapter = None
+
+
+def _chapter(path: Path):
+    """
+    The chapter directory path is in, e.g. "08", or None if it isn't in one
+    """
+    try:
+        parts = path.resolve().relative_to(ROOT_PATH).parts
+    except ValueError:
+        return None
+    return parts[0] if len(parts) > 1 else None
+
+
+def _switch_to(chapter):
+    """
+    Set aside the modules of every other chapter, and bring back this chapter's
+
+    Each chapter's modules import each other by their bare names, and some chapters have modules with the same name,
+    e.g. parser, so running the tests of several chapters together would otherwise mix them up.
+    """
+    global _current_chapter
+    if chapter == _current_chapter:
+        return
+    for name, module in list(sys.modules.items()):
+        module_file = getattr(module, "__file__", None)
+        module_chapter = _chapter(Path(module_file)) if module_file is not None else None
+        if module_chapter not in (None, chapter):
+            _set_aside.setdefault(module_chapter, {})[name] = sys.modules.pop(name)
+    sys.modules.update(_set_aside.pop(chapter, {}))
+    _current_chapter = chapter
+
+
+def pytest_collectstart(collector):
+    if isinstance(collector, pytest.Module):
+        _switch_to(_chapter(collector.path))
+
+
+def pytest_runtest_setup(item):
+    _switch_to(_chapter(item.path))